@@ -0,0 +1,89 @@
+"""Attachments (tech labs and reactors), and the buildings that lift off
+of them and land on them.
+
+The free attachments are indexed by name, and the buildings that can lift
+off are indexed by name, so a swap command finds what it needs without
+scanning every building and attachment.
+"""
+
+LIFTABLE_BUILDINGS = ('barracks', 'factory', 'starport')
+
+# Matches a building with or without an attachment
+ANY = object()
+
+
+class AttachmentIndex(object):
+    """Every attachment in the game, the free ones by name, and the buildings
+    that can lift off by name.
+    """
+
+    def __init__(self):
+        self.attachments = [] # every attachment, in the order they were built
+        self.free = {} # name -> [attachment], not attached, and not reserved by a flying building
+        self.buildings = {} # name -> [building], for buildings that can lift off
+
+    def __repr__(self):
+        return "<AttachmentIndex: %s attachments, %s free>" % (
+            len(self.attachments),
+            sum(len(f) for f in self.free.values()),
+        )
+
+    def add_attachment(self, attachment, building=None):
+        """Add a new attachment, attached to `building`, or free."""
+        self.attachments.append(attachment)
+        if building is not None:
+            attach(building, attachment)
+        else:
+            self.release(attachment)
+
+    def add_building(self, building):
+        if building.name in LIFTABLE_BUILDINGS:
+            self.buildings.setdefault(building.name, []).append(building)
+
+    def free_attachments(self):
+        return [a for name in sorted(self.free) for a in self.free[name]]
+
+    def release(self, attachment):
+        """Make an attachment free for any building to land on."""
+        self.free.setdefault(attachment.name, []).append(attachment)
+
+    def reserve(self, name):
+        """Take a free attachment of this name for a building about to land
+        on it, or return None if there is none.
+        """
+        free = self.free.get(name)
+        if not free:
+            return None
+        return free.pop(0)
+
+    def idle_building(self, name, attachment_name=ANY, exclude=None):
+        """Return a building of this name that is free to lift off, or None.
+
+        `attachment_name` is the name of the attachment it must have, or None
+        if it must have no attachment.
+        """
+        for building in self.buildings.get(name, []):
+            if building is exclude or building.command_in_progress is not None:
+                continue
+            attachment = building.attached_to
+            if attachment is not None and attachment.command_in_progress is not None:
+                continue
+            if attachment_name is ANY or \
+                    (attachment is None and attachment_name is None) or \
+                    (attachment is not None and attachment.name == attachment_name):
+                return building
+        return None
+
+
+def attach(building, attachment):
+    building.attached_to = attachment
+    attachment.attached_to = building
+
+
+def detach(building):
+    """Separate a building from its attachment, and return the attachment."""
+    attachment = building.attached_to
+    if attachment is not None:
+        attachment.attached_to = None
+        building.attached_to = None
+    return attachment
@@ -0,0 +1,122 @@
+"""Simulate a corpus of build orders.
+
+    outcomes = batch.run_batch({"standard": build_order, ...}, facts, cache=cache.ResultCache("cache/"))
+
+Build orders with the same canonical hash are simulated once, and with a
+ResultCache, build orders already simulated against the same ruleset are
+not simulated again.
+"""
+
+import multiprocessing
+import time
+
+import cache as cache_module
+import commands
+import metrics
+import terran
+
+
+MAX_TIME = 60*15 # seconds of game time
+
+# Set in each worker process by _init_worker
+_WORKER_STATE = {}
+
+
+def simulate(build_order, facts, mining_rates=None, breaker=MAX_TIME):
+    """Play a build order, and return its outcome as a dict of plain values:
+    the game's result, and the error that stopped it, if any.
+    """
+    game = terran.HotsGame(list(build_order), facts, mining_rates=mining_rates, verbose=False)
+    outcome = {'error': None, 'type': None}
+    try:
+        game.run(breaker)
+    except Exception as e:
+        outcome.update(error=str(e), type=e.__class__.__name__)
+    outcome['result'] = game.result()
+    return outcome
+
+
+def _init_worker(facts, mining_rates, breaker):
+    _WORKER_STATE.update(facts=facts, mining_rates=mining_rates, breaker=breaker)
+
+
+def _init_pool_worker(*initargs):
+    _init_worker(*initargs)
+    metrics.reset() # The parent's metrics are counted in the parent
+
+
+def _simulate(build_order):
+    return simulate(
+        build_order,
+        _WORKER_STATE['facts'],
+        _WORKER_STATE['mining_rates'],
+        _WORKER_STATE['breaker'],
+    )
+
+
+def _simulate_in_worker(build_order):
+    """Return the outcome, and the metrics recorded while playing it."""
+    outcome = _simulate(build_order)
+    return outcome, metrics.REGISTRY.drain()
+
+
+def run_batch(build_orders, facts, mining_rates=None, cache=None, processes=None,
+              breaker=MAX_TIME):
+    """Simulate every build order in a dict of {name: commands}, and return
+    a dict of {name: outcome}. Every outcome also has the build order's
+    canonical `hash`. Pass processes=1 to run in this process.
+    """
+    ruleset_key = cache_module.ruleset_hash(facts, mining_rates, breaker)
+
+    names_by_hash = {}
+    unique = {}
+    for name, build_order in sorted(build_orders.items()):
+        key = commands.build_order_hash(build_order)
+        names_by_hash.setdefault(key, []).append(name)
+        unique.setdefault(key, build_order)
+
+    outcomes_by_hash = {}
+    if cache is not None:
+        for key in unique:
+            cached = cache.get(ruleset_key, key)
+            if cached is not None:
+                outcomes_by_hash[key] = cached
+
+    pending = sorted(k for k in unique if k not in outcomes_by_hash)
+    initargs = (facts, mining_rates, breaker)
+    started = time.time()
+    metrics.QUEUE_DEPTH.set(len(pending), labels=('batch',))
+    if processes == 1 or len(pending) <= 1:
+        _init_worker(*initargs)
+        results = []
+        for k in pending:
+            results.append(_simulate(unique[k]))
+            metrics.QUEUE_DEPTH.dec(labels=('batch',))
+    else:
+        pool = multiprocessing.Pool(processes, initializer=_init_pool_worker, initargs=initargs)
+        try:
+            results = []
+            for outcome, recorded in pool.imap(_simulate_in_worker, [unique[k] for k in pending]):
+                results.append(outcome)
+                metrics.REGISTRY.merge(recorded)
+                metrics.QUEUE_DEPTH.dec(labels=('batch',))
+        finally:
+            pool.close()
+            pool.join()
+    if pending:
+        elapsed = max(time.time() - started, 1e-9)
+        metrics.BATCH_SIMULATIONS_PER_SECOND.set(len(pending) / elapsed)
+        metrics.BATCH_SIMULATED_SECONDS_PER_SECOND.set(sum(r['result']['time'] for r in results) / elapsed)
+
+    for key, outcome in zip(pending, results):
+        outcomes_by_hash[key] = outcome
+        if cache is not None:
+            cache.put(ruleset_key, key, outcome)
+
+    outcomes = {}
+    for key, names in names_by_hash.items():
+        for name in names:
+            outcome = dict(outcomes_by_hash[key])
+            outcome['hash'] = key
+            outcomes[name] = outcome
+    return outcomes
@@ -0,0 +1,69 @@
+"""An on-disk cache of simulation results, keyed by the ruleset and the
+canonical hash of the build order (see commands.build_order_hash), so that
+a build order is only simulated once per ruleset, however it was written.
+
+    cache = ResultCache("cache/")
+    key = ruleset_hash(facts, mining_rates, breaker)
+    result = cache.get(key, commands.build_order_hash(build_order))
+
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+import mining
+
+ENGINE_VERSION = 1 # Change whenever a change to the game changes its results
+
+
+def ruleset_hash(facts, mining_rates=None, breaker=None):
+    """Return a stable hash of everything other than the build order that
+    decides the outcome of a simulation: the facts, the mining rates, the
+    time limit `breaker`, and the version of the engine.
+    """
+    rates = (mining_rates or mining.MiningRates()).values()
+    content = json.dumps([ENGINE_VERSION, facts.content_hash(), rates, breaker], sort_keys=True)
+    return hashlib.sha1(content).hexdigest()
+
+
+class ResultCache(object):
+    """Stores one JSON file per (ruleset hash, build order hash)."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return "<ResultCache: %s, %s hits, %s misses>" % (self.directory, self.hits, self.misses)
+
+    def path(self, ruleset_key, order_key):
+        return os.path.join(self.directory, ruleset_key[:16], order_key[:2], order_key + ".json")
+
+    def get(self, ruleset_key, order_key):
+        """Return the cached result, or None."""
+        try:
+            with open(self.path(ruleset_key, order_key)) as f:
+                value = json.load(f)
+        except (IOError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def put(self, ruleset_key, order_key, value):
+        path = self.path(ruleset_key, order_key)
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                if not os.path.isdir(directory): # Another process may have made it first
+                    raise
+        # Write to a temporary file first, so readers never see half a result
+        handle, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(handle, 'w') as f:
+            json.dump(value, f, separators=(',', ':'))
+        os.rename(temporary, path)
@@ -33,6 +33,8 @@ import re
 
 class Command(object):
 
+    not_before = 0 # game time before which the command may not begin, to ask "what if this began later?"
+
     def __init__(self, supply, item_name, raw_text):
         self.supply = supply
         self.item_name = item_name
@@ -53,18 +55,35 @@ class Command(object):
     def is_constant(self):
         return False
 
+    def canonical_fields(self):
+        return ['command', self.item_name]
+
+    def canonical(self):
+        """Return this command as a string that is the same for every way of
+        writing it (case, whitespace, comments, plurals).
+        """
+        supply = str(int(self.supply)) if self.supply is not None else ''
+        return "|".join([supply] + [str(f) for f in self.canonical_fields()])
+
 
 class SwapCommand(Command):
     """Command to lift off a building and switch it with another, in order
     to trade a reactor or tech lab.
     """
-    def __init__(self, supply, item_name, raw_text, attachment_name, disconnect):
+    def __init__(self, supply, item_name, raw_text, attachment_name, disconnect, swap_with=None):
         super(SwapCommand, self).__init__(supply, item_name, raw_text)
         self.attachment_name = attachment_name
         self.disconnect = disconnect
+        self.swap_with = swap_with # the other building, to "swap <building> and <building>"
         
     def is_swap(self):
         return True
+
+    def canonical_fields(self):
+        if self.swap_with:
+            return ['swap', 'exchange', self.item_name, self.swap_with]
+        action = 'remove' if self.disconnect else 'move'
+        return ['swap', action, self.item_name, self.attachment_name]
     
     def __repr__(self):
         return "<%s: %s>" % (
@@ -81,6 +100,9 @@ class StandardCommand(Command):
         """Return the item name, but remove spaces and other non-letter characters."""
         return re.sub("[^\w]", "", self.item_name)
 
+    def canonical_fields(self):
+        return ['build', self.item_name]
+
 
 class RefineryCommand(StandardCommand):
     """Scv will build a refinery, and when it's finished a certain
@@ -90,6 +112,9 @@ class RefineryCommand(StandardCommand):
         super(RefineryCommand, self).__init__(supply, item_name, raw_text)
         self.scv_transfer = scv_transfer
 
+    def canonical_fields(self):
+        return ['refinery', self.scv_transfer]
+
 
 class AttachmentCommand(StandardCommand):
     """
@@ -105,6 +130,9 @@ class AttachmentCommand(StandardCommand):
     def is_attachment(self):
         return True
 
+    def canonical_fields(self):
+        return ['attach', self.item_name, self.attached_to]
+
     def __repr__(self):
         return "<AttachmentCommand: %s on %s>" % (self.item_name, self.attached_to)
 
@@ -114,7 +142,9 @@ class ScvCommand(Command):
     collect_minerals = False
     collect_gas = False
     scout = False
-    
+
+    def canonical_fields(self):
+        return ['scv', self.item_name]
 
 
 
@@ -129,3 +159,19 @@ class ConstantCommand(Command):
 
     def is_constant(self):
         return True
+
+    def canonical_fields(self):
+        return ['constant' if self.begin else 'stop constant', self.item_name]
+
+
+def canonical_build_order(commands):
+    """Return the canonical text of a list of commands, one per line."""
+    return "\n".join(c.canonical() for c in commands)
+
+
+def build_order_hash(commands):
+    """Return a stable hash of a list of commands. Build orders that differ
+    only in how they are written have the same hash.
+    """
+    import hashlib
+    return hashlib.sha1(canonical_build_order(commands)).hexdigest()
@@ -0,0 +1,89 @@
+"""Effects that happen at a later time, such as a MULE returning minerals or
+workers arriving at a refinery, and energy that regenerates over time.
+
+Effects are kept in a heap by the time they are due, so each one costs
+nothing until it fires. An effect is the name of a method on the game,
+called as `game.effect_<name>(*args)`, rather than a function, so that
+games with effects pending can still be copied and pickled.
+
+    game.effects.schedule(game.time + 10, 'mule_trip', expires)
+
+"""
+
+import heapq
+
+
+class EffectScheduler(object):
+    """Effects waiting for their time, earliest first. Effects due at the
+    same time fire in the order they were scheduled.
+    """
+
+    def __init__(self):
+        self.heap = [] # (time, sequence, name, args)
+        self.sequence = 0
+
+    def __repr__(self):
+        return "<EffectScheduler: %s pending, next at %s>" % (len(self.heap), self.next_time())
+
+    def __len__(self):
+        return len(self.heap)
+
+    def schedule(self, time, name, *args):
+        heapq.heappush(self.heap, (time, self.sequence, name, args))
+        self.sequence += 1
+
+    def next_time(self):
+        """Return the time of the next effect, or None if there is none."""
+        if not self.heap:
+            return None
+        return self.heap[0][0]
+
+    def pending(self):
+        """Return (time, name, args) for every effect waiting, in the order
+        they will fire.
+        """
+        return [(due, name, args) for due, sequence, name, args in sorted(self.heap)]
+
+    def run_due(self, time, target):
+        """Fire every effect due at or before `time` on `target`, and return
+        how many fired. Effects scheduled while firing fire too, if due.
+        """
+        fired = 0
+        while self.heap and self.heap[0][0] <= time:
+            due, sequence, name, args = heapq.heappop(self.heap)
+            getattr(target, 'effect_%s' % name)(*args)
+            fired += 1
+        return fired
+
+
+class Energy(object):
+    """Energy that regenerates at a fixed rate up to a maximum. The value is
+    worked out when asked for, rather than added up every second.
+    """
+
+    def __init__(self, initial, maximum, rate, time):
+        self.stored = initial
+        self.maximum = maximum
+        self.rate = rate # energy/second
+        self.since = time
+
+    def __repr__(self):
+        return "<Energy: %s/%s at %s>" % (self.stored, self.maximum, self.since)
+
+    def value(self, time):
+        return min(self.maximum, self.stored + self.rate * (time - self.since))
+
+    def spend(self, amount, time):
+        value = self.value(time)
+        if value < amount:
+            raise Exception("Cannot spend %s energy, only %s available" % (amount, value))
+        self.stored = value - amount
+        self.since = time
+
+    def time_until(self, amount, time):
+        """Return the seconds until there is `amount` energy, or None if
+        there never will be.
+        """
+        if amount > self.maximum:
+            return None
+        return max(0.0, (amount - self.value(time)) / self.rate)
@@ -9,6 +9,8 @@ class Facts(object):
         self.buildings = buildings
         self.research = research
         self.abilities = abilities
+        self._everything = None
+        self._content_hash = None
     
     def unit_names(self):
         return self.units.keys()
@@ -32,11 +34,14 @@ class Facts(object):
         return self.all().keys()
 
     def all(self):
-        everything = {}
-        everything.update(self.buildings)
-        everything.update(self.units)
-        everything.update(self.research)
-        return everything
+        # Facts do not change once loaded, so only merge them once
+        if self._everything is None:
+            everything = {}
+            everything.update(self.buildings)
+            everything.update(self.units)
+            everything.update(self.research)
+            self._everything = everything
+        return self._everything
 
     def dependencies(self, item_name):
         everything = self.all()
@@ -53,5 +58,19 @@ class Facts(object):
 
     
 
+    def content_hash(self):
+        """Return a stable hash of every fact, so results can be cached per ruleset."""
+        if self._content_hash is None:
+            import hashlib
+            import json
+            content = json.dumps({
+                'units': self.units,
+                'buildings': self.buildings,
+                'research': self.research,
+                'abilities': self.abilities,
+            }, sort_keys=True, default=dict) # Facts may be mappings other than dicts
+            self._content_hash = hashlib.sha1(content).hexdigest()
+        return self._content_hash
+
     def __str__(self):
         return str(sorted(self.all().keys()))
@@ -0,0 +1,568 @@
+"""Generates random build orders from the Facts and the command grammar,
+to benchmark and stress the engine.
+
+Valid build orders only build what the build order has already made
+possible: every item's dependencies and producer come earlier, supply
+depots are added before supply runs out, swaps only move attachments that
+are there, and research is only done once. Scvs are added as minerals are
+spent, and enough to pay for constant commands. Refineries leave most
+workers on minerals, and whatever costs gas has a refinery's worth of
+workers on gas for every GAS_PER_REFINERY spent. Invalid build orders are
+valid ones with one deliberate mistake, named by their `mutation`.
+
+What the generator tracks cannot foresee timing: constant commands that
+use up supply while a slow line waits, or a line still waiting at the time
+limit. So every valid build order is also played once, and cut before the
+first line that could not begin. Every valid build order completes within
+`breaker` seconds, and some are shorter than `length`. Invalid build
+orders are played too, and a mistake that still plays to the end is traded
+for another. Pass verify=False to skip playing them, which is faster but
+may label some build orders wrongly.
+
+Every build order is generated from its own seed, taken from the corpus
+seed and its index, so any one of them can be generated again alone:
+
+    for order in fuzzer.generate_orders(facts, 1000000, seed=7, shape='macro', invalid=0.1):
+        order['name'], order['lines'], order['valid'], order['mutation']
+
+"""
+
+import json
+import os
+import random
+
+import parser
+import terran
+
+
+LIFTABLE_BUILDINGS = ('barracks', 'factory', 'starport')
+ATTACHMENTS = ('tech lab', 'reactor')
+COMMAND_CENTER_ATTACHMENTS = ('orbital command', 'planetary fortress')
+MAX_SUPPLY = 200
+MAX_TIME = 60*15 # seconds of game time a valid build order completes within
+GAS_PER_REFINERY = 400 # gas spent for each refinery's worth of workers on gas
+MINERALS_PER_WORKER = 0.7 # minerals/second, as in mining.MiningRates
+MINERALS_PER_SCV = 300 # minerals spent for each scv on minerals, beyond the first 4
+WORKERS_PER_BASE = 16 # workers on a base's minerals before diminishing returns
+UNKNOWN_ITEMS = ('zergling', 'pylon', 'mothership', 'spine crawler')
+
+# How often each kind of line is chosen, for each shape of build order
+SHAPES = {
+    'balanced': dict(unit=4, building=3, attachment=1, research=1, refinery=1,
+                     constant=0.3, swap=0.3, depot=1, expand=0.2, comment=0.1),
+    'constants': dict(unit=1, building=2, attachment=1, research=0.5, refinery=1,
+                      constant=3, swap=0.2, depot=3, expand=0.3, comment=0.1),
+    'swaps': dict(unit=2, building=3, attachment=3, research=0.5, refinery=1,
+                  constant=0.2, swap=4, depot=1, expand=0.1, comment=0.1),
+    'refineries': dict(unit=2, building=2, attachment=0.5, research=0.5, refinery=4,
+                       constant=0.5, swap=0.1, depot=1, expand=1, comment=0.1),
+    'macro': dict(unit=6, building=2, attachment=1, research=1, refinery=1,
+                  constant=0.5, swap=0.2, depot=2, expand=1, comment=0.1),
+}
+
+# Default number of lines for each shape
+LENGTHS = {
+    'balanced': 30,
+    'constants': 25,
+    'swaps': 30,
+    'refineries': 30,
+    'macro': 200,
+}
+
+MUTATIONS = ('unknown item', 'missing dependency', 'repeated research', 'orphan swap', 'no supply depots')
+
+
+class BuildOrderState(object):
+    """What a build order will have made, line by line, without timing it."""
+
+    def __init__(self):
+        self.buildings = {'command center': 1}
+        self.liftable = [] # [name, attachment name or None], one per liftable building
+        self.free_attachments = {} # attachment name -> count
+        self.command_centers = [None] # attachment name or None, one per command center
+        self.units = set(['scv'])
+        self.research = set()
+        self.constants = set()
+        self.supply_used = 6
+        self.supply_available = 11
+        self.refineries = 0
+        self.workers = 5
+        self.gas_workers = 0
+        self.gas_spent = 0
+        self.minerals_spent = 0
+
+    def names(self):
+        """Return every name a dependency or producer can be satisfied by."""
+        names = set(self.buildings) | self.units | self.research
+        for building, attachment in self.liftable:
+            if attachment is not None:
+                names.add("%s with %s" % (building, attachment))
+                names.add("%s on %s" % (attachment, building))
+        for attachment in self.command_centers:
+            if attachment is not None:
+                names.add("command center with %s" % attachment)
+                names.add("%s on command center" % attachment)
+        return names
+
+
+class BuildOrderGenerator(object):
+    """Generates build orders of a given shape and length, one per seed."""
+
+    def __init__(self, facts, shape='balanced', length=None, verify=True, breaker=MAX_TIME):
+        if shape not in SHAPES:
+            raise Exception("Invalid shape: `%s`" % shape)
+        self.facts = facts
+        self.random = random.Random()
+        self.shape = shape
+        self.weights = sorted(SHAPES[shape].items())
+        self.length = length or LENGTHS[shape]
+        self.verify = verify
+        self.breaker = breaker
+
+        everything = facts.all()
+        producers = {}
+        for producer, abilities in facts.abilities.items():
+            for ability in abilities:
+                if ability in everything:
+                    producers.setdefault(ability, []).append(producer)
+        # item name -> (dependencies, costs gas, names of what can produce it)
+        self.requirements = dict(
+            (name, (tuple(fact['dependencies']), bool(fact['gas']), tuple(producers.get(name, []))))
+            for name, fact in everything.items()
+        )
+
+        # Sorted once, so choices depend only on the seed
+        self.unit_names = sorted(facts.unit_names())
+        self.research_names = sorted(facts.research_names())
+        self.scv_buildings = [b for b in sorted(facts.abilities.get('scv', []))
+                              if facts.is_building(b) and b not in ('refinery', 'supply depot', 'command center')]
+
+    def can_make(self, state, names, item_name):
+        """True iff the state has the dependencies, a producer, and (if the
+        item costs gas) workers on gas for the item.
+        """
+        dependencies, costs_gas, producers = self.requirements[item_name]
+        if any(d not in names for d in dependencies):
+            return False
+        if costs_gas and not self.can_collect_gas(state):
+            return False
+        return any(p in names for p in producers)
+
+    def can_collect_gas(self, state):
+        return state.gas_workers > 0 or \
+            (state.refineries < 2 * len(state.command_centers) and self.spare_workers(state) > 0)
+
+    def spare_workers(self, state):
+        """Workers that can be moved to gas, leaving at least 4, and twice as
+        many as on gas, on minerals.
+        """
+        return min(state.workers - state.gas_workers - 4, (state.workers - 3 * state.gas_workers) // 3)
+
+    def producer_count(self, state, unit):
+        """Return how many of the state's buildings can make `unit` at once."""
+        producers = self.requirements[unit][2]
+        count = sum(n for building, n in state.buildings.items() if building in producers)
+        count += sum(1 for building, attachment in state.liftable
+                     if attachment is not None and "%s with %s" % (building, attachment) in producers)
+        count += sum(1 for attachment in state.command_centers
+                     if attachment is not None and "command center with %s" % attachment in producers)
+        return max(count, 1)
+
+    def choose_kind(self):
+        total = sum(w for k, w in self.weights)
+        pick = self.random.uniform(0, total)
+        for kind, weight in self.weights:
+            pick -= weight
+            if pick <= 0:
+                return kind
+        return self.weights[-1][0]
+
+    def generate(self, seed):
+        """Return a valid build order as a list of lines."""
+        self.random.seed(seed)
+        state = BuildOrderState()
+        lines = []
+        attempts = 0
+        while len(lines) < self.length and attempts < self.length * 20:
+            attempts += 1
+            kind = self.choose_kind()
+            new_lines = getattr(self, 'make_%s' % kind)(state)
+            if new_lines:
+                lines.extend(new_lines)
+                state.minerals_spent += sum(self.minerals(line) for line in new_lines)
+                lines.extend(self.feed_constants(state))
+                lines.extend(self.mine(state))
+        if self.verify:
+            lines = self.playable(lines)
+        return lines
+
+    def play(self, lines):
+        """Play the lines, and return the game, and whether it failed."""
+        game = terran.HotsGame(parser.parse_build_order_lines(lines, self.facts), self.facts, verbose=False)
+        try:
+            game.run(self.breaker)
+        except terran.StarcraftException:
+            return game, True
+        return game, False
+
+    def playable(self, lines):
+        """Play the lines, and return them up to the first line that could
+        not begin. Commands that began always complete, so those lines play
+        the same way again, to the end.
+        """
+        game, failed = self.play(lines)
+        if failed:
+            began = len(game.commands) - len(game.build_order)
+            command_lines = [i for i, line in enumerate(lines) if not line.startswith('#')]
+            return lines[:command_lines[began]]
+        return lines
+
+    def fails(self, lines):
+        """Return True iff the lines cannot be parsed, or do not play to the end."""
+        try:
+            return self.play(lines)[1]
+        except Exception:
+            return True
+
+    def feed_constants(self, state):
+        """Count the units constant commands make while a line is built, about
+        one from each building that can make them, and return the supply
+        depots needed to keep them going.
+        """
+        supply = sum(self.facts.cost(u).get('supply', 0) * self.producer_count(state, u)
+                     for u in state.constants)
+        if not supply:
+            return []
+        lines = self.mine_for_constants(state)
+        if 'scv' in state.constants:
+            state.workers += self.producer_count(state, 'scv')
+        state.supply_used = min(state.supply_used + supply, state.supply_available)
+        while state.supply_available - state.supply_used < 2 * supply and \
+                state.supply_available < MAX_SUPPLY:
+            lines.extend(self.make_depot(state))
+        return lines
+
+    def minerals(self, line):
+        """Return the minerals a line costs, or 0 if it is not an item."""
+        name = line.split(" on ")[0]
+        if name.startswith("refinery"):
+            name = "refinery"
+        everything = self.facts.all()
+        return everything[name]['minerals'] if name in everything else 0
+
+    def mine(self, state, workers=0):
+        """Return the scvs needed, so that there are at least `workers` on
+        minerals, and one more for every MINERALS_PER_SCV spent.
+        """
+        workers = max(workers, 4 + state.minerals_spent // MINERALS_PER_SCV)
+        lines = []
+        while state.workers - state.gas_workers < workers and \
+                state.workers - state.gas_workers < WORKERS_PER_BASE * len(state.command_centers):
+            scv = self.make_worker(state)
+            if not scv:
+                break
+            state.minerals_spent += self.minerals("scv")
+            lines.extend(scv)
+        return lines
+
+    def mine_for_constants(self, state):
+        """Return the scvs needed first, so that the minerals mined pay for
+        the constant commands half again over. Constant commands take minerals
+        before the build order does, so otherwise it may never get any.
+        """
+        spent = sum(self.facts.cost(u)['minerals'] / float(self.facts.cost(u)['build time']) *
+                    self.producer_count(state, u) for u in state.constants)
+        return self.mine(state, int(1.5 * spent / MINERALS_PER_WORKER) + 1)
+
+    def use_supply(self, state, supply):
+        """Return the supply depots needed first, to use `supply` more."""
+        lines = []
+        while state.supply_used + supply > state.supply_available and \
+                state.supply_available < MAX_SUPPLY:
+            lines.extend(self.make_depot(state))
+        if state.supply_used + supply > state.supply_available:
+            return None
+        state.supply_used += supply
+        return lines
+
+    def use_gas(self, state, gas):
+        """Return the scvs and refineries needed first, to have a refinery's
+        worth of workers on gas for every GAS_PER_REFINERY spent, with `gas`
+        more.
+        """
+        if not gas:
+            return []
+        state.gas_spent += gas
+        lines = []
+        while state.gas_workers < 3 * (1 + state.gas_spent // GAS_PER_REFINERY) and \
+                state.refineries < 2 * len(state.command_centers):
+            while self.spare_workers(state) < 3:
+                scv = self.make_worker(state)
+                if not scv:
+                    return lines
+                lines.extend(scv)
+            lines.extend(self.make_refinery(state, workers=3))
+        return lines
+
+    def make_worker(self, state):
+        """Return an scv, and the supply depots it needs first."""
+        depots = self.use_supply(state, self.facts.cost('scv')['supply'])
+        if depots is None:
+            return []
+        state.workers += 1
+        return depots + ["scv"]
+
+    def make_depot(self, state):
+        if state.supply_available >= MAX_SUPPLY:
+            return []
+        state.supply_available = min(state.supply_available + 10, MAX_SUPPLY)
+        state.buildings['supply depot'] = state.buildings.get('supply depot', 0) + 1
+        return ["supply depot"]
+
+    def make_unit(self, state):
+        names = state.names()
+        candidates = [u for u in self.unit_names if self.can_make(state, names, u)]
+        if not candidates:
+            return []
+        unit = self.random.choice(candidates)
+        depots = self.use_supply(state, self.facts.cost(unit).get('supply', 0))
+        if depots is None:
+            return []
+        state.units.add(unit)
+        if unit == 'scv':
+            state.workers += 1
+        return self.use_gas(state, self.facts.cost(unit)['gas']) + depots + [unit]
+
+    def make_building(self, state):
+        names = state.names()
+        candidates = [b for b in self.scv_buildings if self.can_make(state, names, b)]
+        if not candidates:
+            return []
+        building = self.random.choice(candidates)
+        state.buildings[building] = state.buildings.get(building, 0) + 1
+        if building in LIFTABLE_BUILDINGS:
+            state.liftable.append([building, None])
+        return self.use_gas(state, self.facts.cost(building)['gas']) + [building]
+
+    def make_expand(self, state):
+        state.buildings['command center'] += 1
+        state.command_centers.append(None)
+        return ["command center"]
+
+    def make_refinery(self, state, workers=None):
+        if state.refineries >= 2 * len(state.command_centers):
+            return []
+        if workers is None:
+            # Mostly saturated refineries, as in real build orders
+            workers = self.random.choice([3, 3, 3, 2, 1, 0])
+        workers = max(0, min(workers, self.spare_workers(state)))
+        state.refineries += 1
+        state.gas_workers += workers
+        state.buildings['refinery'] = state.buildings.get('refinery', 0) + 1
+        return ["refinery %s" % workers]
+
+    def make_attachment(self, state):
+        names = state.names()
+        candidates = []
+        for i, (building, attachment) in enumerate(state.liftable):
+            if attachment is None:
+                candidates.extend(("%s on %s" % (a, building), i, a) for a in ATTACHMENTS
+                                  if self.can_make(state, names, a))
+        for i, attachment in enumerate(state.command_centers):
+            if attachment is None:
+                candidates.extend((a, -1 - i, a) for a in COMMAND_CENTER_ATTACHMENTS
+                                  if all(d in names for d in self.facts.dependencies(a)) and
+                                      (not self.facts.cost(a)['gas'] or self.can_collect_gas(state)))
+        if not candidates:
+            return []
+        line, i, attachment = self.random.choice(sorted(set(candidates)))
+        if i >= 0:
+            state.liftable[i][1] = attachment
+        else:
+            state.command_centers[-1 - i] = attachment
+        return self.use_gas(state, self.facts.cost(attachment)['gas']) + [line]
+
+    def make_research(self, state):
+        names = state.names()
+        candidates = [r for r in self.research_names
+                      if r not in state.research and self.can_make(state, names, r)]
+        if not candidates:
+            return []
+        research = self.random.choice(candidates)
+        state.research.add(research)
+        return self.use_gas(state, self.facts.cost(research)['gas']) + [research]
+
+    def make_constant(self, state):
+        names = state.names()
+        candidates = [u for u in self.unit_names
+                      if u not in state.constants and u != 'mule' and self.can_make(state, names, u)]
+        if not candidates:
+            return []
+        unit = self.random.choice(candidates)
+        state.constants.add(unit)
+        state.units.add(unit)
+        gas = self.use_gas(state, self.facts.cost(unit)['gas'])
+        scvs = self.mine_for_constants(state)
+        # The engine stops a build that is supply blocked with no depot on
+        # the way, so get one going right after the constant command
+        return gas + scvs + ["constant %ss" % unit] + self.make_depot(state) + self.feed_constants(state)
+
+    def make_swap(self, state):
+        candidates = []
+        for i, (building, attachment) in enumerate(state.liftable):
+            if attachment is not None:
+                candidates.append(('remove', i, attachment))
+            else:
+                candidates.extend(('move', i, a) for a in sorted(state.free_attachments)
+                                  if state.free_attachments[a])
+        # Only swap buildings that are the only one of their kind, so the
+        # engine swaps the same buildings this state does
+        only = dict((b, i) for i, (b, a) in enumerate(state.liftable)
+                    if state.buildings.get(b) == 1)
+        for first in sorted(only):
+            for second in sorted(only):
+                if first < second and (state.liftable[only[first]][1] or state.liftable[only[second]][1]):
+                    candidates.append(('swap', only[first], only[second]))
+        if not candidates:
+            return []
+
+        action, i, other = self.random.choice(candidates)
+        building = state.liftable[i][0]
+        if action == 'remove':
+            state.liftable[i][1] = None
+            state.free_attachments[other] = state.free_attachments.get(other, 0) + 1
+            return ["remove %s from %s" % (building, other)]
+        if action == 'move':
+            state.liftable[i][1] = other
+            state.free_attachments[other] -= 1
+            return ["move %s onto %s" % (building, other)]
+        state.liftable[i][1], state.liftable[other][1] = state.liftable[other][1], state.liftable[i][1]
+        return ["swap %s and %s" % (building, state.liftable[other][0])]
+
+    def make_comment(self, state):
+        return ["# %s" % self.random.choice(["scout", "wall off", "hold the ramp", "push"])]
+
+    def mutate(self, lines):
+        """Return (lines with one deliberate mistake, the name of the mistake).
+        When verifying, a mistake is only kept if the lines then fail.
+        """
+        mutations = list(MUTATIONS)
+        self.random.shuffle(mutations)
+        for mutation in mutations:
+            mutated = self.apply_mutation(mutation, list(lines))
+            if mutated is not None and (not self.verify or self.fails(mutated)):
+                return mutated, mutation
+        # Every build order can get an unknown item
+        return self.apply_mutation('unknown item', list(lines)), 'unknown item'
+
+    def apply_mutation(self, mutation, lines):
+        """Return the mutated lines, or None if this mutation does not apply."""
+        if mutation == 'unknown item':
+            lines.insert(self.random.randint(0, len(lines)), self.random.choice(UNKNOWN_ITEMS))
+            return lines
+        if mutation == 'missing dependency':
+            # Move the first line that depends on something the game does
+            # not start with to the front
+            everything = self.facts.all()
+            start = BuildOrderState().names()
+            for i, line in enumerate(lines):
+                if i > 0 and line in everything and \
+                        any(d not in start for d in self.facts.dependencies(line)):
+                    return [line] + lines[:i] + lines[i + 1:]
+            return None
+        if mutation == 'repeated research':
+            research = [i for i, line in enumerate(lines) if self.facts.is_research(line)]
+            if not research:
+                return None
+            i = self.random.choice(research)
+            lines.insert(i + 1, lines[i])
+            return lines
+        if mutation == 'orphan swap':
+            lines.insert(0, "move %s onto %s" % (self.random.choice(LIFTABLE_BUILDINGS), self.random.choice(ATTACHMENTS)))
+            return lines
+        if mutation == 'no supply depots':
+            if "supply depot" not in lines:
+                return None
+            return [line for line in lines if line != "supply depot"]
+        raise Exception("Invalid mutation: `%s`" % mutation)
+
+
+def order_seed(seed, index):
+    """Return the seed of one build order of a corpus."""
+    return seed * 1000003 + index
+
+
+def generate_order(facts, seed=0, index=0, shape='balanced', length=None, invalid=0.0, generator=None,
+                   verify=True, breaker=MAX_TIME):
+    """Return one build order as a dict of its name, lines, and whether it
+    is valid, or else its mutation. `invalid` is the chance it is invalid.
+    """
+    generator = generator or BuildOrderGenerator(facts, shape, length, verify, breaker)
+    lines = generator.generate(order_seed(seed, index))
+    mutation = None
+    if generator.random.random() < invalid:
+        lines, mutation = generator.mutate(lines)
+    return {
+        'name': "fuzz-%s-%s-%s" % (shape, seed, index),
+        'seed': seed,
+        'index': index,
+        'shape': shape,
+        'valid': mutation is None,
+        'mutation': mutation,
+        'lines': lines,
+    }
+
+
+def generate_orders(facts, count, seed=0, shape='balanced', length=None, invalid=0.0, start=0,
+                    verify=True, breaker=MAX_TIME):
+    """Yield `count` build orders, one at a time, from index `start`."""
+    generator = BuildOrderGenerator(facts, shape, length, verify, breaker)
+    for index in xrange(start, start + count):
+        yield generate_order(facts, seed, index, shape, length, invalid, generator)
+
+
+def write_jsonl(path, orders):
+    """Stream build orders to a file, one JSON object per line, and return how many."""
+    count = 0
+    with open(path, 'w') as f:
+        for order in orders:
+            f.write(json.dumps(order, sort_keys=True))
+            f.write('\n')
+            count += 1
+    return count
+
+
+def read_jsonl(path):
+    """Yield the build orders of a file written by write_jsonl, one at a time."""
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def write_directory(directory, orders):
+    """Write build orders as .txt files, as in input_examples/, and return how many."""
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    count = 0
+    for order in orders:
+        with open(os.path.join(directory, order['name'] + '.txt'), 'w') as f:
+            f.write("# %s\n" % (order['mutation'] or 'valid'))
+            f.write("\n".join(order['lines']))
+            f.write("\n")
+        count += 1
+    return count
+
+
+def chunks(orders, size):
+    """Yield lists of up to `size` build orders, to feed the batch runner a
+    piece of a corpus at a time.
+    """
+    chunk = []
+    for order in orders:
+        chunk.append(order)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
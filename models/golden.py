@@ -0,0 +1,194 @@
+"""Golden timelines, to prove a change to the engine does not change the
+timing of any build order.
+
+A timeline is a compact, canonical list of everything that happened in a
+game, in order:
+
+    [time, 'begin', command]       a command began
+    [time, 'complete', command]    a command completed
+    [time, 'supply', used, available]
+    [time, 'end', minerals, gas, error]
+
+Commands are written in their canonical form, so a timeline does not
+change when a build order file is only reformatted.
+
+    results = golden.run_regression(paths, ruleset, "regression/goldens")
+    golden.print_report(results)
+
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+
+import terran
+
+
+MAX_TIME = 60*15 # seconds of game time
+
+# Statuses of a build order, compared with its golden timeline
+SAME = 'same'
+CHANGED = 'changed'
+NEW = 'new' # no golden timeline yet
+UPDATED = 'updated'
+
+# Set in each worker process by _init_worker
+_WORKER_STATE = {}
+
+
+def _number(value):
+    """Write whole floats as ints, so 855.0 and 855 are the same timeline."""
+    if value == int(value):
+        return int(value)
+    return round(value, 3)
+
+
+def timeline(game, error=None):
+    """Return the timeline of a played game, and the error that stopped it."""
+    events = [[time, kind, command.canonical()] for time, kind, command in game.events]
+    supply = [[time, 'supply', used, available] for time, used, available in game.supply_changes]
+    # Sorting is stable, so commands come before the supply change they caused
+    merged = sorted(events + supply, key=lambda event: event[0])
+    merged.append([game.time, 'end', _number(game.minerals_available), _number(game.gas_available), error])
+    return merged
+
+
+def timeline_hash(events):
+    return hashlib.sha1(json.dumps(events, separators=(',', ':'))).hexdigest()
+
+
+def play(build_order, facts, breaker=MAX_TIME):
+    """Play a build order, and return its timeline."""
+    game = terran.HotsGame(list(build_order), facts, verbose=False)
+    error = None
+    try:
+        game.run(breaker)
+    except Exception as e:
+        error = "%s: %s" % (e.__class__.__name__, e)
+    return timeline(game, error)
+
+
+def first_divergence(expected, actual):
+    """Return (index, expected event, actual event) for the first event
+    where two timelines differ, or None if they are the same. An event is
+    None past the end of its timeline.
+    """
+    for index in range(max(len(expected), len(actual))):
+        expected_event = expected[index] if index < len(expected) else None
+        actual_event = actual[index] if index < len(actual) else None
+        if expected_event != actual_event:
+            return index, expected_event, actual_event
+    return None
+
+
+def golden_filename(directory, path):
+    """Return the golden file for a build order file, named after its path."""
+    name = os.path.splitext(os.path.normpath(path))[0].replace(os.sep, '__')
+    return os.path.join(directory, name + '.json')
+
+
+def load_golden(directory, path):
+    filename = golden_filename(directory, path)
+    if not os.path.exists(filename):
+        return None
+    with open(filename) as f:
+        return json.load(f)
+
+
+def save_golden(directory, path, events):
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    # One event per line, so goldens stay small and diff well
+    with open(golden_filename(directory, path), 'w') as f:
+        f.write('{"path": %s, "hash": "%s", "timeline": [\n' % (json.dumps(path), timeline_hash(events)))
+        f.write(',\n'.join(json.dumps(event) for event in events))
+        f.write('\n]}\n')
+
+
+class RegressionResult(object):
+    """A build order's timeline, compared with its golden timeline."""
+
+    def __init__(self, path, status, divergence=None, error=None):
+        self.path = path
+        self.status = status
+        self.divergence = divergence # (index, expected event, actual event)
+        self.error = error # why the build order could not be played
+
+    def __repr__(self):
+        return "<RegressionResult: %s %s>" % (self.path, self.status)
+
+
+def _init_worker(facts, breaker):
+    _WORKER_STATE.update(facts=facts, breaker=breaker)
+
+
+def _play(task):
+    path, build_order = task
+    return path, play(build_order, _WORKER_STATE['facts'], _WORKER_STATE['breaker'])
+
+
+def run_regression(paths, ruleset, directory, update=False, processes=None, breaker=MAX_TIME):
+    """Play every build order file, compare each timeline with its golden
+    timeline in `directory`, and return a list of RegressionResults in the
+    order of `paths`.
+
+    With `update`, changed and new timelines are saved as the new goldens.
+    Pass processes=1 to run in this process.
+    """
+    results = {}
+    tasks = []
+    for path in paths:
+        try:
+            tasks.append((path, ruleset.parse_build_order_file(path)))
+        except Exception as e:
+            results[path] = RegressionResult(path, CHANGED, error=str(e))
+
+    initargs = (ruleset.facts(), breaker)
+    if processes == 1:
+        _init_worker(*initargs)
+        timelines = [_play(task) for task in tasks]
+    else:
+        pool = multiprocessing.Pool(processes, initializer=_init_worker, initargs=initargs)
+        try:
+            timelines = pool.map(_play, tasks)
+        finally:
+            pool.close()
+            pool.join()
+
+    for path, events in timelines:
+        # JSON has no tuples, so compare against the timeline as it would be loaded
+        events = json.loads(json.dumps(events))
+        golden = load_golden(directory, path)
+        if golden is not None and golden['hash'] == timeline_hash(events):
+            results[path] = RegressionResult(path, SAME)
+            continue
+
+        divergence = None
+        if golden is not None:
+            divergence = first_divergence(golden['timeline'], events)
+        if update:
+            save_golden(directory, path, events)
+            status = UPDATED
+        else:
+            status = CHANGED if golden is not None else NEW
+        results[path] = RegressionResult(path, status, divergence=divergence)
+
+    return [results[path] for path in paths]
+
+
+def print_report(results):
+    for result in results:
+        print "%-8s %s" % (result.status.upper(), result.path)
+        if result.error:
+            print "         could not parse: %s" % result.error
+        if result.divergence:
+            index, expected, actual = result.divergence
+            print "         first divergence at event %s:" % index
+            print "           expected %s" % json.dumps(expected)
+            print "           actual   %s" % json.dumps(actual)
+
+    counts = {}
+    for result in results:
+        counts[result.status] = counts.get(result.status, 0) + 1
+    print ", ".join("%s %s" % (count, status) for status, count in sorted(counts.items()))
@@ -0,0 +1,227 @@
+"""Compare build orders against each other by army value over time: when
+does build A's army first exceed build B's, and for how long is it ahead?
+
+    matrix = matchup.run_matchups({"reaper FE": build_order, ...}, facts, value=matchup.SUPPLY)
+    matrix.crossover[a, b]   # first second A's army is bigger than B's, or NEVER
+    matrix.print_report()
+
+Every build order is simulated once, and its army value is kept as an
+array with one value per second. The N x N matrices are computed with NumPy
+broadcasting, a block of rows at a time, so memory stays bounded however
+many build orders there are.
+"""
+
+import multiprocessing
+
+import numpy
+
+import terran
+
+
+SUPPLY = 'supply'
+RESOURCES = 'resources' # minerals + gas
+VALUES = (SUPPLY, RESOURCES)
+
+WORKERS = ('scv', 'mule') # units that are not army
+NEVER = -1 # in crossover and window matrices, A is never ahead of B
+
+MAX_TIME = 60*15 # seconds of game time
+BLOCK_BYTES = 64 * 1024 * 1024 # memory for each block of pairwise differences
+
+# Set in each worker process by _init_worker
+_WORKER_STATE = {}
+
+
+def army_value(facts, unit_name, value=SUPPLY):
+    cost = facts.cost(unit_name)
+    if value == SUPPLY:
+        return cost.get('supply', 0)
+    if value == RESOURCES:
+        return cost['minerals'] + cost['gas']
+    raise Exception("Invalid army value: `%s`" % value)
+
+
+def army_events(game, value=SUPPLY):
+    """Return a list of (time, value) for every army unit the game completed."""
+    facts = game.facts
+    return [(time, army_value(facts, command.item_name, value))
+            for time, kind, command in game.events
+            if kind == 'complete' and facts.is_unit(command.item_name)
+            and command.item_name not in WORKERS]
+
+
+def army_curve(events, horizon):
+    """Return an array of the army value at each second from 0 to `horizon`."""
+    curve = numpy.zeros(horizon + 1, dtype=numpy.int32)
+    events = [(time, value) for time, value in events if time <= horizon]
+    if events:
+        times, values = zip(*events)
+        numpy.add.at(curve, numpy.array(times, dtype=numpy.int64), numpy.array(values, dtype=numpy.int32))
+    return numpy.cumsum(curve, dtype=numpy.int32)
+
+
+def _init_worker(facts, mining_rates, value, breaker):
+    _WORKER_STATE.update(facts=facts, mining_rates=mining_rates, value=value, breaker=breaker)
+
+
+def _simulate(build_order):
+    """Play a build order, and return (army events, error or None)."""
+    game = terran.HotsGame(
+        list(build_order),
+        _WORKER_STATE['facts'],
+        mining_rates=_WORKER_STATE['mining_rates'],
+        verbose=False,
+    )
+    error = None
+    try:
+        game.run(_WORKER_STATE['breaker'])
+    except Exception as e:
+        error = e.__class__.__name__ # The army built before the failure still counts
+    return army_events(game, _WORKER_STATE['value']), error
+
+
+def _first(mask, axis, default):
+    """Return the index of the first True along `axis`, or `default` where there is none."""
+    first = numpy.argmax(mask, axis=axis)
+    # argmax is 0 both where the first True is at 0 and where there is none
+    found = numpy.take_along_axis(mask, numpy.expand_dims(first, axis), axis).squeeze(axis)
+    first = first.astype(numpy.int32)
+    first[~found] = default
+    return first
+
+
+class MatchupMatrix(object):
+    """Army curves of N build orders, and N x N matrices comparing every
+    pair. For every [a, b]:
+
+        crossover       first second a's army is bigger than b's, or NEVER
+        window_end      the second a is no longer ahead after crossover,
+                        or horizon + 1 if it stays ahead, or NEVER
+        ahead_seconds   seconds a's army is bigger than b's, in total
+        max_advantage   the most a's army is ever ahead of b's (negative if never)
+    """
+
+    def __init__(self, names, curves, value, errors=None):
+        self.names = names
+        self.curves = curves # (N, horizon + 1)
+        self.value = value
+        self.errors = errors or {}
+        self.horizon = curves.shape[1] - 1
+
+        n = len(names)
+        self.crossover = numpy.empty((n, n), dtype=numpy.int32)
+        self.window_end = numpy.empty((n, n), dtype=numpy.int32)
+        self.ahead_seconds = numpy.empty((n, n), dtype=numpy.int32)
+        self.max_advantage = numpy.empty((n, n), dtype=numpy.int32)
+        if n:
+            self.compute()
+
+    def __repr__(self):
+        return "<MatchupMatrix: %s build orders, %s seconds, by %s>" % (len(self.names), self.horizon, self.value)
+
+    def block_rows(self, itemsize):
+        """Rows per block, so each block of differences fits in BLOCK_BYTES."""
+        row_bytes = self.curves.shape[0] * self.curves.shape[1] * itemsize
+        return max(1, BLOCK_BYTES // max(row_bytes, 1))
+
+    def compute(self):
+        seconds = numpy.arange(self.horizon + 1, dtype=numpy.int32)
+        # Army values are never negative, so if they fit in an int16 so do
+        # their differences, and the blocks are half the size
+        curves = self.curves
+        if curves.max() <= numpy.iinfo(numpy.int16).max:
+            curves = curves.astype(numpy.int16)
+        rows = self.block_rows(curves.itemsize)
+        for start in range(0, len(self.names), rows):
+            stop = min(start + rows, len(self.names))
+            # (rows, N, seconds): row a's curve minus every b's curve
+            difference = curves[start:stop, None, :] - curves[None, :, :]
+            ahead = difference > 0
+
+            crossover = _first(ahead, 2, NEVER)
+            # The first second at or after the crossover that a is not ahead
+            behind_after = ~ahead & (seconds[None, None, :] >= crossover[:, :, None])
+            window_end = _first(behind_after, 2, self.horizon + 1)
+            window_end[crossover == NEVER] = NEVER
+
+            self.crossover[start:stop] = crossover
+            self.window_end[start:stop] = window_end
+            self.ahead_seconds[start:stop] = ahead.view(numpy.int8).sum(axis=2, dtype=numpy.int32)
+            self.max_advantage[start:stop] = difference.max(axis=2)
+
+    def index(self, name):
+        return self.names.index(name)
+
+    def pair(self, a, b):
+        """Return the comparison of build order `a` against `b`, by name."""
+        i, j = self.index(a), self.index(b)
+        return {
+            'crossover': int(self.crossover[i, j]),
+            'window_end': int(self.window_end[i, j]),
+            'ahead_seconds': int(self.ahead_seconds[i, j]),
+            'max_advantage': int(self.max_advantage[i, j]),
+        }
+
+    def save(self, path):
+        numpy.savez_compressed(
+            path,
+            names=numpy.array(self.names),
+            curves=self.curves,
+            crossover=self.crossover,
+            window_end=self.window_end,
+            ahead_seconds=self.ahead_seconds,
+            max_advantage=self.max_advantage,
+        )
+
+    def print_report(self, limit=20):
+        """Print each build order's win count, and the crossover times of the first `limit`."""
+        def format_time(seconds):
+            if seconds == NEVER:
+                return "-"
+            return "%d:%02d" % (seconds // 60, seconds % 60)
+
+        print "Army %s over %s seconds, %s build orders" % (self.value, self.horizon, len(self.names))
+        # a beats b if a is ahead for longer than b is
+        wins = (self.ahead_seconds > self.ahead_seconds.T).sum(axis=1)
+        for i in numpy.argsort(-wins, kind='mergesort')[:limit]:
+            error = self.errors.get(self.names[i])
+            print "  %-40s ahead of %s%s" % (self.names[i], wins[i], " (%s)" % error if error else "")
+
+        shown = range(min(limit, len(self.names)))
+        print
+        print "Crossover times (row's army first bigger than column's):"
+        print "  %-24s %s" % ("", " ".join("%6s" % j for j in shown))
+        for i in shown:
+            print "  %-24s %s" % (self.names[i][-24:], " ".join("%6s" % format_time(self.crossover[i, j]) for j in shown))
+
+
+def run_matchups(build_orders, facts, value=SUPPLY, horizon=None, mining_rates=None,
+                 processes=None, breaker=MAX_TIME):
+    """Simulate every build order in a dict of {name: commands} once, and
+    return their MatchupMatrix. The horizon defaults to the longest game.
+    Pass processes=1 to run in this process.
+    """
+    if value not in VALUES:
+        raise Exception("Invalid army value: `%s`" % value)
+    names = sorted(build_orders)
+    initargs = (facts, mining_rates, value, breaker)
+    if processes == 1:
+        _init_worker(*initargs)
+        results = [_simulate(build_orders[name]) for name in names]
+    else:
+        pool = multiprocessing.Pool(processes, initializer=_init_worker, initargs=initargs)
+        try:
+            results = pool.map(_simulate, [build_orders[name] for name in names])
+        finally:
+            pool.close()
+            pool.join()
+
+    if horizon is None:
+        horizon = max([time for events, error in results for time, v in events] + [0])
+    curves = numpy.zeros((len(names), horizon + 1), dtype=numpy.int32)
+    errors = {}
+    for i, (events, error) in enumerate(results):
+        curves[i] = army_curve(events, horizon)
+        if error:
+            errors[names[i]] = error
+    return MatchupMatrix(names, curves, value, errors)
@@ -0,0 +1,306 @@
+"""Counters, gauges, and histograms of how the simulator is doing, for
+watching batch runs and the simulation service in production.
+
+Recording a value only adds to a number; the text is only formatted when
+the metrics are written or scraped, so metrics cost next to nothing when
+nobody reads them.
+
+    metrics.SIMULATIONS.inc()
+    metrics.FAILURES.inc(labels=('SupplyBlocked',))
+    metrics.write_file("metrics.txt")          # OpenMetrics text
+    metrics.start_http_server(9642)            # or serve it on /metrics
+
+Worker processes have their own copy of the registry. A worker resets it
+when it starts, and sends back what it recorded with each result, as
+`REGISTRY.drain()`, for the parent to `merge`.
+"""
+
+import bisect
+import os
+import thread
+
+from collections import OrderedDict
+
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+COUNTER = 'counter'
+GAUGE = 'gauge'
+HISTOGRAM = 'histogram'
+
+# Upper bounds of histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value):
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = [(n, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for n, v in pairs]
+    return '{%s}' % ','.join('%s="%s"' % pair for pair in escaped)
+
+
+class Metric(object):
+    """A family of values of one name, one for each set of label values."""
+
+    kind = None
+
+    def __init__(self, registry, name, help, labels=()):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.values = {} # label values -> value
+
+    def __repr__(self):
+        return "<%s: %s, %s series>" % (self.__class__.__name__, self.name, len(self.values))
+
+    def reset(self):
+        self.values.clear()
+
+    def samples(self):
+        """Return a list of (name, labels text, value) to expose."""
+        raise NotImplementedError()
+
+    def exposition(self):
+        lines = ["# TYPE %s %s" % (self.name, self.kind), "# HELP %s %s" % (self.name, self.help)]
+        lines.extend("%s%s %s" % (name, labels, _format_value(value)) for name, labels, value in self.samples())
+        return lines
+
+
+class Counter(Metric):
+    """A value that only goes up, such as the number of games played."""
+
+    kind = COUNTER
+
+    def inc(self, amount=1, labels=()):
+        with self.registry.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def value(self, labels=()):
+        return self.values.get(labels, 0)
+
+    def samples(self):
+        if not self.values and not self.label_names:
+            return [(self.name + '_total', '', 0)]
+        return [(self.name + '_total', _format_labels(self.label_names, labels), value)
+                for labels, value in sorted(self.values.items())]
+
+    def merge(self, values):
+        for labels, value in values.items():
+            self.values[labels] = self.values.get(labels, 0) + value
+
+
+class Gauge(Metric):
+    """A value that goes up and down, such as the number of queued games."""
+
+    kind = GAUGE
+
+    def set(self, value, labels=()):
+        with self.registry.lock:
+            self.values[labels] = value
+
+    def inc(self, amount=1, labels=()):
+        with self.registry.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, amount=1, labels=()):
+        self.inc(-amount, labels)
+
+    def value(self, labels=()):
+        return self.values.get(labels, 0)
+
+    def samples(self):
+        if not self.values and not self.label_names:
+            return [(self.name, '', 0)]
+        return [(self.name, _format_labels(self.label_names, labels), value)
+                for labels, value in sorted(self.values.items())]
+
+    def merge(self, values):
+        pass # A gauge is only meaningful in the process that sets it
+
+
+class Histogram(Metric):
+    """Observations counted into buckets by size, such as wall times."""
+
+    kind = HISTOGRAM
+
+    def __init__(self, registry, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super(Histogram, self).__init__(registry, name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, labels=()):
+        with self.registry.lock:
+            series = self.values.get(labels)
+            if series is None:
+                # A count for each bucket and one past the last, then the sum
+                series = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def count(self, labels=()):
+        series = self.values.get(labels)
+        return sum(series[:-1]) if series else 0
+
+    def samples(self):
+        samples = []
+        for labels, series in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series[:-1]):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else _format_value(bound)
+                samples.append((self.name + '_bucket', _format_labels(self.label_names, labels, [('le', le)]), cumulative))
+            samples.append((self.name + '_count', _format_labels(self.label_names, labels), cumulative))
+            samples.append((self.name + '_sum', _format_labels(self.label_names, labels), series[-1]))
+        return samples
+
+    def merge(self, values):
+        for labels, series in values.items():
+            mine = self.values.setdefault(labels, [0] * (len(self.buckets) + 1) + [0.0])
+            for i, value in enumerate(series):
+                mine[i] += value
+
+
+class Registry(object):
+    """Every metric, by name, in the order they were made."""
+
+    def __init__(self):
+        self.metrics = OrderedDict()
+        self.lock = thread.allocate_lock() # the same as threading.Lock, without importing threading
+
+    def __repr__(self):
+        return "<Registry: %s metrics>" % len(self.metrics)
+
+    def _add(self, metric_class, name, help, **kwargs):
+        metric = self.metrics.get(name)
+        if metric is None:
+            metric = self.metrics[name] = metric_class(self, name, help, **kwargs)
+        elif not isinstance(metric, metric_class):
+            raise Exception("Metric already registered as a %s: `%s`" % (metric.kind, name))
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self._add(Counter, name, help, labels=labels)
+
+    def gauge(self, name, help, labels=()):
+        return self._add(Gauge, name, help, labels=labels)
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram, name, help, labels=labels, buckets=buckets)
+
+    def reset(self):
+        with self.lock:
+            for metric in self.metrics.values():
+                metric.reset()
+
+    def drain(self):
+        """Return what the counters and histograms recorded since the last
+        drain, as plain values that can be pickled, and reset them.
+        """
+        with self.lock:
+            drained = {}
+            for name, metric in self.metrics.items():
+                if metric.kind != GAUGE and metric.values:
+                    drained[name] = metric.values
+                    metric.values = {}
+            return drained
+
+    def merge(self, drained):
+        """Add what another process drained to this registry."""
+        with self.lock:
+            for name, values in drained.items():
+                if name in self.metrics:
+                    self.metrics[name].merge(values)
+
+    def exposition(self):
+        """Return every metric as OpenMetrics text."""
+        with self.lock:
+            lines = []
+            for metric in self.metrics.values():
+                lines.extend(metric.exposition())
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+SIMULATIONS = REGISTRY.counter('ghostacademy_simulations', "Games played, to the end or to a failure.")
+SIMULATED_SECONDS = REGISTRY.counter('ghostacademy_simulated_seconds', "Seconds of game time played.")
+SIMULATION_WALL_SECONDS = REGISTRY.histogram('ghostacademy_simulation_wall_seconds', "Wall time to play one game.")
+FAILURES = REGISTRY.counter('ghostacademy_failures', "Games and build orders that failed, by exception type.",
+                            labels=('type',))
+PARSE_SECONDS = REGISTRY.histogram('ghostacademy_parse_seconds', "Wall time to parse one build order.")
+FACTS_LOAD_SECONDS = REGISTRY.histogram('ghostacademy_facts_load_seconds', "Wall time to load a ruleset's facts.",
+                                        labels=('ruleset',))
+QUEUE_DEPTH = REGISTRY.gauge('ghostacademy_queue_depth', "Games waiting for, or running in, a worker pool.",
+                             labels=('pool',))
+BATCH_SIMULATIONS_PER_SECOND = REGISTRY.gauge('ghostacademy_batch_simulations_per_second',
+                                              "Games played per wall second by the last batch.")
+BATCH_SIMULATED_SECONDS_PER_SECOND = REGISTRY.gauge('ghostacademy_batch_simulated_seconds_per_second',
+                                                    "Seconds of game time played per wall second by the last batch.")
+REQUESTS = REGISTRY.counter('ghostacademy_requests', "Requests to the simulation service, by status.",
+                            labels=('status',))
+REQUEST_SECONDS = REGISTRY.histogram('ghostacademy_request_seconds', "Wall time to answer a simulation request.")
+
+
+def record_simulation(game_seconds, wall_seconds, error=None):
+    SIMULATIONS.inc()
+    SIMULATED_SECONDS.inc(game_seconds)
+    SIMULATION_WALL_SECONDS.observe(wall_seconds)
+    if error is not None:
+        FAILURES.inc(labels=(error,))
+
+
+def reset():
+    """Forget everything, such as a worker process inherited from its parent."""
+    REGISTRY.reset()
+
+
+def write_file(path, registry=REGISTRY):
+    """Write the metrics as OpenMetrics text, replacing the file at once,
+    so a reader never sees half of it.
+    """
+    temporary = "%s.%s.tmp" % (path, os.getpid())
+    with open(temporary, 'w') as f:
+        f.write(registry.exposition())
+    os.rename(temporary, path)
+
+
+def respond_with_metrics(handler, registry=REGISTRY):
+    body = registry.exposition()
+    handler.send_response(200)
+    handler.send_header('Content-Type', CONTENT_TYPE)
+    handler.send_header('Content-Length', str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+def start_http_server(port, host='127.0.0.1', registry=REGISTRY):
+    """Serve the metrics on http://host:port/metrics from a background
+    thread, and return the server.
+    """
+    import BaseHTTPServer
+    import threading
+
+    class MetricsRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path != '/metrics':
+                self.send_error(404)
+                return
+            respond_with_metrics(self, registry)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = BaseHTTPServer.HTTPServer((host, port), MetricsRequestHandler)
+    serving = threading.Thread(target=server.serve_forever)
+    serving.daemon = True
+    serving.start()
+    return server
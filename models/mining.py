@@ -0,0 +1,290 @@
+"""The resource collection model.
+
+Income is computed per resource node (a base's mineral line, or a refinery's
+geyser) from the number of workers assigned to it, rather than per scv.
+
+    HotS - 34 minerals per 60 seconds for 1 scv (0.56m/s)
+        "From 0 to 2 SCVs/patch, each additional SCV adds ~39-45 minerals/game minute."
+        42 minerals / 60s = 0.700 m/s
+
+        "A base with 8 mineral patches will yield ~672 minerals/min with 16 SCVs, or ~816 minerals with 24 SCVs."
+        0.700 m/s, or (816 - 672) / 60 / 8 = 0.300 m/s for each third scv on a patch
+
+    Each of the three workers on a single geyser will collect approximately
+    38 gas per minute, with saturation at approximately 114 gas/min.
+
+"""
+
+import abc
+
+MINERALS = 'minerals'
+GAS = 'gas'
+
+
+class MiningRates(object):
+    """The collection constants used by the mining model.
+
+    Every value can be overridden, so that balance changes can be simulated
+    without editing this file.
+    """
+
+    # TODO: FACT CHECK
+    mineral_collection_rate = 0.700 # minerals/second, for the first 2 scvs on a patch
+    oversaturated_mineral_rate = 0.300 # minerals/second, for the third scv on a patch
+    minerals_per_trip = 5
+    mineral_patches = 8 # patches per base
+    patch_saturation = 2 # scvs per patch before diminishing returns
+    patch_max_workers = 3 # scvs per patch before extra scvs collect nothing
+
+    # TODO: FACT CHECK
+    gas_collection_rate = 38.0/60.0 # gas/second, per worker
+    gas_per_trip = 4
+    geyser_saturation = 3 # scvs per geyser before extra scvs collect nothing
+    geysers_per_base = 2
+
+    # TODO: FACT CHECK
+    mule_minerals_per_trip = 30
+    mule_trip_time = 10 # seconds per trip
+    mule_duration = 90 # seconds until the mule expires
+    worker_transfer_delay = 0 # seconds for transferred workers to reach their new node
+
+    def __init__(self, **overrides):
+        for key, value in overrides.items():
+            if not hasattr(self, key):
+                raise Exception("Invalid mining rate: `%s`" % key)
+            setattr(self, key, value)
+
+    def __repr__(self):
+        return "<MiningRates: %s>" % self.__dict__
+
+    def values(self):
+        """Return every rate, overridden or not, as a dict."""
+        return dict((k, getattr(self, k)) for k in dir(self.__class__)
+                    if not k.startswith('_') and not callable(getattr(self, k)))
+
+
+class ResourceNode(object):
+    """Something workers collect from. Income accumulates for the node as a
+    whole, and is paid out one trip at a time.
+    """
+    __metaclass__ = abc.ABCMeta
+
+    resource = None
+
+    def __init__(self, rates, trip_factor=None):
+        self.rates = rates
+        self.workers = []
+        self.queued = 0
+        # Scales the collection rate until the next trip is paid out
+        self.trip_factor = trip_factor
+        self.factor = trip_factor() if trip_factor else 1.0
+
+    def __repr__(self):
+        return "<%s: %s workers>" % (self.__class__.__name__, len(self.workers))
+
+    @abc.abstractmethod
+    def collection_rate(self):
+        """Return the amount of this resource collected per second."""
+
+    @abc.abstractmethod
+    def per_trip(self):
+        """Return the amount of this resource paid out per trip."""
+
+    @abc.abstractmethod
+    def saturation(self):
+        """The number of workers this node can use at full efficiency."""
+
+    @abc.abstractmethod
+    def capacity(self):
+        """The number of workers beyond which extra workers collect nothing."""
+
+    def tick(self):
+        """Return the amount of this resource collected this second.
+
+        In stochastic mode, every trip is made a little faster or slower.
+        """
+        if not self.workers:
+            return 0
+        self.queued += self.collection_rate() * self.factor
+
+        trips = int(self.queued // self.per_trip())
+        collected = trips * self.per_trip()
+        self.queued -= collected
+        if trips and self.trip_factor:
+            self.factor = self.trip_factor()
+        return collected
+
+
+class MineralLine(ResourceNode):
+    resource = MINERALS
+
+    def __init__(self, rates, trip_factor=None, patches=None):
+        super(MineralLine, self).__init__(rates, trip_factor)
+        self.patches = rates.mineral_patches if patches is None else patches
+
+    def per_trip(self):
+        return self.rates.minerals_per_trip
+
+    def saturation(self):
+        return self.patches * self.rates.patch_saturation
+
+    def capacity(self):
+        return self.patches * self.rates.patch_max_workers
+
+    def collection_rate(self):
+        workers = len(self.workers)
+        efficient = min(workers, self.saturation())
+        oversaturated = min(workers, self.capacity()) - efficient
+        return efficient * self.rates.mineral_collection_rate + \
+            oversaturated * self.rates.oversaturated_mineral_rate
+
+
+class Geyser(ResourceNode):
+    resource = GAS
+
+    def per_trip(self):
+        return self.rates.gas_per_trip
+
+    def saturation(self):
+        return self.rates.geyser_saturation
+
+    def capacity(self):
+        return self.rates.geyser_saturation
+
+    def collection_rate(self):
+        return min(len(self.workers), self.capacity()) * self.rates.gas_collection_rate
+
+
+class Base(object):
+    """A command center's mineral line, and the geysers next to it."""
+
+    def __init__(self, rates, trip_factor=None):
+        self.rates = rates
+        self.mineral_line = MineralLine(rates, trip_factor)
+        self.geysers = []
+
+    def __repr__(self):
+        return "<Base: %s minerals, %s>" % (len(self.mineral_line.workers), self.geysers)
+
+    def nodes(self):
+        return [self.mineral_line] + self.geysers
+
+    def has_free_geyser(self):
+        return len(self.geysers) < self.rates.geysers_per_base
+
+
+class MiningModel(object):
+    """Tracks which workers collect from which resource node, and the
+    income of every node.
+
+    Given a `random` source and a `jitter` fraction, the duration of every
+    trip is scaled by a random factor within 1 +/- jitter.
+    """
+
+    def __init__(self, rates=None, random=None, jitter=0.0):
+        self.rates = rates or MiningRates()
+        self.bases = []
+        self.nodes = [] # every ResourceNode, in the order they were created
+        self.random = random
+        self.jitter = jitter
+        self.trip_factor = self._random_trip_factor if (random and jitter) else None
+
+    def __repr__(self):
+        return "<MiningModel: %s>" % self.bases
+
+    def _random_trip_factor(self):
+        return 1.0 + self.random.uniform(-self.jitter, self.jitter)
+
+    def add_base(self):
+        """Add a new base, and move workers over from oversaturated bases."""
+        base = Base(self.rates, self.trip_factor)
+        self.bases.append(base)
+        self.nodes.append(base.mineral_line)
+        self.balance()
+        return base
+
+    def add_geyser(self):
+        """Take a geyser at the first base that has a free one."""
+        bases = [b for b in self.bases if b.has_free_geyser()] or self.bases
+        geyser = Geyser(self.rates, self.trip_factor)
+        bases[0].geysers.append(geyser)
+        self.nodes.append(geyser)
+        return geyser
+
+    def assign(self, worker, node):
+        """Move a worker onto the given node."""
+        self.release(worker)
+        node.workers.append(worker)
+        worker.resource_node = node
+        worker.collection_type = node.resource
+
+    def release(self, worker):
+        """Stop a worker from collecting anything."""
+        node = getattr(worker, 'resource_node', None)
+        if node is not None:
+            node.workers.remove(worker)
+        worker.resource_node = None
+        worker.collection_type = None
+
+    def assign_minerals(self, worker):
+        """Send a worker to the mineral line with the most free room."""
+        lines = [b.mineral_line for b in self.bases]
+        if not lines:
+            raise Exception("No base to collect minerals from.")
+        line = min(lines, key=lambda l: float(len(l.workers)) / max(l.saturation(), 1))
+        self.assign(worker, line)
+
+    def transfer_to_gas(self, geyser, count):
+        """Move `count` workers from the mineral lines onto a geyser.
+        Workers at the front of each line, mining the longest, are taken
+        first, so the scv that just built the refinery stays on minerals.
+        """
+        for line in sorted((b.mineral_line for b in self.bases),
+                           key=lambda l: len(l.workers), reverse=True):
+            while count > 0 and line.workers:
+                self.assign(line.workers[0], geyser)
+                count -= 1
+
+    def transfer(self, source, destination, count):
+        """Move up to `count` workers between the mineral lines of two bases."""
+        moved = 0
+        while moved < count and source.mineral_line.workers:
+            self.assign(source.mineral_line.workers[-1], destination.mineral_line)
+            moved += 1
+        return moved
+
+    def balance(self):
+        """Move workers off of mineral lines above saturation and onto
+        mineral lines with free room.
+        """
+        for source in self.bases:
+            for destination in self.bases:
+                if destination is source:
+                    continue
+                excess = len(source.mineral_line.workers) - source.mineral_line.saturation()
+                room = destination.mineral_line.saturation() - len(destination.mineral_line.workers)
+                if excess > 0 and room > 0:
+                    self.transfer(source, destination, min(excess, room))
+
+    def income(self):
+        """Return the (minerals, gas) collected per second, on average."""
+        minerals = 0
+        gas = 0
+        for node in self.nodes:
+            rate = node.collection_rate() if node.workers else 0
+            if node.resource == MINERALS:
+                minerals += rate
+            else:
+                gas += rate
+        return minerals, gas
+
+    def tick(self):
+        """Return the (minerals, gas) collected by every node this second."""
+        minerals = 0
+        gas = 0
+        for node in self.nodes:
+            if node.resource == MINERALS:
+                minerals += node.tick()
+            else:
+                gas += node.tick()
+        return minerals, gas
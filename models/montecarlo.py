@@ -0,0 +1,162 @@
+"""Run many stochastic replicas of one build order, and report percentile
+timings for each command.
+
+    result = montecarlo.run_monte_carlo(build_order, facts, replicas=10000, seed=1)
+    result.print_report()
+
+Replicas are split into batches, and the batches are spread over a pool of
+worker processes. Every replica has its own seed, drawn from `seed`, so the
+result does not depend on how replicas are batched.
+
+Within a batch, the replicas are played together by a replicas.ReplicaBatch,
+which keeps the bank, supply, workers, and trip factors of every replica in
+NumPy arrays and advances them all each second, so a batch costs little more
+than one game. Replicas the batch flags as possibly failing, and build
+orders it does not support, are played by their own quiet HotsGame instead,
+with the same seed, so every replica is timed exactly as a HotsGame would
+time it.
+"""
+
+import multiprocessing
+import warnings
+
+import numpy
+
+import replicas
+import terran
+
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+# Set in each worker process by _init_worker, so that the build order and
+# facts are sent to a worker once, rather than with every batch.
+_WORKER_STATE = {}
+
+
+def _init_worker(build_order, facts, mining_rates, jitter):
+    _WORKER_STATE.update(
+        build_order=build_order,
+        facts=facts,
+        mining_rates=mining_rates,
+        jitter=jitter,
+    )
+
+
+def _play(seed, timings):
+    """Play one replica as a HotsGame, and fill in its row of timings."""
+    game = terran.HotsGame(
+        list(_WORKER_STATE['build_order']),
+        _WORKER_STATE['facts'],
+        mining_rates=_WORKER_STATE['mining_rates'],
+        seed=int(seed),
+        jitter=_WORKER_STATE['jitter'],
+        verbose=False,
+    )
+    try:
+        game.run()
+    except Exception:
+        pass # Whatever completed before the failure is still reported
+    timings.fill(numpy.nan)
+    for j, (command, begin, complete) in enumerate(game.command_timings()):
+        if begin is not None:
+            timings[j, 0] = begin
+        if complete is not None:
+            timings[j, 1] = complete
+
+
+def _run_batch(seeds):
+    """Simulate one replica per seed, and return an array of shape
+    (len(seeds), commands, 2) with the begin and complete time of each
+    command. Commands that never began or completed are NaN.
+    """
+    build_order = _WORKER_STATE['build_order']
+    facts = _WORKER_STATE['facts']
+    mining_rates = _WORKER_STATE['mining_rates']
+
+    if replicas.supported(build_order, facts, mining_rates):
+        batch = replicas.ReplicaBatch(build_order, facts, seeds,
+                                      jitter=_WORKER_STATE['jitter'],
+                                      mining_rates=mining_rates)
+        timings = batch.run()
+        again = numpy.flatnonzero(batch.flagged)
+    else:
+        timings = numpy.empty((len(seeds), len(build_order), 2))
+        again = range(len(seeds))
+
+    for i in again:
+        _play(seeds[i], timings[i])
+    return timings
+
+
+class MonteCarloResult(object):
+    """Percentile begin and complete times for each command of a build order."""
+
+    def __init__(self, build_order, timings, percentiles):
+        self.build_order = build_order
+        self.timings = timings # (replicas, commands, 2)
+        self.percentiles = percentiles
+
+    def replicas(self):
+        return self.timings.shape[0]
+
+    def failures(self):
+        """Return the number of replicas in which some command never completed."""
+        incomplete = numpy.isnan(self.timings[:, :, 1])
+        # Constant commands never complete by themselves
+        constant = numpy.array([c.is_constant() for c in self.build_order], dtype=bool)
+        return int(numpy.any(incomplete[:, ~constant], axis=1).sum())
+
+    def percentile_table(self, column=1):
+        """Return an array of shape (commands, percentiles) of begin (column 0)
+        or complete (column 1) times.
+        """
+        if not self.replicas():
+            return numpy.empty((len(self.build_order), len(self.percentiles)))
+        with warnings.catch_warnings():
+            # Commands that never began in any replica are all NaN
+            warnings.simplefilter('ignore', RuntimeWarning)
+            table = numpy.nanpercentile(self.timings[:, :, column], self.percentiles, axis=0)
+        return table.T
+
+    def print_report(self):
+        begin = self.percentile_table(0)
+        complete = self.percentile_table(1)
+        header = "  ".join("p%-5s" % p for p in self.percentiles)
+        print "%s replicas, %s failed" % (self.replicas(), self.failures())
+        print "%-30s %-7s %s" % ("COMMAND", "", header)
+        for i, command in enumerate(self.build_order):
+            for label, row in (("begin", begin[i]), ("done", complete[i])):
+                print "%-30s %-7s %s" % (
+                    command.raw if label == "begin" else "",
+                    label,
+                    "  ".join("%-6s" % ("-" if numpy.isnan(t) else "%d" % t) for t in row),
+                )
+
+
+def run_monte_carlo(build_order, facts, replicas=1000, seed=None, jitter=0.1,
+                    mining_rates=None, batch_size=1000, processes=None,
+                    percentiles=DEFAULT_PERCENTILES):
+    """Simulate `replicas` jittered copies of a build order, and return a
+    MonteCarloResult. Pass processes=1 to run in this
+    process.
+    """
+    seeds = numpy.random.RandomState(seed).randint(0, 2**31 - 1, size=replicas)
+    batches = [seeds[i:i + batch_size] for i in range(0, replicas, batch_size)]
+    initargs = (build_order, facts, mining_rates, jitter)
+
+    if processes == 1:
+        _init_worker(*initargs)
+        results = [_run_batch(batch) for batch in batches]
+    else:
+        pool = multiprocessing.Pool(processes, initializer=_init_worker, initargs=initargs)
+        try:
+            results = pool.map(_run_batch, batches)
+        finally:
+            pool.close()
+            pool.join()
+
+    if results:
+        timings = numpy.concatenate(results)
+    else:
+        timings = numpy.empty((0, len(build_order), 2))
+    return MonteCarloResult(build_order, timings, percentiles)
@@ -1,14 +1,32 @@
-import csv
 import re
+import time
 
 import commands
+import metrics
 
 
 def parse_build_order_file(filename, facts):
     """Takes a filename, and creates a list of commands.
     """
     lines = open(filename).readlines()
-    commands =  [parse_line(line, facts) for line in lines]
+    return parse_build_order_lines(lines, facts)
+
+
+def parse_build_order_text(text, facts):
+    """Takes the text of a build order, and creates a list of commands.
+    """
+    return parse_build_order_lines(text.splitlines(), facts)
+
+
+def parse_build_order_lines(lines, facts):
+    started = time.time()
+    try:
+        commands =  [parse_line(line, facts) for line in lines]
+    except Exception:
+        metrics.FAILURES.inc(labels=('ParseError',))
+        raise
+    finally:
+        metrics.PARSE_SECONDS.observe(time.time() - started)
     # TODO: Some lines are not turned into commands (blank line, comments) so let's filter them out
     return [c for c in commands if c is not None]
 
@@ -119,7 +137,6 @@ def parse_line(text_line, facts):
     if raw_command.startswith("constant"):
         unit_name = raw_command[8:].strip()
         all_names = facts.unit_names()
-        print "unit name:", unit_name, all_names
         if unit_name in all_names:
             return commands.ConstantCommand(
                 supply,
@@ -148,6 +165,7 @@ def parse_line(text_line, facts):
     Swap Commands are like:
         remove barracks from tech lab
         move barracks onto tech lab
+        swap barracks and factory
 
     """
     buildings = ['barracks', 'factory', 'starport']
@@ -172,16 +190,20 @@ def parse_line(text_line, facts):
             disconnect=bool(action == 'remove')
         )
 
-
-    # TODO
-    # pieces = raw_command.split()
-    # swappable = ["barracks", "factory", "starport"]
-    # if pieces[0] == 'swap' and \
-    #         pieces[1] in swappable_buildings and \
-    #         pieces[2] == 'and' and \
-    #         pieces[3] in swappable_buildings:
-    #     # SWAP COMMAND
-    #     pass
+    pieces = raw_command.split()
+    if len(pieces) == 4 and \
+            pieces[0] == 'swap' and \
+            pieces[1] in buildings and \
+            pieces[2] == 'and' and \
+            pieces[3] in buildings:
+        return commands.SwapCommand(
+            supply,
+            pieces[1],
+            raw_command,
+            attachment_name=None,
+            disconnect=False,
+            swap_with=pieces[3],
+        )
 
     raise Exception("Could not parse command `%s`" % text_line.strip())
 
@@ -202,6 +224,7 @@ def parse_dependency_file(filename):
     # TODO: Should we store this stuff in memory rather than reading a file? Or memcache it?
 
     """
+    import csv # Only needed when the facts are not precompiled
 
     reader = csv.DictReader(open(filename, 'rb'), delimiter=',', quotechar='"')
     data = list(reader) # Force to a list
@@ -226,6 +249,7 @@ def parse_dependency_file(filename):
 def parse_building_ability_file(filename):
     """Parse a data file containing building abilities (can build researhc, units, attachments)
     """
+    import csv
 
     with open(filename, 'rb') as csvfile:
         lines = csv.reader(csvfile, delimiter=',', quotechar='"')
@@ -0,0 +1,82 @@
+"""Remembers why each command in the lookahead window could not begin, so
+that it is only tried again once something it waits on has changed.
+
+A command waiting on a prerequisite or a producer can only begin after a
+command begins or completes somewhere in the game. A command waiting on
+supply can only begin after supply is provided. A command waiting on
+minerals or gas waits for the bank to reach a known amount. A command
+that could begin, but would make the build finish later, is declined until
+the next command begins. Commands waiting on anything else are tried every
+second.
+
+    index.block(command, utilization.MINERALS, minerals=150)
+    index.is_ready(command, game.minerals_available, game.gas_available)
+    index.wake(utilization.PREREQUISITE, utilization.PRODUCER)
+
+"""
+
+import utilization
+
+
+# Reasons to wait that are only woken by a state change
+WOKEN_BY_CHANGE = (utilization.PREREQUISITE, utilization.PRODUCER, utilization.SUPPLY, utilization.OTHER)
+# Reasons to wait that are over once the bank has enough
+WOKEN_BY_BANK = (utilization.MINERALS, utilization.GAS)
+# Could begin, but would make the build finish later; over once a command begins
+DECLINED = 'declined'
+
+
+class ReadinessIndex(object):
+    """Commands that could not begin, by what they wait on."""
+
+    def __init__(self):
+        self.blocked = {} # id(command) -> (reason, minerals, gas)
+        self.skipped = 0 # attempts saved, for reports
+        self.changes = 0 # counts changes to the blocked commands
+
+    def __repr__(self):
+        return "<ReadinessIndex: %s blocked, %s attempts skipped>" % (len(self.blocked), self.skipped)
+
+    def __len__(self):
+        return len(self.blocked)
+
+    def block(self, command, reason, minerals=0, gas=0):
+        """Remember that `command` could not begin for `reason`. A command
+        waiting on the bank waits for `minerals` and `gas`.
+        """
+        if reason in WOKEN_BY_CHANGE or reason in WOKEN_BY_BANK or reason == DECLINED:
+            self.blocked[id(command)] = (reason, minerals, gas)
+            self.changes += 1
+
+    def is_ready(self, command, minerals, gas):
+        """Return True iff `command` is worth trying with this bank."""
+        entry = self.blocked.get(id(command))
+        if entry is None:
+            return True
+        reason, minerals_needed, gas_needed = entry
+        if reason in WOKEN_BY_BANK and minerals >= minerals_needed and gas >= gas_needed:
+            del self.blocked[id(command)]
+            self.changes += 1
+            return True
+        self.skipped += 1
+        return False
+
+    def waiting_on(self, command):
+        """Return the (reason, minerals, gas) `command` waits on, or None
+        if it is ready.
+        """
+        return self.blocked.get(id(command))
+
+    def wake(self, *reasons):
+        """Make every command waiting for one of `reasons` ready."""
+        if not self.blocked:
+            return
+        for key, entry in self.blocked.items():
+            if entry[0] in reasons:
+                del self.blocked[key]
+                self.changes += 1
+
+    def clear(self):
+        if self.blocked:
+            self.blocked.clear()
+            self.changes += 1
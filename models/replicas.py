@@ -0,0 +1,810 @@
+"""Plays many stochastic replicas of one build order at once, in lockstep.
+
+Every replica is a row of NumPy arrays: the bank, supply, and depots in
+progress; the workers, queued income, and trip factor of every resource
+node; and the buildings, attachments, and units, in the order the replica
+made them. Each second, every replica is advanced together, and each rule
+of the game is worked out for all of them as array operations.
+
+A replica plays exactly as a HotsGame with the same seed and jitter: trip
+factors are drawn from the same random stream, in the same order, and
+producers are tried in the same order. A replica that might deadlock, or
+that reaches the time limit, is flagged, for the caller to play again as a
+HotsGame, which reports how it failed.
+
+    if replicas.supported(build_order, facts):
+        batch = replicas.ReplicaBatch(build_order, facts, seeds, jitter=0.1)
+        timings = batch.run() # (replicas, commands, 2)
+        batch.flagged # rows to play again
+
+Build orders with commands the batch does not model, such as scv commands,
+mules, or attachments built by their plain names, are not supported.
+"""
+
+import numpy
+
+import attachments
+import commands
+import mining
+import terran
+
+
+NEVER = numpy.iinfo(numpy.int64).max # busy until, for a producer that is idle
+NOTHING = -1 # an empty slot reference
+
+# Why the head of the build order waits, in the order HotsGame.blocked_reason checks
+PREREQUISITE, OTHER, MINERALS, GAS, SUPPLY, PRODUCER = range(6)
+
+
+def supported(build_order, facts, mining_rates=None):
+    """Return True iff a ReplicaBatch plays every command of `build_order`
+    as a HotsGame does.
+    """
+    rates = mining_rates or mining.MiningRates()
+    if rates.worker_transfer_delay:
+        return False
+    items = facts.all()
+    for command in build_order:
+        if command.not_before:
+            return False
+        if command.is_swap():
+            continue
+        if command.is_constant():
+            if not command.begin or command.item_name not in items:
+                return False
+            continue
+        if not isinstance(command, commands.StandardCommand) or command.item_name not in items:
+            return False
+        if command.item_name == 'mule':
+            return False
+        # A building built by a building, but not as an attachment
+        if facts.is_building(command.item_name) and not command.is_attachment() and \
+                command.item_name not in facts.abilities.get(terran.Scv.name, []):
+            return False
+    return True
+
+
+class ReplicaBatch(object):
+    """The state of every replica, a row each."""
+
+    def __init__(self, build_order, facts, seeds, jitter=0.0, mining_rates=None, breaker=60*15):
+        self.commands = list(build_order)
+        self.facts = facts
+        self.rates = mining_rates or mining.MiningRates()
+        self.jitter = jitter
+        self.breaker = breaker
+        self.time = 0
+        count = self.count = len(seeds)
+        rows = self.rows = numpy.arange(count)
+
+        names = set(facts.all_item_names()) | set([terran.CommandCenter.name, terran.Scv.name])
+        self.names = sorted(names)
+        self.code = dict((name, i) for i, name in enumerate(self.names))
+        self.none = len(self.names) # the kind of an empty slot, and of no attachment
+
+        # Jobs are the build order's commands, then the standard command of each constant command
+        self.jobs = list(self.commands)
+        self.constants_before = [] # the constant jobs begun before each command
+        constants = []
+        for command in self.commands:
+            self.constants_before.append(list(constants))
+            if command.is_constant():
+                constants.append(len(self.jobs))
+                self.jobs.append(command.standard_command)
+        self.job_luts = {}
+        self.yield_tables = {}
+        # Indexed by job, with NOTHING indexing the False on the end
+        self.is_swap_job = numpy.array([j.is_swap() for j in self.jobs] + [False])
+        self.is_refinery_job = numpy.array([j.item_name == terran.Refinery.name for j in self.jobs] + [False])
+        self.research = dict((name, i) for i, name in enumerate(sorted(facts.research_names())))
+
+        made = [c.item_name for c in self.commands if not c.is_swap() and not c.is_constant()]
+        nodes = 1 + made.count(terran.Refinery.name) + made.count(terran.CommandCenter.name)
+        bases = 1 + made.count(terran.CommandCenter.name)
+        scv_abilities = facts.abilities.get(terran.Scv.name, [])
+        buildings = 1 + len([name for name in made if name in scv_abilities])
+        attachments = 1 + len([c for c in self.commands if c.is_attachment()])
+        units = 8 + len(made)
+
+        self.minerals = numpy.zeros(count) + terran.HotsGame.minerals_available
+        self.gas = numpy.zeros(count) + terran.HotsGame.gas_available
+        self.supply_used = numpy.zeros(count, dtype=numpy.int64)
+        self.supply_available = numpy.zeros(count, dtype=numpy.int64) + terran.HotsGame.initial_supply
+        self.depots_in_progress = numpy.zeros(count, dtype=numpy.int64)
+        self.head = numpy.zeros(count, dtype=numpy.int64) # index of the next command
+        self.live = numpy.ones(count, dtype=bool)
+        self.flagged = numpy.zeros(count, dtype=bool)
+        self.timings = numpy.empty((count, len(self.commands), 2))
+        self.timings.fill(numpy.nan)
+
+        # Resource nodes and bases, in the order each replica made them
+        self.node_kind = numpy.zeros((count, nodes), dtype=numpy.int64) + NOTHING
+        self.node_workers = numpy.zeros((count, nodes), dtype=numpy.int64)
+        self.node_queued = numpy.zeros((count, nodes))
+        self.node_factor = numpy.ones((count, nodes))
+        self.node_count = numpy.zeros(count, dtype=numpy.int64)
+        self.base_line = numpy.zeros((count, bases), dtype=numpy.int64) + NOTHING
+        self.base_geysers = numpy.zeros((count, bases), dtype=numpy.int64)
+        self.base_count = numpy.zeros(count, dtype=numpy.int64)
+
+        # Buildings, attachments, and units
+        self.building_kind = numpy.zeros((count, buildings), dtype=numpy.int64) + self.none
+        self.building_attachment = numpy.zeros((count, buildings), dtype=numpy.int64) + NOTHING
+        self.building_attachment_kind = numpy.zeros((count, buildings), dtype=numpy.int64) + self.none
+        self.building_busy = numpy.zeros((count, buildings), dtype=numpy.int64) + NEVER
+        self.building_job = numpy.zeros((count, buildings), dtype=numpy.int64) + NOTHING
+        self.building_landing = numpy.zeros((count, buildings), dtype=numpy.int64) + NOTHING
+        self.building_count = numpy.zeros(count, dtype=numpy.int64)
+
+        self.attachment_kind = numpy.zeros((count, attachments), dtype=numpy.int64) + self.none
+        self.attachment_on = numpy.zeros((count, attachments), dtype=numpy.int64) + NOTHING
+        self.attachment_on_kind = numpy.zeros((count, attachments), dtype=numpy.int64) + self.none
+        self.attachment_busy = numpy.zeros((count, attachments), dtype=numpy.int64) + NEVER
+        self.attachment_job = numpy.zeros((count, attachments), dtype=numpy.int64) + NOTHING
+        self.attachment_freed = numpy.zeros((count, attachments)) + numpy.inf # order released, while free
+        self.attachment_count = numpy.zeros(count, dtype=numpy.int64)
+        self.releases = numpy.zeros(count, dtype=numpy.int64)
+
+        self.unit_kind = numpy.zeros((count, units), dtype=numpy.int64) + self.none
+        self.unit_node = numpy.zeros((count, units), dtype=numpy.int64) + NOTHING
+        self.unit_busy = numpy.zeros((count, units), dtype=numpy.int64) + NEVER
+        self.unit_job = numpy.zeros((count, units), dtype=numpy.int64) + NOTHING
+        self.unit_assigned = numpy.zeros((count, units), dtype=numpy.int64) # order joined its node
+        self.unit_count = numpy.zeros(count, dtype=numpy.int64)
+        self.assignments = numpy.zeros(count, dtype=numpy.int64)
+
+        self.research_state = numpy.zeros((count, max(len(self.research), 1)), dtype=numpy.int64)
+
+        # Each replica's random stream is the one random.Random(seed) gives
+        self.streams = None
+        if jitter:
+            self.streams = [numpy.random.RandomState([int(seed)]) for seed in seeds]
+            self.uniforms = numpy.array([s.random_sample(1024) for s in self.streams])
+            self.drawn = numpy.zeros(count, dtype=numpy.int64)
+
+        self.add_base(rows)
+        self.add_building(rows, self.code[terran.CommandCenter.name])
+        for i in range(5):
+            self.add_unit(rows, self.code[terran.Scv.name])
+        self.supply_used += 5
+
+    def run(self):
+        """Play every replica until its build order completes, or it is
+        flagged, and return the timings.
+        """
+        while self.live.any():
+            self.tick()
+        return self.timings
+
+    def tick(self):
+        self.collect()
+        self.complete()
+        self.dispatch()
+        self.end_tick()
+
+    # Random trip factors
+
+    def draw(self, rows):
+        """Return the next trip factor of each row."""
+        if (self.drawn[rows] >= self.uniforms.shape[1]).any():
+            more = numpy.array([s.random_sample(self.uniforms.shape[1]) for s in self.streams])
+            self.uniforms = numpy.hstack([self.uniforms, more])
+        uniform = self.uniforms[rows, self.drawn[rows]]
+        self.drawn[rows] += 1
+        low, high = -self.jitter, self.jitter
+        return 1.0 + (low + (high - low) * uniform)
+
+    # Resource nodes and workers
+
+    def add_node(self, rows, kind):
+        columns = self.node_count[rows]
+        self.node_kind[rows, columns] = kind
+        if self.streams is not None:
+            self.node_factor[rows, columns] = self.draw(rows)
+        self.node_count[rows] += 1
+        return columns
+
+    def add_base(self, rows):
+        line = self.add_node(rows, 0)
+        bases = self.base_count[rows]
+        self.base_line[rows, bases] = line
+        self.base_count[rows] += 1
+        self.balance(rows)
+
+    def add_geyser(self, rows):
+        """Take a geyser at the first base with a free one, or the first base."""
+        free = self.base_geysers[rows] < self.rates.geysers_per_base
+        free &= numpy.arange(self.base_geysers.shape[1]) < self.base_count[rows, None]
+        bases = numpy.where(free.any(1), free.argmax(1), 0)
+        self.base_geysers[rows, bases] += 1
+        return self.add_node(rows, 1)
+
+    def assign(self, rows, units, columns):
+        old = self.unit_node[rows, units]
+        moving = old != NOTHING
+        self.node_workers[rows[moving], old[moving]] -= 1
+        self.node_workers[rows, columns] += 1
+        self.unit_node[rows, units] = columns
+        self.unit_assigned[rows, units] = self.assignments[rows]
+        self.assignments[rows] += 1
+
+    def release(self, rows, units):
+        old = self.unit_node[rows, units]
+        self.node_workers[rows, old] -= 1
+        self.unit_node[rows, units] = NOTHING
+
+    def line_workers(self, rows):
+        lines = self.base_line[rows]
+        workers = self.node_workers[rows[:, None], numpy.maximum(lines, 0)]
+        return lines, workers
+
+    def assign_minerals(self, rows, units):
+        """Send workers to the mineral line with the most free room."""
+        lines, workers = self.line_workers(rows)
+        saturation = max(self.rates.mineral_patches * self.rates.patch_saturation, 1)
+        room = workers / float(saturation)
+        room[lines == NOTHING] = numpy.inf
+        self.assign(rows, units, lines[numpy.arange(len(rows)), room.argmin(1)])
+
+    def workers_on(self, rows, columns, last=False):
+        """Return the worker on each node that joined it first, or last."""
+        on = self.unit_node[rows] == columns[:, None]
+        order = numpy.where(on, self.unit_assigned[rows], -1 if last else NEVER)
+        return order.argmax(1) if last else order.argmin(1)
+
+    def transfer_to_gas(self, rows, geysers, count):
+        """Move `count` workers onto each geyser, from the fullest mineral lines first."""
+        lines, workers = self.line_workers(rows)
+        workers[lines == NOTHING] = -1
+        order = numpy.argsort(-workers, axis=1, kind='mergesort')
+        left = numpy.zeros(len(rows), dtype=numpy.int64) + count
+        every = numpy.arange(len(rows))
+        for position in range(lines.shape[1]):
+            line = lines[every, order[:, position]]
+            while True:
+                moving = (left > 0) & (line != NOTHING)
+                moving[moving] &= self.node_workers[rows[moving], line[moving]] > 0
+                if not moving.any():
+                    break
+                moved = rows[moving]
+                units = self.workers_on(moved, line[moving])
+                self.assign(moved, units, geysers[moving])
+                left[moving] -= 1
+
+    def balance(self, rows):
+        """Move workers off oversaturated mineral lines onto lines with room."""
+        bases = self.base_line.shape[1]
+        saturation = self.rates.mineral_patches * self.rates.patch_saturation
+        for source in range(bases):
+            for destination in range(bases):
+                if destination == source:
+                    continue
+                present = (self.base_count[rows] > max(source, destination))
+                if not present.any():
+                    continue
+                moving = rows[present]
+                source_line = self.base_line[moving, source]
+                destination_line = self.base_line[moving, destination]
+                excess = self.node_workers[moving, source_line] - saturation
+                room = saturation - self.node_workers[moving, destination_line]
+                left = numpy.where((excess > 0) & (room > 0), numpy.minimum(excess, room), 0)
+                while (left > 0).any():
+                    going = (left > 0) & (self.node_workers[moving, source_line] > 0)
+                    if not going.any():
+                        break
+                    units = self.workers_on(moving[going], source_line[going], last=True)
+                    self.assign(moving[going], units, destination_line[going])
+                    left[going] -= 1
+
+    def collect(self):
+        """Pay out every trip that completes this second, node by node."""
+        rates = self.rates
+        saturation = rates.mineral_patches * rates.patch_saturation
+        capacity = rates.mineral_patches * rates.patch_max_workers
+        minerals = numpy.zeros(self.count)
+        gas = numpy.zeros(self.count)
+        for column in range(self.node_count.max()):
+            workers = self.node_workers[:, column]
+            active = workers > 0
+            if not active.any():
+                continue
+            is_line = self.node_kind[:, column] == 0
+            efficient = numpy.minimum(workers, saturation)
+            oversaturated = numpy.minimum(workers, capacity) - efficient
+            rate = numpy.where(
+                is_line,
+                efficient * rates.mineral_collection_rate + oversaturated * rates.oversaturated_mineral_rate,
+                numpy.minimum(workers, rates.geyser_saturation) * rates.gas_collection_rate,
+            )
+            queued = self.node_queued[:, column]
+            queued[active] += rate[active] * self.node_factor[active, column]
+            per_trip = numpy.where(is_line, rates.minerals_per_trip, rates.gas_per_trip)
+            trips = numpy.where(active, queued // per_trip, 0)
+            collected = trips * per_trip
+            queued -= collected
+            minerals += numpy.where(is_line, collected, 0)
+            gas += numpy.where(is_line, 0, collected)
+            if self.streams is not None:
+                tripped = numpy.nonzero(trips > 0)[0]
+                if len(tripped):
+                    self.node_factor[tripped, column] = self.draw(tripped)
+        self.minerals += minerals
+        self.gas += gas
+
+    # Buildings, attachments, and units
+
+    def grow_units(self):
+        """Make room for every replica to add another unit."""
+        if self.unit_count.max() < self.unit_kind.shape[1]:
+            return
+        width = self.unit_kind.shape[1]
+        for name, fill in (('unit_kind', self.none), ('unit_node', NOTHING), ('unit_busy', NEVER),
+                           ('unit_job', NOTHING), ('unit_assigned', 0)):
+            array = getattr(self, name)
+            setattr(self, name, numpy.hstack([array, numpy.zeros((self.count, width), dtype=array.dtype) + fill]))
+
+    def add_unit(self, rows, kind):
+        self.grow_units()
+        slots = self.unit_count[rows]
+        self.unit_kind[rows, slots] = kind
+        self.unit_count[rows] += 1
+        if kind == self.code[terran.Scv.name]:
+            self.assign_minerals(rows, slots)
+
+    def add_building(self, rows, kind):
+        slots = self.building_count[rows]
+        self.building_kind[rows, slots] = kind
+        self.building_count[rows] += 1
+
+    def add_attachment(self, rows, kind, buildings):
+        slots = self.attachment_count[rows]
+        self.attachment_kind[rows, slots] = kind
+        self.attachment_count[rows] += 1
+        self.attach(rows, buildings, slots)
+
+    def attach(self, rows, buildings, attachments):
+        self.building_attachment[rows, buildings] = attachments
+        self.building_attachment_kind[rows, buildings] = self.attachment_kind[rows, attachments]
+        self.attachment_on[rows, attachments] = buildings
+        self.attachment_on_kind[rows, attachments] = self.building_kind[rows, buildings]
+
+    def detach(self, rows, buildings):
+        """Separate buildings from their attachments, and return the attachments."""
+        attachments = self.building_attachment[rows, buildings]
+        attached = attachments != NOTHING
+        self.attachment_on[rows[attached], attachments[attached]] = NOTHING
+        self.attachment_on_kind[rows[attached], attachments[attached]] = self.none
+        self.building_attachment[rows, buildings] = NOTHING
+        self.building_attachment_kind[rows, buildings] = self.none
+        return attachments
+
+    def record(self, rows, job, column):
+        if job >= len(self.commands):
+            return
+        times = self.timings[rows, job, column]
+        self.timings[rows, job, column] = numpy.where(numpy.isnan(times), self.time, times)
+
+    def complete(self):
+        """Complete what is due, buildings first, then units, then attachments."""
+        for kind, finish in (('building', self.complete_building),
+                             ('unit', self.complete_construction),
+                             ('attachment', self.complete_attachment)):
+            due = getattr(self, kind + '_busy') <= self.time
+            if not due.any():
+                continue
+            jobs = getattr(self, kind + '_job')
+            for slot in numpy.nonzero(due.any(0))[0]:
+                rows = numpy.nonzero(due[:, slot])[0]
+                slot_jobs = jobs[rows, slot]
+                for job in numpy.unique(slot_jobs):
+                    finish(rows[slot_jobs == job], slot, job)
+
+    def complete_building(self, rows, slot, job):
+        self.record(rows, job, 1)
+        self.building_busy[rows, slot] = NEVER
+        self.building_job[rows, slot] = NOTHING
+        if self.jobs[job].is_swap():
+            landing = self.building_landing[rows, slot]
+            lands = landing != NOTHING
+            self.attach(rows[lands], numpy.zeros(lands.sum(), dtype=numpy.int64) + slot, landing[lands])
+            self.building_landing[rows, slot] = NOTHING
+            return
+        slots = numpy.zeros(len(rows), dtype=numpy.int64) + slot
+        self.make(rows, job, slots)
+
+    def complete_attachment(self, rows, slot, job):
+        self.record(rows, job, 1)
+        self.attachment_busy[rows, slot] = NEVER
+        self.attachment_job[rows, slot] = NOTHING
+        self.make(rows, job, None)
+
+    def make(self, rows, job, buildings):
+        """Add what a building or attachment made: an attachment, research, or a unit."""
+        name = self.jobs[job].item_name
+        if self.facts.is_building(name):
+            self.add_attachment(rows, self.code[name], buildings)
+        elif name in self.research:
+            self.research_state[rows, self.research[name]] = 2
+        else:
+            self.add_unit(rows, self.code[name])
+
+    def complete_construction(self, rows, slot, job):
+        """An scv finishes a building, and goes back to the minerals."""
+        command = self.jobs[job]
+        name = command.item_name
+        slots = numpy.zeros(len(rows), dtype=numpy.int64) + slot
+        self.record(rows, job, 1)
+        self.unit_busy[rows, slot] = NEVER
+        self.unit_job[rows, slot] = NOTHING
+        self.assign_minerals(rows, slots)
+        if name == terran.SupplyDepot.name:
+            self.depots_in_progress[rows] -= 1
+            self.supply_available[rows] += 10
+        elif name == terran.Refinery.name:
+            geysers = self.add_geyser(rows)
+            if command.scv_transfer > 0:
+                self.transfer_to_gas(rows, geysers, command.scv_transfer)
+        elif name == terran.CommandCenter.name:
+            self.add_base(rows)
+        self.add_building(rows, self.code[name])
+
+    # Beginning commands
+
+    def parse(self, name):
+        """Return what a name means: (kind, None) for anything of that kind,
+        (building, attachment) for a building with an attachment, or
+        (attachment, building) for an attachment on a building, tagged by
+        which. None if it names nothing.
+        """
+        if name in self.code:
+            return ('plain', self.code[name], None)
+        for tag, separator in (('with', " with "), ('on', " on ")):
+            first, found, second = name.partition(separator)
+            if found and first in self.code and second in self.code:
+                return (tag, self.code[first], self.code[second])
+        return None
+
+    def job_lut(self, job):
+        """Return (buildings, attachments, scvs) for a job: tables of whether
+        a building or attachment of each kind, with each kind attached or
+        none, can build it, and whether an scv can.
+        """
+        luts = self.job_luts.get(job)
+        if luts is not None:
+            return luts
+        command = self.jobs[job]
+        item = command.item_name
+        abilities = self.facts.abilities
+        size = self.none + 1
+        buildings = numpy.zeros((size, size), dtype=bool)
+        attachments = numpy.zeros((size, size), dtype=bool)
+        if command.is_attachment():
+            # Only a building without an attachment, of the kind named
+            if command.attached_to in self.code and item in abilities.get(command.attached_to, []):
+                buildings[self.code[command.attached_to], self.none] = True
+        else:
+            for proper_name, items in abilities.items():
+                meaning = self.parse(proper_name)
+                if item not in items or meaning is None:
+                    continue
+                tag, first, second = meaning
+                if tag == 'plain':
+                    buildings[first, self.none] = attachments[first, self.none] = True
+                elif tag == 'with':
+                    buildings[first, second] = True
+                else:
+                    attachments[first, second] = True
+        scvs = isinstance(command, commands.StandardCommand) and item in abilities.get(terran.Scv.name, [])
+        luts = self.job_luts[job] = (buildings, attachments, scvs)
+        return luts
+
+    def owned(self, rows, name):
+        """Return whether each row has completed `name`, as HotsGame.has_item."""
+        if name in self.research:
+            return self.research_state[rows, self.research[name]] == 2
+        meaning = self.parse(name)
+        if meaning is None:
+            return numpy.zeros(len(rows), dtype=bool)
+        tag, first, second = meaning
+        if tag == 'with':
+            return ((self.building_kind[rows] == first) & (self.building_attachment_kind[rows] == second)).any(1)
+        if tag == 'on':
+            return ((self.attachment_kind[rows] == first) & (self.attachment_on_kind[rows] == second)).any(1)
+        return (self.building_kind[rows] == first).any(1) | (self.unit_kind[rows] == first).any(1) | \
+            ((self.attachment_kind[rows] == first) & (self.attachment_on[rows] == NOTHING)).any(1)
+
+    def can_afford(self, rows, job):
+        name = self.jobs[job].item_name
+        costs = self.facts.cost(name)
+        affordable = (self.minerals[rows] >= costs['minerals']) & (self.gas[rows] >= costs['gas'])
+        for prerequisite in costs['dependencies']:
+            affordable &= self.owned(rows, prerequisite)
+        if name in self.research:
+            affordable &= self.research_state[rows, self.research[name]] == 0
+        if costs.get('supply'):
+            affordable &= self.supply_used[rows] + costs['supply'] <= self.supply_available[rows]
+        return affordable
+
+    def spend(self, rows, job, supply=True):
+        costs = self.facts.cost(self.jobs[job].item_name)
+        self.minerals[rows] -= costs['minerals']
+        self.gas[rows] -= costs['gas']
+        if supply:
+            self.supply_used[rows] += costs.get('supply', 0)
+
+    def free_scvs(self, rows):
+        """Return whether each row has an scv free to build, and the first,
+        taking scvs collecting gas only if none collect minerals.
+        """
+        free = (self.unit_kind[rows] == self.code[terran.Scv.name]) & (self.unit_busy[rows] == NEVER)
+        on_gas = self.node_kind[rows[:, None], numpy.maximum(self.unit_node[rows], 0)] == 1
+        choices = numpy.where((free & ~on_gas).any(1)[:, None], free & ~on_gas, free)
+        return choices.any(1), choices.argmax(1)
+
+    def attempt(self, rows, job):
+        """Begin a standard job in every row that can, as
+        HotsGame.execute_build_command, and return which did.
+        """
+        building_lut, attachment_lut, scvs = self.job_lut(job)
+        began = self.can_afford(rows, job)
+        candidates = numpy.nonzero(began)[0]
+        name = self.jobs[job].item_name
+        costs = self.facts.cost(name)
+        finish = self.time + costs['build time']
+
+        able = building_lut[self.building_kind[rows[candidates]], self.building_attachment_kind[rows[candidates]]]
+        able &= self.building_busy[rows[candidates]] == NEVER
+        found = able.any(1)
+        chosen, slots = rows[candidates[found]], able.argmax(1)[found]
+        self.building_busy[chosen, slots] = finish
+        self.building_job[chosen, slots] = job
+        self.begin(chosen, job)
+        candidates = candidates[~found]
+
+        if scvs and len(candidates):
+            found, slots = self.free_scvs(rows[candidates])
+            chosen, slots = rows[candidates[found]], slots[found]
+            self.release(chosen, slots)
+            if name == terran.SupplyDepot.name:
+                self.depots_in_progress[chosen] += 1
+            self.unit_busy[chosen, slots] = self.time + self.facts.buildings[name]['build time']
+            self.unit_job[chosen, slots] = job
+            self.record(chosen, job, 0)
+            self.spend(chosen, job, supply=False)
+            candidates = candidates[~found]
+
+        if len(candidates):
+            able = attachment_lut[self.attachment_kind[rows[candidates]], self.attachment_on_kind[rows[candidates]]]
+            able &= self.attachment_busy[rows[candidates]] == NEVER
+            found = able.any(1)
+            chosen, slots = rows[candidates[found]], able.argmax(1)[found]
+            self.attachment_busy[chosen, slots] = finish
+            self.attachment_job[chosen, slots] = job
+            self.begin(chosen, job)
+            began[candidates[~found]] = False
+        return began
+
+    def begin(self, rows, job):
+        name = self.jobs[job].item_name
+        self.record(rows, job, 0)
+        if name in self.research:
+            self.research_state[rows, self.research[name]] = 1
+        self.spend(rows, job)
+
+
+    # Swaps
+
+    def idle_buildings(self, rows, name, attachment=attachments.ANY, exclude=None):
+        """Return whether each row has a building of this name free to lift
+        off, and the first, as AttachmentIndex.idle_building.
+        """
+        attached = self.building_attachment[rows]
+        idle = (self.building_kind[rows] == self.code[name]) & (self.building_busy[rows] == NEVER)
+        idle &= (attached == NOTHING) | \
+            (self.attachment_busy[rows[:, None], numpy.maximum(attached, 0)] == NEVER)
+        if attachment is None:
+            idle &= attached == NOTHING
+        elif attachment is not attachments.ANY:
+            idle &= self.building_attachment_kind[rows] == self.code[attachment]
+        if exclude is not None:
+            idle[numpy.arange(len(rows)), exclude] = False
+        return idle.any(1), idle.argmax(1)
+
+    def lift_off(self, rows, buildings, job, landing):
+        self.building_busy[rows, buildings] = self.time + terran.HotsGame.swap_time
+        self.building_job[rows, buildings] = job
+        self.building_landing[rows, buildings] = landing
+        self.record(rows, job, 0)
+
+    def swap(self, rows, job):
+        """Lift off the buildings of a swap job in every row that can, as
+        HotsGame.execute_swap_command, and return which did.
+        """
+        command = self.jobs[job]
+        if command.swap_with:
+            found, first = self.idle_buildings(rows, command.item_name)
+            other, second = self.idle_buildings(rows, command.swap_with, exclude=first)
+            attached = (self.building_attachment[rows, first] != NOTHING) | \
+                (self.building_attachment[rows, second] != NOTHING)
+            began = found & other & attached
+            chosen, first, second = rows[began], first[began], second[began]
+            first_attachment = self.detach(chosen, first)
+            second_attachment = self.detach(chosen, second)
+            self.lift_off(chosen, first, job, second_attachment)
+            self.lift_off(chosen, second, job, first_attachment)
+        elif command.disconnect:
+            began, buildings = self.idle_buildings(rows, command.item_name, command.attachment_name)
+            chosen, buildings = rows[began], buildings[began]
+            released = self.detach(chosen, buildings)
+            self.attachment_freed[chosen, released] = self.releases[chosen]
+            self.releases[chosen] += 1
+            self.lift_off(chosen, buildings, job, NOTHING)
+        else:
+            found, buildings = self.idle_buildings(rows, command.item_name, None)
+            free = (self.attachment_kind[rows] == self.code[command.attachment_name]) & \
+                numpy.isfinite(self.attachment_freed[rows])
+            began = found & free.any(1)
+            # The attachment released first
+            reserved = numpy.where(free, self.attachment_freed[rows], numpy.inf).argmin(1)[began]
+            chosen = rows[began]
+            self.attachment_freed[chosen, reserved] = numpy.inf
+            self.lift_off(chosen, buildings[began], job, reserved)
+        return began
+
+    # Each second
+
+    def dispatch(self):
+        """Begin commands from the head of each build order while they can."""
+        rows = numpy.nonzero(self.live & (self.head < len(self.commands)))[0]
+        while len(rows):
+            heads = self.head[rows]
+            began = [group[self.attempt_head(group, index)]
+                     for index in numpy.unique(heads)
+                     for group in [rows[heads == index]]]
+            rows = numpy.concatenate(began)
+            self.head[rows] += 1
+            rows = rows[self.head[rows] < len(self.commands)]
+
+    def attempt_head(self, rows, index):
+        """Attempt command `index`, then the constant commands begun before
+        it, in order, until one cannot begin. Return which rows began the command.
+        """
+        command = self.commands[index]
+        if command.is_constant():
+            return numpy.ones(len(rows), dtype=bool)
+        if command.is_swap():
+            began = self.swap(rows, index)
+        else:
+            began = self.attempt(rows, index)
+        going = rows
+        for job in self.constants_before[index]:
+            going = going[self.attempt(going, job)]
+            if not len(going):
+                break
+        return began
+
+    def end_tick(self):
+        waiting = numpy.nonzero(self.live & (self.head < len(self.commands)))[0]
+        heads = self.head[waiting]
+        for index in numpy.unique(heads):
+            group = waiting[heads == index]
+            self.flagged[group[self.might_fail(group, index)]] = True
+        self.time += 1
+        if self.breaker is not None and self.time >= self.breaker:
+            self.flagged |= self.live & (self.head < len(self.commands))
+        finished = (self.head == len(self.commands)) & self.quiet(self.rows)
+        self.live &= ~finished & ~self.flagged
+
+    # Deadlocks
+
+    def quiet(self, rows):
+        """Return whether nothing is in progress in each row."""
+        return ~((self.building_busy[rows] != NEVER).any(1) |
+                 (self.unit_busy[rows] != NEVER).any(1) |
+                 (self.attachment_busy[rows] != NEVER).any(1))
+
+    def income(self, rows):
+        """Return the (minerals, gas) each row collects per second, on average."""
+        rates = self.rates
+        workers = self.node_workers[rows]
+        kinds = self.node_kind[rows]
+        saturation = rates.mineral_patches * rates.patch_saturation
+        efficient = numpy.minimum(workers, saturation)
+        oversaturated = numpy.minimum(workers, rates.mineral_patches * rates.patch_max_workers) - efficient
+        minerals = efficient * rates.mineral_collection_rate + oversaturated * rates.oversaturated_mineral_rate
+        gas = numpy.minimum(workers, rates.geyser_saturation) * rates.gas_collection_rate
+        return (numpy.where(kinds == 0, minerals, 0).sum(1),
+                numpy.where(kinds == 1, gas, 0).sum(1))
+
+    def yields(self, name):
+        """Return a table of whether each job, made by a producer of each
+        kind, makes something called `name`, as HotsGame.made_names.
+        """
+        table = self.yield_tables.get(name)
+        if table is not None:
+            return table
+        table = numpy.zeros((len(self.jobs) + 1, self.none + 1), dtype=bool)
+        for job, command in enumerate(self.jobs):
+            if command.is_swap() or command.is_constant():
+                continue
+            item = command.item_name
+            for kind, producer in enumerate(self.names):
+                if producer == terran.Scv.name or not self.facts.is_building(item):
+                    made = [item]
+                else:
+                    made = [item, "%s on %s" % (item, producer), "%s with %s" % (producer, item)]
+                table[job, kind] = name in made
+        self.yield_tables[name] = table
+        return table
+
+    def in_progress_yields(self, rows, name):
+        """Return whether something in progress in each row makes `name`."""
+        table = self.yields(name)
+        last = len(self.jobs)
+        scv = self.code[terran.Scv.name]
+        found = numpy.zeros(len(rows), dtype=bool)
+        for jobs, kinds in ((self.building_job[rows], self.building_kind[rows]),
+                            (self.attachment_job[rows], self.attachment_kind[rows]),
+                            (self.unit_job[rows], numpy.zeros_like(self.unit_job[rows]) + scv)):
+            found |= table[numpy.where(jobs == NOTHING, last, jobs), kinds].any(1)
+        return found
+
+    def might_fail(self, rows, index):
+        """Return which rows, waiting on command `index`, might be deadlocked
+        or supply blocked. Every row HotsGame.deadlock_reason finds a reason
+        for is among them; the rest are played again to find out.
+        """
+        command = self.commands[index]
+        if command.is_swap():
+            return self.quiet(rows)
+        name = command.item_name
+        costs = self.facts.cost(name)
+        fails = numpy.zeros(len(rows), dtype=bool)
+
+        missing = [(prerequisite, ~self.owned(rows, prerequisite)) for prerequisite in costs['dependencies']]
+        waiting = numpy.zeros(len(rows), dtype=bool)
+        for prerequisite, lacking in missing:
+            waiting |= lacking
+        if waiting.any():
+            # A swap in progress may make anything
+            swapping = self.is_swap_job[self.building_job[rows[waiting]]].any(1)
+            for prerequisite, lacking in missing:
+                lacking = lacking[waiting] & ~self.in_progress_yields(rows[waiting], prerequisite)
+                fails[numpy.nonzero(waiting)[0][lacking & ~swapping]] = True
+        left = ~waiting
+
+        if name in self.research:
+            begun = left & (self.research_state[rows, self.research[name]] != 0)
+            fails |= begun
+            left &= ~begun
+
+        minerals_income, gas_income = self.income(rows)
+        short = left & (self.minerals[rows] < costs['minerals'])
+        fails |= short & (minerals_income == 0) & self.quiet(rows)
+        left &= ~short
+
+        short = left & (self.gas[rows] < costs['gas'])
+        building_refinery = self.is_refinery_job[self.unit_job[rows]].any(1)
+        fails |= short & (gas_income == 0) & ~building_refinery
+        left &= ~short
+
+        if costs.get('supply'):
+            short = left & (self.supply_used[rows] + costs['supply'] > self.supply_available[rows])
+            fails |= short & (self.depots_in_progress[rows] == 0)
+            left &= ~short
+
+        building_lut, attachment_lut, scvs = self.job_lut(index)
+        able = building_lut[self.building_kind[rows], self.building_attachment_kind[rows]].any(1) | \
+            attachment_lut[self.attachment_kind[rows], self.attachment_on_kind[rows]].any(1)
+        if scvs:
+            able |= (self.unit_kind[rows] == self.code[terran.Scv.name]).any(1)
+        left &= ~able
+        if left.any():
+            # Something in progress may make a producer, and a swap may make anything
+            producing = numpy.zeros(len(rows[left]), dtype=bool)
+            for proper_name, items in self.facts.abilities.items():
+                if name in items:
+                    producing |= self.in_progress_yields(rows[left], proper_name)
+            producing |= self.is_swap_job[self.building_job[rows[left]]].any(1)
+            fails[numpy.nonzero(left)[0][~producing]] = True
+        return fails
@@ -0,0 +1,54 @@
+"""Keeps the state of every upgrade, so that "has this been researched?" is
+answered without scanning the game's units, and an upgrade cannot be
+researched twice.
+
+Research that depends on other research (such as infantry weapons 2 on
+infantry weapons 1) lists it in its dependencies, like any other prerequisite.
+"""
+
+NOT_STARTED = 'not started'
+IN_PROGRESS = 'in progress'
+COMPLETE = 'complete'
+
+
+class ResearchTable(object):
+    """The state of every upgrade, and when it began and completed."""
+
+    def __init__(self, names):
+        self.states = dict((name, NOT_STARTED) for name in names)
+        self.began = {} # name -> time
+        self.completed = {} # name -> time
+
+    def __repr__(self):
+        return "<ResearchTable: %s in progress, %s complete>" % (
+            len(self.began) - len(self.completed),
+            len(self.completed),
+        )
+
+    def __contains__(self, name):
+        return name in self.states
+
+    def state(self, name):
+        return self.states[name]
+
+    def can_begin(self, name):
+        return self.states.get(name) == NOT_STARTED
+
+    def is_complete(self, name):
+        return self.states.get(name) == COMPLETE
+
+    def begin(self, name, time):
+        if not self.can_begin(name):
+            raise Exception("Cannot begin research `%s`, it is %s" % (name, self.states.get(name)))
+        self.states[name] = IN_PROGRESS
+        self.began[name] = time
+
+    def complete(self, name, time):
+        if self.states.get(name) != IN_PROGRESS:
+            raise Exception("Cannot complete research `%s`, it is %s" % (name, self.states.get(name)))
+        self.states[name] = COMPLETE
+        self.completed[name] = time
+
+    def completed_names(self):
+        """Return the completed research, in the order it completed."""
+        return sorted(self.completed, key=lambda name: (self.completed[name], name))
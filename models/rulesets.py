@@ -0,0 +1,219 @@
+"""A registry of rulesets (HotS, and others later).
+
+Every directory in data/ that holds the four data files is a ruleset:
+
+    data/HotS/terran_units.csv
+    data/HotS/terran_buildings.csv
+    data/HotS/terran_research.csv
+    data/HotS/terran_abilities.csv
+
+A ruleset's Facts are only loaded the first time they are asked for, so a
+process pays for the rulesets it uses and nothing else. Records that are
+identical between rulesets are loaded once and shared.
+
+The parsed data files are compiled into data/<ruleset>/facts.marshal the
+first time they are loaded, and read from there while it is newer than every
+data file, which is several times faster than parsing the CSV files.
+
+    ruleset = rulesets.get("HotS")
+    game = ruleset.game(build_order).run()
+
+"""
+
+import marshal
+import os
+import time
+
+import facts
+import metrics
+import parser
+
+
+DATA_DIRECTORY = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.path.pardir, 'data')
+)
+
+DATA_FILES = {
+    'units': 'terran_units.csv',
+    'buildings': 'terran_buildings.csv',
+    'research': 'terran_research.csv',
+    'abilities': 'terran_abilities.csv',
+}
+
+COMPILED_FILE = 'facts.marshal'
+COMPILED_VERSION = 1 # Change whenever the parsed records change shape
+
+# The name of the game engine class in models/terran.py to use for each
+# ruleset. Rulesets not listed here use HotsGame. The engine is imported the
+# first time a ruleset makes a game, so loading facts alone does not pay for it.
+GAME_CLASSES = {
+    'HotS': 'HotsGame',
+}
+
+
+class RecordPool(object):
+    """Hands out one shared object for every distinct record, so rulesets
+    with identical values do not each keep a copy.
+
+    Shared records must not be changed; copy a record before overriding it.
+    """
+
+    def __init__(self):
+        self.records = {}
+
+    def __len__(self):
+        return len(self.records)
+
+    def _key(self, record):
+        if isinstance(record, dict):
+            return tuple(sorted((k, self._key(v)) for k, v in record.items()))
+        if isinstance(record, list):
+            return tuple(self._key(v) for v in record)
+        return record
+
+    def intern(self, record):
+        return self.records.setdefault(self._key(record), record)
+
+    def intern_all(self, records):
+        return dict((name, self.intern(record)) for name, record in records.items())
+
+
+class Ruleset(object):
+    """The data files for one version of the game, and the engine that plays it."""
+
+    def __init__(self, name, directory, game_class=None, pool=None):
+        self.name = name
+        self.directory = directory
+        self.game_class = game_class
+        self.pool = pool if pool is not None else RecordPool()
+        self._facts = None
+
+    def __repr__(self):
+        return "<Ruleset: %s (%s)>" % (self.name, "loaded" if self.is_loaded() else "not loaded")
+
+    def path(self, kind):
+        return os.path.join(self.directory, DATA_FILES[kind])
+
+    def compiled_path(self):
+        return os.path.join(self.directory, COMPILED_FILE)
+
+    def is_loaded(self):
+        return self._facts is not None
+
+    def read_compiled(self):
+        """Return the records of the compiled file, or None if it is
+        missing, stale, or unreadable.
+        """
+        try:
+            compiled_time = os.path.getmtime(self.compiled_path())
+            if any(os.path.getmtime(self.path(k)) > compiled_time for k in DATA_FILES):
+                return None
+            with open(self.compiled_path(), 'rb') as f:
+                version, records = marshal.load(f)
+        except (EnvironmentError, EOFError, ValueError, TypeError):
+            return None
+        return records if version == COMPILED_VERSION else None
+
+    def compile(self, records):
+        """Write the records for the next process to load. A ruleset in a
+        directory that can't be written to is parsed every time instead.
+        """
+        temporary = "%s.%s.tmp" % (self.compiled_path(), os.getpid())
+        try:
+            with open(temporary, 'wb') as f:
+                marshal.dump((COMPILED_VERSION, records), f)
+            os.rename(temporary, self.compiled_path())
+        except EnvironmentError:
+            pass
+
+    def read_data_files(self):
+        """Return a dict of the parsed records of each data file."""
+        records = self.read_compiled()
+        if records is None:
+            records = {
+                'units': parser.parse_dependency_file(self.path('units')),
+                'buildings': parser.parse_dependency_file(self.path('buildings')),
+                'research': parser.parse_dependency_file(self.path('research')),
+                'abilities': parser.parse_building_ability_file(self.path('abilities')),
+            }
+            self.compile(records)
+        return records
+
+    def facts(self):
+        """Return the Facts of this ruleset, loading them the first time."""
+        if self._facts is None:
+            started = time.time()
+            records = self.read_data_files()
+            self._facts = facts.Facts(
+                self.pool.intern_all(records['units']),
+                self.pool.intern_all(records['buildings']),
+                self.pool.intern_all(records['research']),
+                self.pool.intern_all(records['abilities']),
+            )
+            metrics.FACTS_LOAD_SECONDS.observe(time.time() - started, labels=(self.name,))
+        return self._facts
+
+    def unload(self):
+        self._facts = None
+
+    def parse_build_order_file(self, filename):
+        return parser.parse_build_order_file(filename, self.facts())
+
+    def game(self, build_order, **kwargs):
+        """Return a new game of this ruleset, ready to run."""
+        if self.game_class is None:
+            import terran
+            self.game_class = getattr(terran, GAME_CLASSES.get(self.name, 'HotsGame'))
+        return self.game_class(build_order, self.facts(), **kwargs)
+
+
+class RulesetRegistry(object):
+    """Every known ruleset, by name."""
+
+    def __init__(self):
+        self.rulesets = {}
+        self.pool = RecordPool()
+
+    def __contains__(self, name):
+        return name in self.rulesets
+
+    def register(self, name, directory, game_class=None):
+        ruleset = Ruleset(name, directory, game_class=game_class, pool=self.pool)
+        self.rulesets[name] = ruleset
+        return ruleset
+
+    def discover(self, data_directory=DATA_DIRECTORY):
+        """Register every directory in `data_directory` that has all of the data files."""
+        for name in sorted(os.listdir(data_directory)):
+            directory = os.path.join(data_directory, name)
+            if name in self.rulesets or not os.path.isdir(directory):
+                continue
+            if all(os.path.isfile(os.path.join(directory, f)) for f in DATA_FILES.values()):
+                self.register(name, directory)
+        return self
+
+    def names(self):
+        return sorted(self.rulesets.keys())
+
+    def get(self, name):
+        if name not in self.rulesets:
+            raise Exception("Unknown ruleset `%s`, expected one of: %s" % (name, ", ".join(self.names())))
+        return self.rulesets[name]
+
+    def loaded(self):
+        """Return the names of the rulesets whose facts have been loaded."""
+        return [n for n in self.names() if self.rulesets[n].is_loaded()]
+
+
+_registry = None
+
+def registry():
+    """Return the registry of every ruleset in data/, discovering them the first time."""
+    global _registry
+    if _registry is None:
+        _registry = RulesetRegistry().discover()
+    return _registry
+
+
+def get(name):
+    return registry().get(name)
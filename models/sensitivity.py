@@ -0,0 +1,187 @@
+"""Find the critical commands of a build order: for every command, how much
+later (or earlier) the build finishes if that command begins `seconds`
+later, begins `seconds` earlier, or is removed.
+
+    report = sensitivity.run_sensitivity(build_order, facts, seconds=10, milestone="banshee")
+    report.print_report()
+
+The baseline game is played once, saving a checkpoint just before each
+command is first attempted. Every probe resumes from a checkpoint, so only
+the rest of the game is played again. A delayed command is held back from
+its own checkpoint until `seconds` after it began. An advanced command is
+moved ahead of the commands that began no earlier than `seconds` before
+it, and resumed from the first of their checkpoints, so it may begin
+`seconds` earlier if the game can afford it.
+"""
+
+import copy
+import multiprocessing
+
+import terran
+
+
+DELAY = 'delay'
+ADVANCE = 'advance'
+REMOVE = 'remove'
+PROBES = (DELAY, ADVANCE, REMOVE)
+
+# Set in each worker process by _init_worker. Workers are forked, so the
+# checkpoints are inherited rather than sent to them.
+_WORKER_STATE = {}
+
+
+def milestone_time(game, milestone=None):
+    """Return the time the first `milestone` item completed, or when the
+    whole game finished if there is no milestone. None if it never completed.
+    """
+    if milestone is None:
+        return game.time
+    for time, kind, command in game.events:
+        if kind == 'complete' and command.item_name == milestone:
+            return time
+    return None
+
+
+def _init_worker(checkpoints, facts, milestone, breaker):
+    _WORKER_STATE.update(
+        checkpoints=checkpoints,
+        facts=facts,
+        milestone=milestone,
+        breaker=breaker,
+    )
+
+
+def advanced_from(build_order, begins, checkpoints, index, not_before):
+    """Return the index of the checkpoint to resume from to begin command
+    `index` at `not_before`: the first of the commands just ahead of it
+    that began no earlier. Constant and swap commands are never passed.
+    """
+    start = index
+    while start > 0 and start - 1 in checkpoints:
+        command = build_order[start - 1]
+        if command.is_constant() or command.is_swap():
+            break
+        if begins[start - 1] is None or begins[start - 1] < not_before:
+            break
+        # Begun ahead of that checkpoint's head, with a lookahead
+        if index in checkpoints[start - 1].started_ahead:
+            break
+        start -= 1
+    return start
+
+
+def _probe(task):
+    """Resume from a checkpoint with one command changed, and return
+    (index, probe, milestone time or None, error or None).
+    """
+    index, probe, start, not_before = task
+    facts = _WORKER_STATE['facts']
+    game = copy.deepcopy(_WORKER_STATE['checkpoints'][start], {id(facts): facts})
+    game.verbose = False
+    game.checkpoints = None
+
+    command = game.commands[index]
+    if probe == REMOVE:
+        game.build_order.pop(0)
+    else:
+        # An advanced command waits at the head, ahead of the commands it was moved past
+        game.build_order.remove(command)
+        game.build_order.insert(0, command)
+        command.not_before = not_before
+
+    try:
+        game.resume(_WORKER_STATE['breaker'])
+    except Exception as e:
+        return index, probe, None, e.__class__.__name__
+    return index, probe, milestone_time(game, _WORKER_STATE['milestone']), None
+
+
+class SensitivityReport(object):
+    """The change in milestone time for every command and probe."""
+
+    def __init__(self, build_order, baseline, seconds, milestone):
+        self.build_order = build_order
+        self.baseline = baseline
+        self.seconds = seconds
+        self.milestone = milestone
+        self.results = {} # (index, probe) -> (milestone time, error)
+
+    def change(self, index, probe):
+        """Return the change in milestone time, or None if it was never reached."""
+        time, error = self.results.get((index, probe), (None, None))
+        if time is None:
+            return None
+        return time - self.baseline
+
+    def critical_commands(self):
+        """Return the indexes of commands whose delay moves the milestone,
+        the most critical first.
+        """
+        delayed = [(self.change(i, DELAY), i) for i in range(len(self.build_order))]
+        delayed = [(change, i) for change, i in delayed if change]
+        return [i for change, i in sorted(delayed, key=lambda t: (-t[0], t[1]))]
+
+    def print_report(self):
+        print "Baseline: %s reached at %s" % (self.milestone or "end of build", self.baseline)
+
+        def describe(index, probe):
+            time, error = self.results.get((index, probe), (None, None))
+            if error:
+                return error
+            if time is None:
+                return "-"
+            return "%+d" % (time - self.baseline)
+
+        print "%-30s %-16s %-16s %s" % ("COMMAND", "+%ss" % self.seconds, "-%ss" % self.seconds, "REMOVED")
+        for index, command in enumerate(self.build_order):
+            print "%-30s %-16s %-16s %s" % (
+                command.raw,
+                describe(index, DELAY),
+                describe(index, ADVANCE),
+                describe(index, REMOVE),
+            )
+
+
+def run_sensitivity(build_order, facts, seconds=10, milestone=None, probes=PROBES,
+                    processes=None, breaker=60*15, **game_kwargs):
+    """Probe every command of a build order, and return a SensitivityReport.
+    Pass processes=1 to run in this process.
+    """
+    game = terran.HotsGame(list(build_order), facts, verbose=False, checkpoints=True, **game_kwargs)
+    game.run(breaker)
+    baseline = milestone_time(game, milestone)
+    if baseline is None:
+        raise Exception("The build order never reached `%s`" % milestone)
+
+    begins = [begin for command, begin, complete in game.command_timings()]
+    tasks = []
+    for index in sorted(game.checkpoints):
+        for probe in probes:
+            if probe == REMOVE:
+                tasks.append((index, probe, index, 0))
+            # A constant command is never built itself, so only removing it changes anything
+            elif build_order[index].is_constant() or begins[index] is None:
+                continue
+            elif probe == DELAY:
+                tasks.append((index, probe, index, begins[index] + seconds))
+            elif probe == ADVANCE:
+                not_before = max(begins[index] - seconds, 0)
+                start = advanced_from(build_order, begins, game.checkpoints, index, not_before)
+                tasks.append((index, probe, start, not_before))
+    initargs = (game.checkpoints, facts, milestone, breaker)
+
+    if processes == 1:
+        _init_worker(*initargs)
+        results = [_probe(task) for task in tasks]
+    else:
+        pool = multiprocessing.Pool(processes, initializer=_init_worker, initargs=initargs)
+        try:
+            results = pool.map(_probe, tasks)
+        finally:
+            pool.close()
+            pool.join()
+
+    report = SensitivityReport(build_order, baseline, seconds, milestone)
+    for index, probe, time, error in results:
+        report.results[(index, probe)] = (time, error)
+    return report
@@ -0,0 +1,214 @@
+"""A long running simulation service, so that callers do not pay for
+interpreter startup and loading the data files on every simulation.
+
+Serves JSON over HTTP on localhost:
+
+    POST /simulate
+    {"build_order": "supply depot\\nbarracks\\nmarine", "ruleset": "HotS",
+     "max_time": 600, "timeout": 5, "timeline": true}
+
+    200 {"result": {...}}                       see HotsGame.result()
+    400 {"error": "...", "type": "ParseError"}  the build order could not be parsed
+    400 {"error": "..."}                        `max_time` or `timeout` is not a number
+    422 {"error": "...", "type": "SupplyBlocked", "result": {...}}
+    500 {"error": "...", "type": "KeyError"}    the engine failed
+    503 {"error": "..."}                        too many simulations are waiting
+    504 {"error": "..."}                        the simulation took longer than `timeout`
+
+    GET /metrics                                OpenMetrics text, see models/metrics.py
+
+`max_time` is the number of game seconds to simulate before giving up (the
+engine's breaker), at most MAX_TIME_CEILING, and `timeout` the number of
+wall seconds to wait for it.
+With `timeline`, the result also has the game's TimelineIndex as plain
+values, so a client can show the state at any second without asking again.
+
+The facts of each ruleset are loaded once, before the worker processes are
+forked, so every worker starts warm.
+"""
+
+import BaseHTTPServer
+import SocketServer
+import json
+import math
+import multiprocessing
+import threading
+import time
+
+import metrics
+import parser
+import rulesets
+import terran
+import timeline
+
+
+DEFAULT_TIMEOUT = 10 # seconds of wall time
+MAX_TIME = 60*15 # seconds of game time
+MAX_TIME_CEILING = 60*60 # most seconds of game time a request may ask for
+
+
+def simulate(ruleset_name, text, max_time=MAX_TIME, with_timeline=False):
+    """Parse and play a build order, and return (status, response)."""
+    ruleset = rulesets.get(ruleset_name)
+    facts = ruleset.facts()
+    try:
+        build_order = parser.parse_build_order_text(text, facts)
+    except Exception as e:
+        return 400, {'error': str(e), 'type': 'ParseError'}
+
+    game = ruleset.game(build_order, verbose=False)
+    try:
+        game.run(breaker=max_time)
+    except terran.StarcraftException as e:
+        return 422, {'error': str(e), 'type': e.__class__.__name__, 'result': _result(game, with_timeline)}
+    except Exception as e:
+        return 500, {'error': str(e), 'type': e.__class__.__name__}
+
+    return 200, {'result': _result(game, with_timeline)}
+
+
+def _result(game, with_timeline):
+    result = game.result()
+    if with_timeline:
+        result['timeline'] = timeline.TimelineIndex(game).to_dict()
+    return result
+
+
+def _simulate_in_worker(*args):
+    """Return the (status, response) of simulate, and the metrics recorded
+    while playing it. Never raises: the pool only calls back with results
+    (there is no error_callback before Python 3), and the callback is what
+    frees the request's slot.
+    """
+    try:
+        response = simulate(*args)
+    except Exception as e:
+        response = 500, {'error': str(e), 'type': e.__class__.__name__}
+    try:
+        recorded = metrics.REGISTRY.drain()
+    except Exception:
+        recorded = None
+    return response, recorded
+
+
+class SimulationService(object):
+    """Runs simulations in a bounded pool of worker processes.
+
+    At most `max_pending` simulations may be running or waiting at once;
+    beyond that, requests are refused rather than queued.
+    """
+
+    def __init__(self, ruleset_names=None, processes=None, max_pending=None):
+        registry = rulesets.registry()
+        for name in ruleset_names or registry.names():
+            registry.get(name).facts() # Load before forking, so workers start warm
+        self.processes = processes or multiprocessing.cpu_count()
+        self.pool = multiprocessing.Pool(self.processes, initializer=metrics.reset)
+        self.slots = threading.BoundedSemaphore(max_pending or self.processes * 2)
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+
+    def handle(self, request):
+        """Take a decoded request, and return (status, response)."""
+        started = time.time()
+        status, response = self.simulate_request(request)
+        metrics.REQUESTS.inc(labels=(str(status),))
+        metrics.REQUEST_SECONDS.observe(time.time() - started)
+        return status, response
+
+    def finished(self, result):
+        """Called in the pool's result thread, when a simulation finishes."""
+        try:
+            response, recorded = result
+            if recorded is not None:
+                metrics.REGISTRY.merge(recorded)
+        finally:
+            metrics.QUEUE_DEPTH.dec(labels=('service',))
+            self.slots.release()
+
+    def simulate_request(self, request):
+        text = request.get('build_order')
+        if not isinstance(text, basestring):
+            return 400, {'error': "Expected a `build_order` string", 'type': 'ParseError'}
+        ruleset_name = request.get('ruleset', 'HotS')
+        if ruleset_name not in rulesets.registry():
+            return 400, {'error': "Unknown ruleset `%s`" % ruleset_name, 'type': 'ParseError'}
+        try:
+            max_time = float(request.get('max_time', MAX_TIME))
+            timeout = float(request.get('timeout', DEFAULT_TIMEOUT))
+        except (TypeError, ValueError, OverflowError):
+            return 400, {'error': "Expected numbers for `max_time` and `timeout`"}
+        if any(math.isinf(n) or math.isnan(n) for n in (max_time, timeout)):
+            return 400, {'error': "Expected finite numbers for `max_time` and `timeout`"}
+        # A timed out request leaves its simulation running, so bound how long that is
+        max_time = min(int(max_time), MAX_TIME_CEILING)
+        with_timeline = bool(request.get('timeline', False))
+
+        if not self.slots.acquire(False):
+            return 503, {'error': "Too many simulations in progress, try again later"}
+        metrics.QUEUE_DEPTH.inc(labels=('service',))
+        # The slot is held until the simulation finishes, even if this request times out
+        pending = self.pool.apply_async(
+            _simulate_in_worker,
+            (ruleset_name, text, max_time, with_timeline),
+            callback=self.finished,
+        )
+        try:
+            response, recorded = pending.get(timeout)
+            return response
+        except multiprocessing.TimeoutError:
+            return 504, {'error': "Simulation took longer than %s seconds" % timeout}
+
+
+class SimulationRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path != '/metrics':
+            return self.respond(404, {'error': "Not found: %s" % self.path})
+        metrics.respond_with_metrics(self)
+
+    def do_POST(self):
+        if self.path != '/simulate':
+            return self.respond(404, {'error': "Not found: %s" % self.path})
+        try:
+            length = int(self.headers.getheader('content-length') or 0)
+            request = json.loads(self.rfile.read(length))
+        except ValueError as e:
+            return self.respond(400, {'error': "Invalid JSON: %s" % e})
+        if not isinstance(request, dict):
+            return self.respond(400, {'error': "Expected a JSON object"})
+        self.respond(*self.server.service.handle(request))
+
+    def respond(self, status, response):
+        body = json.dumps(response)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Keep the console quiet; one line per request adds up
+
+
+class SimulationServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service):
+        BaseHTTPServer.HTTPServer.__init__(self, address, SimulationRequestHandler)
+        self.service = service
+
+
+def serve(host='127.0.0.1', port=8642, **kwargs):
+    service = SimulationService(**kwargs)
+    server = SimulationServer((host, port), service)
+    print "Serving simulations on http://%s:%s/simulate with %s workers" % (host, port, service.processes)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
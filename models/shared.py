@@ -0,0 +1,312 @@
+"""Facts and results shared between worker processes, rather than pickled
+to and from every worker.
+
+The facts are compiled once into a file of fixed-width records, which each
+worker maps read-only:
+
+    compiled = shared.compile_facts(facts, "HotS.facts")
+    worker_facts = shared.attach_facts("HotS.facts")
+
+Results are written by the workers straight into one preallocated shared
+array, one fixed-width record per simulation:
+
+    results = shared.run_parallel(build_orders, "HotS.facts", processes=32)
+    results['time'], results['minerals'], ...
+
+"""
+
+import collections
+import json
+import mmap
+import multiprocessing
+import struct
+
+import numpy
+
+import facts as facts_module
+import terran
+
+
+MAGIC = 'SC2FACTS'
+HEADER_FORMAT = '<8sI' # magic, length of the JSON header
+CATEGORIES = ['units', 'buildings', 'research']
+NO_SUPPLY = -1 # The item has no supply column
+
+RECORD_DTYPE = numpy.dtype([
+    ('category', '<i4'),
+    ('minerals', '<i4'),
+    ('gas', '<i4'),
+    ('build_time', '<i4'),
+    ('supply', '<i4'),
+    ('dependencies_start', '<i4'),
+    ('dependencies_count', '<i4'),
+])
+
+RESULT_DTYPE = numpy.dtype([
+    ('done', '<i1'), # 1 once the simulation has been run
+    ('completed', '<i1'), # 1 if every command completed
+    ('error', '<i1'), # index into ERRORS
+    ('time', '<i4'),
+    ('minerals', '<i4'),
+    ('gas', '<i4'),
+    ('supply_used', '<i4'),
+    ('supply_available', '<i4'),
+    ('supply_blocked', '<i4'), # seconds
+])
+
+ERRORS = [None, 'SupplyBlocked', 'DependencyError', 'TimeLimitReached', 'Exception', 'Deadlocked']
+
+# The keys of a fact that are read straight from a record column
+FACT_COLUMNS = {'minerals': 'minerals', 'gas': 'gas', 'build time': 'build_time', 'supply': 'supply'}
+
+
+def _align(offset, size=8):
+    return (offset + size - 1) // size * size
+
+
+def compile_facts(facts, path):
+    """Write facts to `path` as a small JSON header of names and abilities,
+    an array of fixed-width records, and an array of dependency indexes.
+    """
+    names = []
+    categories = []
+    for category_index, category in enumerate(CATEGORIES):
+        for name in sorted(getattr(facts, category).keys()):
+            names.append(name)
+            categories.append(category_index)
+    index = dict((name, i) for i, name in enumerate(names))
+
+    records = numpy.zeros(len(names), dtype=RECORD_DTYPE)
+    dependencies = []
+    for i, name in enumerate(names):
+        fact = facts.cost(name)
+        records[i] = (
+            categories[i],
+            fact['minerals'],
+            fact['gas'],
+            fact['build time'],
+            fact.get('supply', NO_SUPPLY),
+            len(dependencies),
+            len(fact['dependencies']),
+        )
+        dependencies.extend(fact['dependencies'])
+
+    # Dependencies that are not items themselves (such as "barracks tech lab")
+    # are stored as negative indexes into a list of other names
+    other_names = sorted(set(d for d in dependencies if d not in index))
+    dependency_indexes = numpy.array(
+        [index[d] if d in index else -1 - other_names.index(d) for d in dependencies],
+        dtype='<i4',
+    )
+
+    header = json.dumps({
+        'names': names,
+        'other_names': other_names,
+        'abilities': facts.abilities,
+        'records': len(names),
+        'dependencies': len(dependencies),
+    })
+    records_offset = _align(struct.calcsize(HEADER_FORMAT) + len(header))
+
+    with open(path, 'wb') as f:
+        f.write(struct.pack(HEADER_FORMAT, MAGIC, len(header)))
+        f.write(header)
+        f.write('\0' * (records_offset - f.tell()))
+        f.write(records.tobytes())
+        f.write(dependency_indexes.tobytes())
+    return path
+
+
+class SharedFacts(object):
+    """Compiled facts, mapped read-only from a file. Many processes can map
+    the same file, and share one copy of it in memory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, header_length = struct.unpack_from(HEADER_FORMAT, self.buffer, 0)
+        if magic != MAGIC:
+            raise Exception("Not a compiled facts file: `%s`" % path)
+        start = struct.calcsize(HEADER_FORMAT)
+        header = json.loads(self.buffer[start:start + header_length])
+
+        self.names = [str(n) for n in header['names']]
+        self.other_names = [str(n) for n in header['other_names']]
+        self.abilities = dict(
+            (str(building), [str(a) for a in abilities])
+            for building, abilities in header['abilities'].items()
+        )
+        self.records = numpy.frombuffer(
+            self.buffer,
+            dtype=RECORD_DTYPE,
+            count=header['records'],
+            offset=_align(start + header_length),
+        )
+        self.dependencies = numpy.frombuffer(
+            self.buffer,
+            dtype='<i4',
+            count=header['dependencies'],
+            offset=_align(start + header_length) + self.records.nbytes,
+        )
+        # Each column is a view of the mapped records, not a copy
+        self.columns = dict((name, self.records[name]) for name in RECORD_DTYPE.names)
+        self._facts = None
+
+    def dependency_names(self, i):
+        start = self.columns['dependencies_start'].item(i)
+        count = self.columns['dependencies_count'].item(i)
+        return [self.names[d] if d >= 0 else self.other_names[-1 - d]
+                for d in self.dependencies[start:start + count].tolist()]
+
+    def facts(self):
+        """Return these facts as a Facts object, as the engine expects. Each
+        fact is a FactView of its record, so the facts stay in the shared
+        mapping rather than being copied into every process.
+        """
+        if self._facts is None:
+            categories = dict((c, {}) for c in CATEGORIES)
+            for i, name in enumerate(self.names):
+                categories[CATEGORIES[self.columns['category'][i]]][name] = FactView(self, i)
+            self._facts = facts_module.Facts(
+                categories['units'],
+                categories['buildings'],
+                categories['research'],
+                self.abilities,
+            )
+        return self._facts
+
+
+class FactView(collections.Mapping):
+    """The facts of one item, read from its shared record when asked for,
+    with the same keys as a fact loaded from the data files.
+    """
+
+    def __init__(self, shared, i):
+        self.shared = shared
+        self.i = i
+
+    def __repr__(self):
+        return "<FactView: %s>" % dict(self)
+
+    def __getitem__(self, key):
+        if key == 'name':
+            return self.shared.names[self.i]
+        if key == 'dependencies':
+            return self.shared.dependency_names(self.i)
+        if key not in FACT_COLUMNS:
+            raise KeyError(key)
+        value = self.shared.columns[FACT_COLUMNS[key]].item(self.i)
+        if key == 'supply' and value == NO_SUPPLY:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        keys = ['name', 'minerals', 'gas', 'build time', 'dependencies']
+        if self.shared.columns['supply'].item(self.i) != NO_SUPPLY:
+            keys.append('supply')
+        return iter(keys)
+
+    def __len__(self):
+        return len(list(iter(self)))
+
+
+_attached = {}
+
+def attach_facts(path):
+    """Return the Facts compiled to `path`, mapping the file once per process."""
+    if path not in _attached:
+        _attached[path] = SharedFacts(path)
+    return _attached[path].facts()
+
+
+class ResultBuffer(object):
+    """A preallocated array of RESULT_DTYPE records in shared memory. Workers
+    write their results into it, rather than sending them back.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.raw = multiprocessing.RawArray('b', max(size, 1) * RESULT_DTYPE.itemsize)
+        self.records = self.view(self.raw, size)
+
+    @staticmethod
+    def view(raw, size):
+        return numpy.frombuffer(raw, dtype=RESULT_DTYPE, count=size)
+
+
+def write_result(records, i, game, error):
+    record = records[i]
+    record['done'] = 1
+    record['completed'] = int(error is None and not game.build_order)
+    record['error'] = ERRORS.index(error) if error in ERRORS else ERRORS.index('Exception')
+    record['time'] = game.time
+    record['minerals'] = int(game.minerals_available)
+    record['gas'] = int(game.gas_available)
+    record['supply_used'] = game.supply_used
+    record['supply_available'] = game.supply_available
+    record['supply_blocked'] = game.supply.blocked_time()
+
+
+# Set in each worker process by _init_worker
+_WORKER_STATE = {}
+
+
+def _init_worker(build_orders, facts_path, raw, mining_rates, breaker):
+    _WORKER_STATE.update(
+        build_orders=build_orders,
+        facts=attach_facts(facts_path),
+        records=ResultBuffer.view(raw, len(build_orders)),
+        mining_rates=mining_rates,
+        breaker=breaker,
+    )
+
+
+def _run_range(bounds):
+    """Simulate the build orders in [start, stop), and write their results."""
+    start, stop = bounds
+    records = _WORKER_STATE['records']
+    for i in range(start, stop):
+        game = terran.HotsGame(
+            list(_WORKER_STATE['build_orders'][i]),
+            _WORKER_STATE['facts'],
+            mining_rates=_WORKER_STATE['mining_rates'],
+            verbose=False,
+        )
+        error = None
+        try:
+            game.run(_WORKER_STATE['breaker'])
+        except Exception as e:
+            error = e.__class__.__name__
+        write_result(records, i, game, error)
+    return stop - start
+
+
+def run_parallel(build_orders, facts_path, processes=None, chunk_size=64,
+                 mining_rates=None, breaker=60*15):
+    """Simulate a list of build orders against compiled facts, and return a
+    numpy array of RESULT_DTYPE records, one per build order, in order.
+
+    Workers are forked with the build orders and the result buffer, attach
+    to the facts file themselves, and only send back a count.
+    """
+    results = ResultBuffer(len(build_orders))
+    initargs = (build_orders, facts_path, results.raw, mining_rates, breaker)
+    ranges = [(i, min(i + chunk_size, len(build_orders)))
+              for i in range(0, len(build_orders), chunk_size)]
+
+    if processes == 1:
+        _init_worker(*initargs)
+        for bounds in ranges:
+            _run_range(bounds)
+    else:
+        pool = multiprocessing.Pool(processes, initializer=_init_worker, initargs=initargs)
+        try:
+            pool.map(_run_range, ranges)
+        finally:
+            pool.close()
+            pool.join()
+
+    return results.records
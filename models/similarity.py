@@ -0,0 +1,332 @@
+"""Find build orders that are nearly the same, such as ones that differ by a
+line or two, and grade a corpus by simulating one build order of each group.
+
+A build order is reduced to its shingles: every run of `n` commands in a
+row, each written in its canonical form without its supply number. Two
+build orders are as similar as the Jaccard similarity of their shingles,
+which MinHash signatures estimate, and a locality sensitive hash (LSH) of
+the signatures finds similar build orders without comparing every pair.
+
+    index = similarity.SimilarityIndex()
+    index.add("standard", build_order)
+    index.similar(other_build_order)   # [(name, similarity)], most similar first
+
+    clusters = similarity.cluster_build_orders(build_orders, threshold=0.7)
+    outcomes = similarity.run_clusters(build_orders, clusters, facts)
+
+Each cluster's representative is simulated in full, saving a checkpoint
+where each other build order in the cluster stops sharing its commands.
+The others are resumed from those checkpoints, so only the part where they
+differ is played again. A build order that shares less than half of
+itself (MIN_SHARED_FRACTION) is simulated in full instead.
+
+Resuming is not free: every checkpoint is a deep copy of a game, and a
+copy costs a fair part of playing one. Whether checkpoints win depends on
+how long the shared prefixes are. On 170 near-duplicate orders in 40
+clusters, in one process, a full run took 7.2-7.9s. Resuming took
+5.5-6.0s with edits anywhere in the order, and 4.6-4.9s with edits in the
+second half. Another corpus of 170 orders has measured the other way,
+7.56s with checkpoints against 6.6s in full. Measure a corpus with
+`--full` before relying on checkpoints.
+"""
+
+import copy
+import multiprocessing
+import zlib
+
+import numpy
+
+import batch
+import commands
+import terran
+
+
+SHINGLE_SIZE = 3 # commands per shingle
+PERMUTATIONS = 64 # values in a MinHash signature
+BANDS = 16 # LSH bands, of PERMUTATIONS / BANDS values each
+THRESHOLD = 0.7 # least estimated similarity for build orders to be near duplicates
+MIN_SHARED_FRACTION = 0.5 # least part of a build order shared with its representative to resume it
+
+PRIME = (1 << 31) - 1 # shingles are hashed to 32 bits, so a * x + b fits in 63
+START = '^'
+END = '$'
+
+# Set in each worker process by _init_worker
+_WORKER_STATE = {}
+
+
+def normalized(command):
+    """A command's canonical form, without the supply it is meant for."""
+    return "|".join(str(f) for f in command.canonical_fields())
+
+
+def shingles(build_order, size=SHINGLE_SIZE):
+    """Return the set of runs of `size` commands of a build order, as 32
+    bit hashes. The start and end are marked, so the first and last commands
+    count as much as the others, and every build order has a shingle.
+    """
+    lines = [START] + [normalized(c) for c in build_order] + [END]
+    size = min(size, len(lines))
+    return set(zlib.crc32("\n".join(lines[i:i + size])) & 0xffffffff
+               for i in range(len(lines) - size + 1))
+
+
+def jaccard(a, b):
+    """The exact similarity of two sets of shingles."""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / float(len(a | b))
+
+
+class MinHasher(object):
+    """Computes MinHash signatures with `permutations` random hash functions
+    of the form (a * x + b) mod PRIME. The same seed gives the same signatures.
+    """
+
+    def __init__(self, permutations=PERMUTATIONS, seed=1):
+        self.permutations = permutations
+        state = numpy.random.RandomState(seed)
+        self.a = state.randint(1, PRIME, size=permutations).astype(numpy.uint64)
+        self.b = state.randint(0, PRIME, size=permutations).astype(numpy.uint64)
+
+    def __repr__(self):
+        return "<MinHasher: %s permutations>" % self.permutations
+
+    def signature(self, shingle_set):
+        x = numpy.fromiter(shingle_set, dtype=numpy.uint64, count=len(shingle_set))
+        hashes = (self.a[:, None] * x[None, :] + self.b[:, None]) % PRIME
+        return hashes.min(axis=1).astype(numpy.uint32)
+
+    @staticmethod
+    def similarity(a, b):
+        """The similarity of two build orders, estimated from their signatures."""
+        return float(numpy.count_nonzero(a == b)) / len(a)
+
+
+class LSHIndex(object):
+    """Signatures split into `bands`, with a bucket for each band's values.
+    Build orders that share any bucket are candidates to be similar: with
+    16 bands of 4, a pair of similarity 0.7 shares one 98% of the time, and
+    a pair of similarity 0.3 only 12% of the time.
+    """
+
+    def __init__(self, bands=BANDS, rows=PERMUTATIONS // BANDS):
+        self.bands = bands
+        self.rows = rows
+        self.buckets = {} # (band, values) -> [key]
+
+    def __repr__(self):
+        return "<LSHIndex: %s bands of %s, %s buckets>" % (self.bands, self.rows, len(self.buckets))
+
+    def band_keys(self, signature):
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tostring())
+                for band in range(self.bands)]
+
+    def add(self, key, signature):
+        for band_key in self.band_keys(signature):
+            self.buckets.setdefault(band_key, []).append(key)
+
+    def candidates(self, signature):
+        """Return the keys that share a bucket with `signature`, in the order added."""
+        seen = set()
+        found = []
+        for band_key in self.band_keys(signature):
+            for key in self.buckets.get(band_key, ()):
+                if key not in seen:
+                    seen.add(key)
+                    found.append(key)
+        return found
+
+
+class SimilarityIndex(object):
+    """Build orders by name, to look up the ones similar to a build order."""
+
+    def __init__(self, shingle_size=SHINGLE_SIZE, permutations=PERMUTATIONS, bands=BANDS, seed=1):
+        if permutations % bands:
+            raise Exception("Permutations must divide into bands evenly: `%s`" % bands)
+        self.shingle_size = shingle_size
+        self.hasher = MinHasher(permutations, seed)
+        self.lsh = LSHIndex(bands, permutations // bands)
+        self.signatures = {} # name -> signature
+
+    def __repr__(self):
+        return "<SimilarityIndex: %s build orders>" % len(self.signatures)
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def signature(self, build_order):
+        return self.hasher.signature(shingles(build_order, self.shingle_size))
+
+    def add(self, name, build_order=None, signature=None):
+        if signature is None:
+            signature = self.signature(build_order)
+        self.signatures[name] = signature
+        self.lsh.add(name, signature)
+        return signature
+
+    def similar(self, build_order=None, threshold=THRESHOLD, signature=None):
+        """Return a list of (name, estimated similarity) of the build orders
+        at least `threshold` similar, the most similar first.
+        """
+        if signature is None:
+            signature = self.signature(build_order)
+        found = [(name, self.hasher.similarity(signature, self.signatures[name]))
+                 for name in self.lsh.candidates(signature)]
+        found = [(name, s) for name, s in found if s >= threshold]
+        return sorted(found, key=lambda f: (-f[1], f[0]))
+
+
+class Cluster(object):
+    """Build orders near the same representative."""
+
+    def __init__(self, representative):
+        self.representative = representative
+        self.members = [representative]
+
+    def __repr__(self):
+        return "<Cluster: %s, %s build orders>" % (self.representative, len(self.members))
+
+    def __len__(self):
+        return len(self.members)
+
+
+def cluster_build_orders(build_orders, threshold=THRESHOLD, index=None):
+    """Group a dict of {name: commands} into a list of Clusters, the largest
+    first. In order of name, each build order joins the cluster of the most
+    similar representative, or else becomes a representative itself, so
+    every member is near its representative, and not only near a neighbour.
+
+    Pass a SimilarityIndex to keep the signatures of every build order, for
+    "similar builds" lookups afterwards.
+    """
+    if index is None:
+        index = SimilarityIndex()
+    representatives = SimilarityIndex(index.shingle_size, index.hasher.permutations, index.lsh.bands)
+    representatives.hasher = index.hasher
+    clusters = {}
+    for name in sorted(build_orders):
+        signature = index.add(name, build_orders[name])
+        found = representatives.similar(signature=signature, threshold=threshold)
+        if found:
+            clusters[found[0][0]].members.append(name)
+        else:
+            representatives.add(name, signature=signature)
+            clusters[name] = Cluster(name)
+    return sorted(clusters.values(), key=lambda c: (-len(c), c.representative))
+
+
+def shared_prefix(a, b):
+    """Return how many commands two build orders have in common from the start."""
+    length = 0
+    for x, y in zip(a, b):
+        if x.canonical() != y.canonical():
+            break
+        length += 1
+    return length
+
+
+def resume(checkpoint, index, build_order, facts, breaker=batch.MAX_TIME):
+    """Play a build order from the checkpoint at command `index` of another
+    build order with the same first `index` commands, and return its
+    outcome, as batch.simulate would.
+    """
+    game = copy.deepcopy(checkpoint, {id(facts): facts})
+    game.checkpoints = None
+    # The shared commands are the checkpoint's own, which its events refer to
+    shared = game.commands[:index]
+    for command, own in zip(shared, build_order):
+        command.raw = own.raw
+    game.commands = shared + list(build_order[index:])
+    game.build_order = list(build_order[index:])
+
+    outcome = {'error': None, 'type': None}
+    try:
+        game.resume(breaker)
+    except Exception as e:
+        outcome.update(error=str(e), type=e.__class__.__name__)
+    outcome['result'] = game.result()
+    return outcome
+
+
+def _init_worker(facts, mining_rates, breaker, use_checkpoints):
+    _WORKER_STATE.update(facts=facts, mining_rates=mining_rates, breaker=breaker,
+                         use_checkpoints=use_checkpoints)
+
+
+def _run_cluster(task):
+    """Simulate a cluster's representative, and resume its other build
+    orders from its checkpoints. Return a list of (name, outcome).
+    """
+    facts = _WORKER_STATE['facts']
+    mining_rates = _WORKER_STATE['mining_rates']
+    breaker = _WORKER_STATE['breaker']
+    representative, build_orders = task[0], dict(task[1])
+    if not _WORKER_STATE['use_checkpoints']:
+        return [(name, batch.simulate(build_order, facts, mining_rates, breaker))
+                for name, build_order in sorted(build_orders.items())]
+
+    # Copying a game costs a fair part of playing one, so only the
+    # checkpoints the other build orders resume from are saved. A build order
+    # that shares less than MIN_SHARED_FRACTION of itself would save too
+    # little to pay for its copy, and is simulated in full
+    representative_hash = commands.build_order_hash(build_orders[representative])
+    prefixes = {}
+    for name, build_order in build_orders.items():
+        if name != representative and commands.build_order_hash(build_order) != representative_hash:
+            prefix = shared_prefix(build_orders[representative], build_order)
+            prefixes[name] = prefix if prefix >= MIN_SHARED_FRACTION * len(build_order) else 0
+    game = terran.HotsGame(list(build_orders[representative]), facts, mining_rates=mining_rates,
+                           verbose=False, checkpoints=set(prefixes.values()) - set([0]) or False)
+    outcome = {'error': None, 'type': None}
+    try:
+        game.run(breaker)
+    except Exception as e:
+        outcome.update(error=str(e), type=e.__class__.__name__)
+    outcome['result'] = game.result()
+
+    outcomes = [(representative, outcome)]
+    checkpoints = game.checkpoints or {}
+    for name, build_order in sorted(build_orders.items()):
+        if name == representative:
+            continue
+        if name not in prefixes:
+            outcomes.append((name, dict(outcome)))
+        elif prefixes[name] in checkpoints:
+            index = prefixes[name]
+            outcomes.append((name, resume(checkpoints[index], index, build_order, facts, breaker)))
+        else:
+            # The representative stopped before the commands they share, or they share none
+            outcomes.append((name, batch.simulate(build_order, facts, mining_rates, breaker)))
+    return outcomes
+
+
+def run_clusters(build_orders, clusters, facts, mining_rates=None, use_checkpoints=True,
+                 processes=None, breaker=batch.MAX_TIME):
+    """Simulate every build order in a dict of {name: commands}, a cluster at
+    a time, and return a dict of {name: outcome}, as batch.run_batch does.
+    Every outcome also has its cluster's `representative`.
+
+    Without `use_checkpoints`, every build order is simulated in full.
+    Pass processes=1 to run in this process.
+    """
+    tasks = [(c.representative, [(name, build_orders[name]) for name in c.members]) for c in clusters]
+    initargs = (facts, mining_rates, breaker, use_checkpoints)
+    if processes == 1:
+        _init_worker(*initargs)
+        results = [_run_cluster(task) for task in tasks]
+    else:
+        pool = multiprocessing.Pool(processes, initializer=_init_worker, initargs=initargs)
+        try:
+            results = pool.map(_run_cluster, tasks)
+        finally:
+            pool.close()
+            pool.join()
+
+    outcomes = {}
+    for cluster, cluster_outcomes in zip(clusters, results):
+        for name, outcome in cluster_outcomes:
+            outcome['hash'] = commands.build_order_hash(build_orders[name])
+            outcome['representative'] = cluster.representative
+            outcomes[name] = outcome
+    return outcomes
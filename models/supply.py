@@ -0,0 +1,68 @@
+"""Keeps count of supply, so that supply blocks can be answered without
+scanning every unit, and records how long the build was supply blocked.
+"""
+
+
+class SupplyLedger(object):
+    """Supply used and available, supply depots in progress, and every
+    interval of time the build spent supply blocked.
+    """
+
+    def __init__(self, available=0, used=0):
+        self.available = available
+        self.used = used
+        self.depots_in_progress = 0
+
+        self.blocked_intervals = [] # dicts of start, end, duration, command
+        self.blocked_since = None
+        self.blocked_command = None
+
+    def __repr__(self):
+        return "<SupplyLedger: %s/%s, %s depots in progress>" % (
+            self.used,
+            self.available,
+            self.depots_in_progress,
+        )
+
+    def use(self, supply):
+        self.used += supply
+
+    def provide(self, supply):
+        self.available += supply
+
+    def free(self):
+        return self.available - self.used
+
+    def can_use(self, supply):
+        return self.used + supply <= self.available
+
+    def depot_started(self):
+        self.depots_in_progress += 1
+
+    def depot_finished(self):
+        self.depots_in_progress -= 1
+
+    def is_blocked(self):
+        return self.blocked_since is not None
+
+    def block(self, time, command):
+        """Record that `command` is waiting on supply at this time."""
+        if self.blocked_since is None:
+            self.blocked_since = time
+            self.blocked_command = command
+
+    def unblock(self, time):
+        """Record that nothing is waiting on supply at this time."""
+        if self.blocked_since is None:
+            return
+        self.blocked_intervals.append({
+            'start': self.blocked_since,
+            'end': time,
+            'duration': time - self.blocked_since,
+            'command': self.blocked_command.raw,
+        })
+        self.blocked_since = None
+        self.blocked_command = None
+
+    def blocked_time(self):
+        return sum(i['duration'] for i in self.blocked_intervals)
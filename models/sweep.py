@@ -0,0 +1,190 @@
+"""Run a set of build orders against variants of the facts and mining rates,
+for example to see how a balance patch changes a corpus of build orders.
+
+An override names the value to change:
+
+    "marine.minerals": 45               # any column of a units, buildings or research file
+    "barracks.build time": 60
+    "mining.mineral_collection_rate": 0.75   # any attribute of mining.MiningRates
+
+    variants = sweep.grid({
+        "marine.minerals": [45, 50],
+        "mining.mineral_collection_rate": [0.65, 0.70, 0.75],
+    })
+    table = sweep.run_sweep({"standard": build_order}, facts, variants)
+    table.write("sweep.json")
+
+"""
+
+import itertools
+import json
+import multiprocessing
+
+import facts as facts_module
+import mining
+import terran
+
+
+MINING_PREFIX = "mining."
+
+# Set in each worker process by _init_worker, so that the parsed facts and
+# build orders are sent to a worker once, and shared by every variant.
+_WORKER_STATE = {}
+
+
+def grid(values):
+    """Take a dict of {override: [value, ...]} and return a list of
+    override dicts, one for every combination of values.
+    """
+    keys = sorted(values.keys())
+    return [dict(zip(keys, combination))
+            for combination in itertools.product(*[values[k] for k in keys])]
+
+
+def split_override(key):
+    """Split "siege tank.build time" into ("siege tank", "build time")."""
+    if "." not in key:
+        raise Exception("Invalid override `%s`, expected <item>.<column>" % key)
+    return key.rsplit(".", 1)
+
+
+def apply_overrides(base_facts, overrides):
+    """Return a new (Facts, MiningRates) with the given overrides applied.
+
+    Records that are not overridden are shared with `base_facts`, rather than copied.
+    """
+    categories = {
+        'units': dict(base_facts.units),
+        'buildings': dict(base_facts.buildings),
+        'research': dict(base_facts.research),
+    }
+    rates = {}
+
+    for key, value in overrides.items():
+        if key.startswith(MINING_PREFIX):
+            rates[key[len(MINING_PREFIX):]] = value
+            continue
+
+        item_name, column = split_override(key)
+        for records in categories.values():
+            if item_name in records:
+                break
+        else:
+            raise Exception("Invalid item name: `%s`" % item_name)
+
+        if column not in records[item_name]:
+            raise Exception("Invalid column `%s` for `%s`" % (column, item_name))
+        record = dict(records[item_name])
+        record[column] = value
+        records[item_name] = record
+
+    variant_facts = facts_module.Facts(
+        categories['units'],
+        categories['buildings'],
+        categories['research'],
+        base_facts.abilities,
+    )
+    return variant_facts, mining.MiningRates(**rates)
+
+
+def _init_worker(build_orders, base_facts, variants):
+    _WORKER_STATE.update(
+        build_orders=build_orders,
+        base_facts=base_facts,
+        variants=variants,
+        compiled={},
+    )
+
+
+def _variant(index):
+    """Return the (Facts, MiningRates) of a variant, applying its overrides
+    only the first time this worker sees it.
+    """
+    compiled = _WORKER_STATE['compiled']
+    if index not in compiled:
+        compiled[index] = apply_overrides(
+            _WORKER_STATE['base_facts'],
+            _WORKER_STATE['variants'][index],
+        )
+    return compiled[index]
+
+
+def _run_one(task):
+    variant_index, order_index = task
+    name, build_order = _WORKER_STATE['build_orders'][order_index]
+    variant_facts, rates = _variant(variant_index)
+
+    game = terran.HotsGame(list(build_order), variant_facts, mining_rates=rates, verbose=False)
+    error = None
+    try:
+        game.run()
+    except Exception as e:
+        error = "%s: %s" % (e.__class__.__name__, e)
+
+    return variant_index, name, game.result(), error
+
+
+class SweepTable(object):
+    """Results stored as one list per column, with one row per
+    (variant, build order).
+    """
+
+    COLUMNS = ['variant', 'build_order', 'completed', 'time', 'minerals',
+               'gas', 'supply_used', 'supply_available', 'error']
+
+    def __init__(self, override_keys):
+        self.override_keys = sorted(override_keys)
+        self.columns = dict((c, []) for c in self.COLUMNS + self.override_keys)
+
+    def __len__(self):
+        return len(self.columns['variant'])
+
+    def append(self, variant_index, overrides, name, result, error):
+        self.columns['variant'].append(variant_index)
+        self.columns['build_order'].append(name)
+        self.columns['completed'].append(error is None and result['completed'])
+        for column in ('time', 'minerals', 'gas', 'supply_used', 'supply_available'):
+            self.columns[column].append(result[column])
+        self.columns['error'].append(error)
+        for key in self.override_keys:
+            self.columns[key].append(overrides.get(key))
+
+    def rows(self):
+        names = self.COLUMNS + self.override_keys
+        return [dict((n, self.columns[n][i]) for n in names) for i in range(len(self))]
+
+    def write(self, filename):
+        with open(filename, 'w') as f:
+            json.dump({
+                'columns': self.COLUMNS + self.override_keys,
+                'data': self.columns,
+            }, f, separators=(',', ':'))
+
+
+def run_sweep(build_orders, base_facts, variants, processes=None):
+    """Run every build order against every variant, and return a SweepTable.
+
+    `build_orders` is a dict of {name: commands}, and `variants` a list of
+    override dicts (see `grid`). Pass processes=1 to run in this process.
+    """
+    build_orders = sorted(build_orders.items())
+    tasks = [(v, o) for v in range(len(variants)) for o in range(len(build_orders))]
+    initargs = (build_orders, base_facts, variants)
+
+    if processes == 1:
+        _init_worker(*initargs)
+        results = [_run_one(task) for task in tasks]
+    else:
+        pool = multiprocessing.Pool(processes, initializer=_init_worker, initargs=initargs)
+        try:
+            # Tasks are ordered by variant, so each worker tends to reuse its compiled variant
+            results = pool.map(_run_one, tasks, chunksize=max(1, len(build_orders)))
+        finally:
+            pool.close()
+            pool.join()
+
+    override_keys = set(k for v in variants for k in v)
+    table = SweepTable(override_keys)
+    for variant_index, name, result, error in results:
+        table.append(variant_index, variants[variant_index], name, result, error)
+    return table
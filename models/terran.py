@@ -1,4 +1,15 @@
+import copy
+import time
+
+import attachments
 import commands
+import effects
+import metrics
+import mining
+import readiness
+import research
+import supply
+import utilization
 
 class StarcraftException(Exception):
     """An exception specific to this codebase."""
@@ -9,6 +20,12 @@ class SupplyBlocked(StarcraftException):
 class DependencyError(StarcraftException):
     """This build is attempting to build an item without first building its dependency"""
 
+class TimeLimitReached(StarcraftException):
+    """This build did not complete before the time limit"""
+
+class Deadlocked(StarcraftException):
+    """Nothing that can happen in this game will let the next command begin"""
+
 class HotsGame(object):
     """The game engine."""
 
@@ -16,28 +33,95 @@ class HotsGame(object):
 
     minerals_available = 50 # TODO: FACT CHECK
     gas_available = 0
-    supply_available = 11 # TODO: FACT CHECK
-    supply_used = 0
+    initial_supply = 11 # TODO: FACT CHECK
+    supply = None
+    swap_time = 5 # seconds to lift off and land, TODO: FACT CHECK
 
     build_order = None
     facts = None
 
-    units = []
-    buildings = []
-    research = []
-    attachments = []
-
-    def __init__(self, build_order, facts):
+    units = None
+    buildings = None
+    research = None
+    attachments = None
+    mining = None
+
+    verbose = True
+    checkpoints = None
+    checkpoint_indices = None
+    tick_start_supply = 0
+
+    lookahead = 0
+    # (failed, time) this game finishes at if no more commands begin early,
+    # or None until a command in the lookahead window could begin
+    lookahead_finish = None
+    breaker = 60*15
+    # Counts begins, completes, supply changes, and effects: everything but
+    # the bank that can change what the head of the build order waits on
+    changes = 0
+    head_wait = None # (command, changes, reason, index) last found for the head
+    deadlock_checked = None # (command, reason, changes) last found not deadlocked
+    # Minerals, gas, and supply kept for commands waiting ahead of the one being tried
+    reserved_minerals = 0
+    reserved_gas = 0
+    reserved_supply = 0
+
+    def __init__(self, build_order, facts, mining_rates=None, seed=None, jitter=0.0, verbose=True,
+                 checkpoints=False, lookahead=0):
+        """Pass a `jitter` fraction to simulate in stochastic mode, where every
+        mining trip takes a little more or less time. The same `seed` always
+        produces the same game.
+
+        With `checkpoints`, a copy of the game is saved just before each
+        command is first attempted, keyed by the command's index. Pass a
+        collection of indices to save only those.
+
+        With a `lookahead` of N, while the head of the build order waits, any
+        of the next N commands may begin, if it takes none of the minerals,
+        gas, supply, or producers that the commands before it are waiting on,
+        and the build would finish no later for it.
+        """
         self.build_order = build_order
+        self.commands = list(build_order)
         self.facts = facts
+        self.verbose = verbose
+        self.lookahead = lookahead
+        self.readiness = readiness.ReadinessIndex()
+        self.started_ahead = [] # indices of commands begun before the head of the build order
 
+        self.checkpoints = {} if checkpoints else None
+        self.checkpoint_indices = None if checkpoints is True or not checkpoints else frozenset(checkpoints)
         self.constant_commands = []
-
-        self.buildings = [CommandCenter(self)]
+        self.waits = utilization.CommandWaits()
+        self.events = [] # (time, 'begin' or 'complete', command)
+        self.supply_changes = [] # (time, supply used, supply available), when either changes
+        self.initial_minerals = self.minerals_available
+        self.initial_gas = self.gas_available
+        self.bank_changes = [] # (time, minerals, gas), the net change to the bank in each second it changed
+
+        self.units = []
+        self.research = []
+        self.research_table = research.ResearchTable(facts.research_names())
+        self.attachment_index = attachments.AttachmentIndex()
+        self.attachments = self.attachment_index.attachments
+        self.supply = supply.SupplyLedger(available=self.initial_supply)
+        self.random = None
+        if jitter:
+            import random # Slow to import, and only stochastic games need it
+            self.random = random.Random(seed)
+        self.mining = mining.MiningModel(mining_rates, random=self.random, jitter=jitter)
+        self.effects = effects.EffectScheduler()
+
+        self.buildings = []
+        self.add_building(CommandCenter(self))
         initial_scv_count = 5
         for i in range(initial_scv_count):
             self.units.append(Scv(self))
             self.spend(supply_used=1)
+        # {item name: count} the game began with, since no command made them
+        self.initial_items = {}
+        for item in self.buildings + self.units:
+            self.initial_items[item.name] = self.initial_items.get(item.name, 0) + 1
 
 
     def __repr__(self):
@@ -49,6 +133,14 @@ class HotsGame(object):
             len(self.units),
         )
     
+    @property
+    def supply_used(self):
+        return self.supply.used
+
+    @property
+    def supply_available(self):
+        return self.supply.available
+
     def can_afford(self, item_name):
         """Return True iff the game has the minerals, gas, supply, and prerequisites
         to build the given unit, building, or research.
@@ -56,85 +148,528 @@ class HotsGame(object):
         costs = self.facts.cost(item_name)
 
         # check if has gas, minerals
-        if self.minerals_available < costs['minerals']:
+        if self.free_minerals() < costs['minerals']:
             return False
-        if self.gas_available < costs['gas']:
+        if self.free_gas() < costs['gas']:
             return False
 
         # check if any prerequisites do not exist
         if any(not self.has_item(prereq) for prereq in costs['dependencies']):
             return False
+        # research can only be done once
+        if item_name in self.research_table and not self.research_table.can_begin(item_name):
+            return False
         # check if there's enough supply
-        if ('supply' in costs) \
-                and self.supply_available < self.supply_used + costs['supply']:
+        if costs.get('supply') and not self.supply.can_use(costs['supply'] + self.reserved_supply):
             return False
 
         return True
 
+    def free_minerals(self):
+        """The minerals not kept for commands waiting ahead. A command that
+        waits on more than the bank holds keeps all of it, and no more, so
+        commands that cost no minerals are never held up.
+        """
+        return max(self.minerals_available - self.reserved_minerals, 0)
+
+    def free_gas(self):
+        return max(self.gas_available - self.reserved_gas, 0)
+
     def has_item(self, item_name):
         """Return True iff the game has completed building the
         given name of a building, unit, or research.
 
         """
+        if item_name in self.research_table:
+            return self.research_table.is_complete(item_name)
         return item_name in [b.name for b in self.buildings] or \
+            item_name in [b.proper_name() for b in self.buildings] or \
             item_name in [u.name for u in self.units] or \
-            item_name in [r.name for r in self.research] or \
             item_name in [r.proper_name() for r in self.attachments]
             
 
         
 
+    def log(self, message):
+        if self.verbose:
+            print message
+
+    def record(self, kind, command):
+        """Record that a command began or completed at the current time."""
+        self.events.append((self.time, kind, command))
+        self.changes += 1
+        self.readiness.wake(utilization.PREREQUISITE, utilization.PRODUCER, utilization.OTHER)
+
+    def record_supply(self):
+        """Record supply used and available at the current time, if changed."""
+        supply = (self.supply_used, self.supply_available)
+        if not self.supply_changes or self.supply_changes[-1][1:] != supply:
+            self.supply_changes.append((self.time,) + supply)
+
+    def command_timings(self):
+        """Return a list of (command, begin time, complete time) for every
+        command in the build order, in order. Times are None if the command
+        never began or completed.
+        """
+        begin = {}
+        complete = {}
+        for time, kind, command in self.events:
+            times = begin if kind == 'begin' else complete
+            times.setdefault(id(command), time)
+        return [(c, begin.get(id(c)), complete.get(id(c))) for c in self.commands]
+
+    def command_waits(self):
+        """Return a list of (command, seconds waited, {reason: seconds}) for
+        every command in the build order, in order.
+        """
+        return [(c, self.waits.total(i), self.waits.reasons(i)) for i, c in enumerate(self.commands)]
+
+    def structure_key(self):
+        """Return a hashable summary of everything but the bank: owned items,
+        commands in progress with their remaining time, supply, how many
+        workers collect from each resource node, energy, effects still to
+        come, and the constant commands.
+        """
+        from collections import Counter
+
+        owned = Counter(i.proper_name() for i in self.buildings + self.units + self.research + self.attachments)
+        in_progress = sorted(
+            (p.proper_name(), p.command_in_progress['command'].item_name, p.command_in_progress['time'] - self.time)
+            for p in self.buildings + self.units + self.attachments if p.command_in_progress
+        )
+        workers = tuple(len(node.workers) for node in self.mining.nodes)
+        energy = sorted(
+            (a.proper_name(), int(a.energy.value(self.time)))
+            for a in self.attachments if isinstance(a, OrbitalCommand)
+        )
+        pending = tuple(
+            (due - self.time, name, self.effect_key(name, args))
+            for due, name, args in self.effects.pending()
+        )
+        return (
+            tuple(sorted(owned.items())),
+            tuple(in_progress),
+            self.supply_used,
+            self.supply_available,
+            workers,
+            tuple(energy),
+            pending,
+            tuple(c.item_name for c in self.constant_commands),
+        )
+
+    def effect_key(self, name, args):
+        """Return the arguments of a pending effect as plain values that are
+        the same in equal games: times relative to now, and resource nodes
+        by their position.
+        """
+        if name == 'mule_trip':
+            return (args[0] - self.time,)
+        return tuple(self.mining.nodes.index(a) if isinstance(a, mining.ResourceNode) else a for a in args)
+
+    def state_key(self, quantum=5):
+        """Return a hashable key that is the same for games in the same state,
+        with banks equal to within `quantum` minerals and gas.
+        """
+        return self.structure_key() + (
+            int(self.minerals_available // quantum),
+            int(self.gas_available // quantum),
+        )
+
+    def result(self):
+        """Return the final state of the game as a dict of plain values."""
+        from collections import Counter
+
+        def count(items):
+            return dict(Counter(i.proper_name() for i in items))
+
+        return {
+            'time': self.time,
+            'minerals': self.minerals_available,
+            'gas': self.gas_available,
+            'supply_used': self.supply_used,
+            'supply_available': self.supply_available,
+            'completed': not self.build_order,
+            'buildings': count(self.buildings),
+            'units': count(self.units),
+            'research': count(self.research),
+            'supply_blocked': list(self.supply.blocked_intervals),
+            'commands': [
+                {'command': c.raw, 'begin': begin, 'complete': complete,
+                 'wait': self.waits.total(i), 'blocked': self.waits.reasons(i)}
+                for i, (c, begin, complete) in enumerate(self.command_timings())
+            ],
+            'utilization': [
+                {'producer': name, 'seconds': seconds}
+                for name, seconds in self.producer_utilization()
+            ],
+        }
+
     def earn(self, minerals=0, gas=0, supply_used=0, supply_available=0):
         self.minerals_available += minerals
         self.gas_available += gas
-        self.supply_available += supply_available
-        self.supply_used += supply_used
+        self.record_bank(minerals, gas)
+        self.supply.provide(supply_available)
+        self.supply.use(supply_used)
+        if supply_used or supply_available:
+            self.changes += 1
+        if supply_available:
+            self.readiness.wake(utilization.SUPPLY)
 
     def spend(self, minerals=0, gas=0, supply_used=0, supply_available=0):
         self.minerals_available -= minerals
         self.gas_available -= gas
-        self.supply_available += supply_available
-        self.supply_used += supply_used
+        self.record_bank(-minerals, -gas)
+        self.supply.provide(supply_available)
+        self.supply.use(supply_used)
+        if supply_used or supply_available:
+            self.changes += 1
+
+    def record_bank(self, minerals, gas):
+        """Add a change to the bank to the changes of the current second."""
+        if not minerals and not gas:
+            return
+        if self.bank_changes and self.bank_changes[-1][0] == self.time:
+            time, total_minerals, total_gas = self.bank_changes[-1]
+            self.bank_changes[-1] = (time, total_minerals + minerals, total_gas + gas)
+        else:
+            self.bank_changes.append((self.time, minerals, gas))
+
 
+    def run(self, breaker=60*15):
+        """Play the build order until every command completes.
 
-    def run(self):
-        breaker = 60*15 # Prevent an infinite loop by breaking at this time
+        `breaker` is the number of seconds to play before giving up, or None
+        to play for as long as it takes. Either way, a build order that can
+        never complete raises Deadlocked, or SupplyBlocked if it waits on
+        supply, as soon as that is certain.
+        Commands in progress always complete, even past the breaker.
+        """
+        started, start_time = time.time(), self.time
+        try:
+            self.play(breaker)
+        except Exception as e:
+            metrics.record_simulation(self.time - start_time, time.time() - started, e.__class__.__name__)
+            raise
+        metrics.record_simulation(self.time - start_time, time.time() - started)
+        return self
+
+    def play(self, breaker):
+        self.breaker = breaker
         self.print_progress_line()
         while self.build_order or self.anything_in_progress():
             if not self.build_order:
                 self.constant_commands = []
             self.tick()
-            breaker -= 1
-            if breaker <= 0:
-                print "breaking...", self.time
-                # TODO: if just waiting to complete last command, then this will raise exception
-                self.print_report()
-                raise Exception("Could not complete command: `%s`" % self.build_order[0].raw)
-                break
-
-        self.print_report()
-
-        return self
-
-    def is_supply_blocked(self):
-        no_supply_available = self.supply_available - self.supply_used <= 0
-        # are any scv building supply depots?
-        running_commands = [u.command_in_progress['command'] 
-                            for u in self.units if u.command_in_progress and u.name == 'scv']
-        supply_in_progress = any([c.item_name == 'supply depot' for c in running_commands])
-
-        no_more_commands = not self.build_order
-        # Can't be supply blocked if there are no more commands
-        if no_more_commands:
-            return False
-
-        # Is supply depot the next command?
-        next_command_is_supply = self.build_order[0].item_name == 'supply depot'
+            if breaker is not None and self.time >= breaker and self.build_order:
+                self.log("breaking... %s" % self.time)
+                if self.verbose:
+                    self.print_report()
+                raise TimeLimitReached("Could not complete command: `%s`" % self.build_order[0].raw)
+
+        self.supply.unblock(self.time)
+        self.waits.close(self.time)
+        if self.verbose:
+            self.print_report()
+
+    def resume(self, breaker=60*15):
+        """Finish the tick a checkpoint was taken in, and play on from there."""
+        self.lookahead_finish = None # The checkpoint may have been changed
+        self.dispatch()
+        self.end_tick()
+        return self.run(breaker)
+
+    def next_command_index(self):
+        """The index in `commands` of the command at the head of the build order."""
+        removed = len(self.commands) - len(self.build_order)
+        # Commands begun ahead of the head are gone from the build order too
+        for ahead in range(len(self.started_ahead) + 1):
+            index = removed - ahead
+            if index not in self.started_ahead and len([i for i in self.started_ahead if i > index]) == ahead:
+                return index
+        return removed
+
+    def window_index(self, position):
+        """The index in `commands` of the command at `position` in the build order."""
+        index = self.next_command_index()
+        while position:
+            index += 1
+            if index not in self.started_ahead:
+                position -= 1
+        return index
+
+    def save_checkpoint(self):
+        """Save a copy of the game just before the head of the build order is
+        first attempted. Resuming the copy replays the rest of the game from there.
+        """
+        index = self.next_command_index()
+        if index in self.checkpoints:
+            return
+        if self.checkpoint_indices is not None and index not in self.checkpoint_indices:
+            return
+        checkpoints, self.checkpoints = self.checkpoints, None
+        # Facts never change, so the copy shares them
+        checkpoints[index] = copy.deepcopy(self, {id(self.facts): self.facts})
+        self.checkpoints = checkpoints
+
+    def blocked_reason(self, command):
+        """Return why a command that could not begin is waiting."""
+        if self.time < command.not_before:
+            return utilization.HELD
+        if command.is_swap():
+            return utilization.PRODUCER
+        costs = self.facts.all().get(command.item_name)
+        if costs is None:
+            return utilization.OTHER
+        if any(not self.has_item(prereq) for prereq in costs['dependencies']):
+            return utilization.PREREQUISITE
+        if command.item_name in self.research_table and not self.research_table.can_begin(command.item_name):
+            return utilization.OTHER
+        # A mule costs only energy
+        if command.item_name == 'mule':
+            return utilization.ENERGY
+        if self.free_minerals() < costs['minerals']:
+            return utilization.MINERALS
+        if self.free_gas() < costs['gas']:
+            return utilization.GAS
+        if costs.get('supply') and not self.supply.can_use(costs['supply'] + self.reserved_supply):
+            return utilization.SUPPLY
+        return utilization.PRODUCER
+
+    def update_waits(self):
+        """Record why the head of the build order is waiting, and return it.
+        The reason is only worked out again once something has changed, or
+        once the bank holds what the head was waiting for.
+        """
+        if not self.build_order:
+            self.waits.close(self.time)
+            return None
+        head = self.build_order[0]
+        wait = self.head_wait
+        if wait is None or wait[0] is not head or wait[1] != self.changes or self.bank_reached(head, wait[2]):
+            wait = self.head_wait = (head, self.changes, self.blocked_reason(head), self.next_command_index())
+        self.waits.observe(wait[3], wait[2], self.time)
+        return wait[2]
+
+    def bank_reached(self, command, reason):
+        """Return True iff `command`, waiting for `reason`, is no longer
+        short of minerals or gas, or held back. The bank only grows between
+        changes.
+        """
+        if reason == utilization.HELD:
+            return self.time >= command.not_before
+        if reason == utilization.MINERALS:
+            return self.free_minerals() >= self.facts.cost(command.item_name)['minerals']
+        if reason == utilization.GAS:
+            return self.free_gas() >= self.facts.cost(command.item_name)['gas']
+        return False
 
-        if no_supply_available and not supply_in_progress and not next_command_is_supply:
-            raise SupplyBlocked()
+    def made_names(self, producer_name, item_name):
+        """Return the names `item_name` has once `producer_name` makes it.
+        A building made by a building is an attachment, and renames both.
+        """
+        if producer_name == Scv.name or not self.facts.is_building(item_name):
+            return [item_name]
+        return [item_name, "%s on %s" % (item_name, producer_name), "%s with %s" % (producer_name, item_name)]
+
+    def later_commands(self):
+        """Return the commands after the head that could begin before it.
+        The window ends at the first constant or swap command. Commands that
+        begin early let later ones into the window, so any of them could,
+        unless every command in the window is stuck.
+        """
+        if not self.lookahead:
+            return []
+        later = []
+        for command in self.build_order[1:]:
+            if command.is_constant() or command.is_swap():
+                break
+            later.append(command)
+        if later and self.is_quiet() and self.is_window_stuck(later[:self.lookahead]):
+            return []
+        return later
+
+    def is_window_stuck(self, window):
+        """Return True iff no command in the lookahead window can ever begin
+        in a quiet game. Only the bank changes in a quiet game, so only a
+        command waiting on the bank, for a resource with an income, can.
+        Each command waits for what is left after the commands ahead of it.
+        """
+        minerals_income, gas_income = self.mining.income()
+        reserved_minerals = reserved_gas = 0
+        for command in [self.build_order[0]] + window:
+            if command is not self.build_order[0]:
+                waiting_on = self.readiness.waiting_on(command)
+                if waiting_on is None:
+                    return False
+                reason, minerals, gas = waiting_on
+                # As free_minerals and free_gas, what is kept never goes below nothing
+                if reason in readiness.WOKEN_BY_BANK and \
+                        (minerals <= max(self.minerals_available - reserved_minerals, 0) or minerals_income) and \
+                        (gas <= max(self.gas_available - reserved_gas, 0) or gas_income):
+                    return False
+            costs = self.facts.all().get(command.item_name, {})
+            reserved_minerals += costs.get('minerals', 0)
+            reserved_gas += costs.get('gas', 0)
+        return True
 
-        return False
+    def coming_names(self, owned):
+        """Return the names of everything the commands in progress will
+        make, and that later commands and the constant commands could make
+        from what is owned or coming. Return None if a swap is in progress
+        or waiting, since a swap renames buildings.
+        """
+        coming = set()
+        for producer in self.buildings + self.units + self.attachments:
+            if producer.command_in_progress:
+                command = producer.command_in_progress['command']
+                if command.is_swap():
+                    return None
+                coming.update(self.made_names(producer.name, command.item_name))
+
+        waiting = self.later_commands() + self.constant_commands
+        if any(command.is_swap() for command in waiting):
+            return None
+        waiting = [c for c in waiting if not c.is_constant() and c.item_name in self.facts.all()]
+        made_more = True
+        while made_more:
+            made_more = False
+            for command in list(waiting):
+                names = owned | coming
+                if any(d not in names for d in self.facts.cost(command.item_name)['dependencies']):
+                    continue
+                for producer_name in names:
+                    if command.item_name in self.facts.abilities.get(producer_name, []):
+                        coming.update(self.made_names(producer_name.split(" with ")[0], command.item_name))
+                        waiting.remove(command)
+                        made_more = True
+                        break
+        return coming
+
+    def owned_names(self):
+        names = set(self.research_table.completed_names())
+        for item in self.buildings + self.units + self.attachments:
+            names.add(item.name)
+            names.add(item.proper_name())
+        return names
+
+    def is_quiet(self):
+        """Return True iff nothing is in progress or scheduled to happen."""
+        return not self.effects and not self.anything_in_progress()
+
+    def deadlock_reason(self, command, reason):
+        """Return why `command`, waiting for `reason`, can never begin, or
+        None if something that can still happen might let it begin.
+        """
+        later = self.later_commands()
+        if command.is_swap():
+            # Only buildings finishing what they are doing, or new attachments, can free a swap
+            if not later and self.is_quiet():
+                return "`%s` has no buildings or attachments to swap" % command.raw
+            return None
+        costs = self.facts.all().get(command.item_name)
+        if costs is None:
+            return "nothing can carry out `%s`" % command.raw
+
+        if reason == utilization.PREREQUISITE:
+            owned = self.owned_names()
+            coming = self.coming_names(owned)
+            if coming is None:
+                return None
+            missing = [d for d in costs['dependencies'] if d not in owned and d not in coming]
+            if missing:
+                return "`%s` needs `%s`, and nothing in progress or waiting will make one" % (command.raw, missing[0])
+        elif reason == utilization.OTHER:
+            if command.item_name in self.research_table and not self.research_table.can_begin(command.item_name):
+                return "`%s` is already researched, or being researched" % command.raw
+        elif reason == utilization.MINERALS:
+            # Checked cheapest first, since nearly every wait is for minerals
+            if not self.mining.income()[0] and self.is_quiet():
+                return "`%s` needs %s minerals, with %s and no mineral income" % (
+                    command.raw, costs['minerals'], self.minerals_available)
+        elif reason == utilization.GAS:
+            # Only a new refinery puts scvs on gas
+            refinery_coming = any(c.item_name == Refinery.name for c in later) or \
+                any(u.command_in_progress['command'].item_name == Refinery.name
+                    for u in self.units if u.command_in_progress)
+            if not self.effects and not refinery_coming and not self.mining.income()[1]:
+                return "`%s` needs %s gas, with %s and no gas income or refinery in progress" % (
+                    command.raw, costs['gas'], self.gas_available)
+        elif reason == utilization.SUPPLY:
+            depot_coming = any(c.item_name == SupplyDepot.name for c in later)
+            if not self.supply.depots_in_progress and not depot_coming:
+                return "`%s` needs %s supply, with %s/%s and no supply depot in progress" % (
+                    command.raw, costs.get('supply', 0), self.supply_used, self.supply_available)
+        elif reason == utilization.PRODUCER:
+            if any(p.is_able(command) for p in self.buildings + self.units + self.attachments):
+                return None
+            owned = self.owned_names()
+            coming = self.coming_names(owned)
+            if coming is None:
+                return None
+            if not any(command.item_name in self.facts.abilities.get(name, []) for name in coming):
+                return "nothing can build `%s`, and nothing in progress or waiting will" % command.raw
+        return None
+
+    def check_deadlock(self, reason):
+        """Raise Deadlocked if the head of the build order, waiting for
+        `reason`, can never begin, or SupplyBlocked if it waits on supply.
+        """
+        # Nothing the check looks at changes but the bank, and only while the game changes
+        checked = (self.build_order[0], reason, self.changes, self.readiness.changes)
+        if checked == self.deadlock_checked:
+            return
+        why = self.deadlock_reason(self.build_order[0], reason)
+        if why is None:
+            self.deadlock_checked = checked
+        else:
+            if reason == utilization.SUPPLY:
+                exception, message = SupplyBlocked, "Supply blocked"
+            else:
+                exception, message = Deadlocked, "Deadlocked"
+            raise exception("%s at %s (%s/%s): %s" % (
+                message,
+                self.format_time(),
+                self.supply_used,
+                self.supply_available,
+                why,
+            ))
+
+    def producer_utilization(self):
+        """Return a list of (producer name, {state: seconds}) for every
+        building that can produce something, and all scvs together.
+        """
+        producers = []
+        for building in self.buildings + self.attachments:
+            totals = building.utilization.totals(self.time)
+            if self.facts.abilities.get(building.proper_name()) or utilization.BUSY in totals:
+                producers.append((building.proper_name(), totals))
+
+        scvs = {}
+        for unit in self.units:
+            if isinstance(unit, Scv):
+                for state, seconds in unit.utilization.totals(self.time).items():
+                    scvs[state] = scvs.get(state, 0) + seconds
+        producers.append(("all scvs", scvs))
+        return producers
+
+    def supply_cost(self, command):
+        return self.facts.all().get(command.item_name, {}).get('supply', 0)
+
+    def waiting_on_supply(self):
+        """Return the next command, or a constant command, that cannot begin
+        for lack of supply. Otherwise return None.
+        """
+        for command in self.build_order[:1] + self.constant_commands:
+            if not self.supply.can_use(self.supply_cost(command)):
+                return command
+        return None
+
+    def update_supply_block(self):
+        waiting = self.waiting_on_supply()
+        if waiting is not None:
+            self.supply.block(self.time, waiting)
+        else:
+            self.supply.unblock(self.time)
 
     # def impossible_build_sequence(self):
     #     """Your build order is out of order. For example, if you are building
@@ -172,9 +707,76 @@ class HotsGame(object):
 
     def free_attachments(self):
         """Return a list of attachments that are not attached to anything"""
-        return [a for a in self.attachments if a.attached_to is None]        
+        return self.attachment_index.free_attachments()
+
+    def add_building(self, building):
+        self.buildings.append(building)
+        self.attachment_index.add_building(building)
+
+    def execute_swap_command(self, command):
+        """Lift off the buildings of a swap command, and return True, if the
+        buildings and attachments it needs are free. Otherwise return False.
 
-    def execute_build_command(self, build_command, skip_constants=False):
+        A building removed from an attachment frees it as soon as it lifts
+        off. A building moving onto an attachment reserves it until it lands.
+        Two swapped buildings each land on the other's attachment.
+        """
+        index = self.attachment_index
+        if command.swap_with:
+            first = index.idle_building(command.item_name)
+            second = index.idle_building(command.swap_with, exclude=first)
+            if first is None or second is None or \
+                    (first.attached_to is None and second.attached_to is None):
+                return False
+            first_attachment = attachments.detach(first)
+            second_attachment = attachments.detach(second)
+            first.lift_off(command, land_on=second_attachment)
+            second.lift_off(command, land_on=first_attachment)
+        elif command.disconnect:
+            building = index.idle_building(command.item_name, command.attachment_name)
+            if building is None:
+                return False
+            index.release(attachments.detach(building))
+            building.lift_off(command)
+        else:
+            building = index.idle_building(command.item_name, None)
+            if building is None:
+                return False
+            attachment = index.reserve(command.attachment_name)
+            if attachment is None:
+                return False
+            building.lift_off(command, land_on=attachment)
+        return True
+
+    def after(self, seconds, name, *args):
+        """Fire the effect `name` in `seconds`, or now if `seconds` is 0."""
+        self.changes += 1
+        if seconds <= 0:
+            getattr(self, 'effect_%s' % name)(*args)
+        else:
+            self.effects.schedule(self.time + seconds, name, *args)
+
+    def call_down_mule(self, command):
+        """A mule mines until it expires, returning minerals after every trip."""
+        rates = self.mining.rates
+        self.log("     orbital command CALLDOWN MULE (%s)" % self.time)
+        self.record('begin', command)
+        self.record('complete', command)
+        self.after(rates.mule_trip_time, 'mule_trip', self.time + rates.mule_duration)
+
+    def effect_mule_trip(self, expires):
+        rates = self.mining.rates
+        self.earn(minerals=rates.mule_minerals_per_trip)
+        if self.time + rates.mule_trip_time <= expires:
+            self.after(rates.mule_trip_time, 'mule_trip', expires)
+
+    def effect_transfer_to_gas(self, geyser, count):
+        self.mining.transfer_to_gas(geyser, count)
+
+    def execute_build_command(self, build_command, skip_constants=False, exclude=()):
+        """Begin a command, and return True, if anything can. Producers whose
+        ids are in `exclude` are not asked.
+        """
         # Save any ConstantCommands
         if build_command.is_constant():
             if build_command.begin:
@@ -182,7 +784,7 @@ class HotsGame(object):
                 return True
             else:
                 # Find it's "begin" command and remove it
-                print "TODO"
+                self.log("TODO")
                 return True
 
 
@@ -193,44 +795,179 @@ class HotsGame(object):
         # No, scv can't be highest priority, or else I can't build supply depot and get supply blocked
 
         ran_command = False
+        # A command held back until later is offered to nothing, but the constant commands still run
+        held = self.time < build_command.not_before
+
+        if held:
+            pass
+
+        elif build_command.is_swap():
+            ran_command = self.execute_swap_command(build_command)
 
         # See if any buildings can execute this command
-        if not ran_command and any((b.attempt_build_command(build_command) for b in self.buildings)):
+        elif not ran_command and any((b.attempt_build_command(build_command)
+                                      for b in self.buildings if id(b) not in exclude)):
             ran_command = True
             #return True
 
         # See if any unit can execute this command
-        if not ran_command and any((u.attempt_build_command(build_command) for u in self.units)):
+        if not ran_command and not held and any((u.attempt_build_command(build_command)
+                                    for u in self.builders() if id(u) not in exclude)):
             ran_command = True
             #return True
 
         # See if any attachments can execute this command
-        if not ran_command and any((a.attempt_build_command(build_command) for a in self.attachments)):
+        if not ran_command and not held and any((a.attempt_build_command(build_command)
+                                    for a in self.attachments if id(a) not in exclude)):
             ran_command = True
             #return True
 
         if skip_constants is False:
-            import copy
-            constant_commands = copy.deepcopy(self.constant_commands)
+            constant_commands = list(self.constant_commands)
             while constant_commands and \
                     self.execute_build_command(constant_commands[0], skip_constants=True):
                 constant_commands.pop(0)
 
         return ran_command
 
+    def builders(self):
+        """Return the units, with scvs collecting gas last, so that buildings
+        are constructed by mineral workers whenever there are any.
+        """
+        on_gas = [u for u in self.units if u.collection_type == mining.GAS]
+        if not on_gas:
+            return self.units
+        return [u for u in self.units if u.collection_type != mining.GAS] + on_gas
+
     def tick(self):
+        self.advance()
+        self.dispatch()
+        self.end_tick()
+
+    def advance(self):
         # Every building, unit ticks one second
-        previous_supply = self.supply_used
+        self.tick_start_supply = self.supply_used
+        minerals, gas = self.mining.tick()
+        self.earn(minerals=minerals, gas=gas)
+        if self.effects.run_due(self.time, self):
+            self.changes += 1
         [b.tick() for b in self.buildings]
         [u.tick() for u in self.units]
         [a.tick() for a in self.attachments]
 
+    def dispatch(self):
         # Execute the build order as long as we are able
-        while self.build_order and self.execute_build_command(self.build_order[0]):
+        while self.build_order:
+            if self.checkpoints is not None:
+                self.save_checkpoint()
+            if not self.execute_build_command(self.build_order[0]):
+                break
             self.build_order.pop(0)
-
-
-        self.is_supply_blocked()
+            self.readiness.clear()
+        if self.lookahead and len(self.build_order) > 1:
+            self.dispatch_lookahead()
+
+    def dispatch_lookahead(self):
+        """Begin commands in the lookahead window while the head of the build
+        order waits. Each command waiting ahead of the one being tried keeps
+        the minerals, gas, and supply it costs, and one producer that could
+        build it.
+
+        That alone does not stop a command begun early from delaying others:
+        the scv that builds it stops mining sooner, and constant commands
+        find their minerals spent, or a producer ready sooner. So a command
+        only begins early if a copy of the game played on from there, with
+        no more commands begun early, finishes no later than without it.
+        Each command begun early can only bring the finish forward, so a
+        lookahead never makes a build order slower, at the cost of playing
+        the rest of the game again for each command that could begin early.
+
+        Constant and swap commands change what the commands after them mean,
+        so the window ends at them, and at a swap waiting at the head.
+        """
+        reserved_producers = set()
+        position = 0
+        while position < min(self.lookahead + 1, len(self.build_order)):
+            command = self.build_order[position]
+            if command.is_constant() or command.is_swap():
+                break
+            if position and self.readiness.is_ready(command, self.free_minerals(), self.free_gas()):
+                index = self.window_index(position)
+                reason = self.blocked_reason(command)
+                # Only a free producer, or a mule's energy, is left to check
+                if reason in (utilization.PRODUCER, utilization.ENERGY):
+                    finish = self.play_out(position, reserved_producers)
+                    if finish is not None:
+                        if self.lookahead_finish is None:
+                            self.lookahead_finish = self.play_out()
+                        if finish <= self.lookahead_finish:
+                            self.execute_build_command(command, skip_constants=True, exclude=reserved_producers)
+                            self.lookahead_finish = finish
+                            self.log("     (command %s begun ahead of command %s)" % (index, self.next_command_index()))
+                            self.started_ahead.append(index)
+                            del self.build_order[position]
+                            self.readiness.clear()
+                            continue
+                        reason = readiness.DECLINED
+                costs = self.facts.all().get(command.item_name, {})
+                self.readiness.block(
+                    command,
+                    reason,
+                    minerals=costs.get('minerals', 0),
+                    gas=costs.get('gas', 0),
+                )
+            self.reserve(command, reserved_producers)
+            position += 1
+        self.reserved_minerals = self.reserved_gas = self.reserved_supply = 0
+
+    def play_out(self, position=None, exclude=()):
+        """Play a copy of this game, from the middle of dispatching, to the
+        end without beginning any more commands early, and return whether it
+        failed and when it finished. First begin the command at `position`
+        in the build order, without the producers whose ids are in
+        `exclude`, or return None if it cannot begin.
+        """
+        checkpoints, self.checkpoints = self.checkpoints, None
+        game = copy.deepcopy(self, {id(self.facts): self.facts})
+        self.checkpoints = checkpoints
+        game.verbose = False
+        game.lookahead = 0
+        if position is not None:
+            producers = self.buildings + self.units + self.attachments
+            copied = game.buildings + game.units + game.attachments
+            exclude = set(id(copied[i]) for i, p in enumerate(producers) if id(p) in exclude)
+            if not game.execute_build_command(game.build_order[position], skip_constants=True, exclude=exclude):
+                return None
+            game.started_ahead.append(game.window_index(position))
+            del game.build_order[position]
+        game.reserved_minerals = game.reserved_gas = game.reserved_supply = 0
+        try:
+            game.end_tick()
+            game.play(self.breaker)
+        except StarcraftException:
+            return True, 0 # Every failure is as bad as any other
+        return False, game.time
+
+    def reserve(self, command, reserved_producers):
+        """Keep what a waiting command needs from the commands after it."""
+        if command.is_swap():
+            return
+        costs = self.facts.all().get(command.item_name, {})
+        self.reserved_minerals += costs.get('minerals', 0)
+        self.reserved_gas += costs.get('gas', 0)
+        self.reserved_supply += costs.get('supply', 0)
+        for producer in self.buildings + self.units + self.attachments:
+            if id(producer) not in reserved_producers and producer.can_produce(command):
+                reserved_producers.add(id(producer))
+                return
+
+    def end_tick(self):
+        self.update_supply_block()
+        reason = self.update_waits()
+        self.record_supply()
+
+        if reason is not None:
+            self.check_deadlock(reason)
         #self.impossible_build_sequence()
 
         # if self.time % 10 == 0:
@@ -243,19 +980,19 @@ class HotsGame(object):
         #         self.supply_available,
         #     )
 
-        if self.supply_used != previous_supply:
+        if self.supply_used != self.tick_start_supply:
             self.print_progress_line()
 
         self.time += 1
 
     def print_progress_line(self):
-        print "[%s/%s] (T: %s, M: %s, G: %s)" % (
+        self.log("[%s/%s] (T: %s, M: %s, G: %s)" % (
             self.supply_used,
             self.supply_available,
             self.format_time(),
             self.minerals_available,
             self.gas_available,
-        )
+        ))
 
     def format_time(self):
         minutes = self.time / 60
@@ -281,6 +1018,12 @@ Research:
   %(research_list)s
 Freestanding Attachments:
   %(attachment_list)s
+Supply Blocked: %(supply_blocked_time)s seconds
+  %(supply_blocked_list)s
+Utilization:
+  %(utilization_list)s
+Waiting Commands:
+  %(wait_list)s
 ================================================================
 """
         from collections import Counter
@@ -294,6 +1037,9 @@ Freestanding Attachments:
             else:
                 return "None"
 
+        def format_seconds(seconds):
+            return ", ".join("%s %ss" % (s, t) for s, t in sorted(seconds.items()))
+
 
         params = {}
         params.update(self.__dict__)
@@ -303,6 +1049,21 @@ Freestanding Attachments:
                 'research_list': format_item_list(self.research),
                 'attachment_list': format_item_list(self.free_attachments()),
                 'time': self.format_time(),
+                'supply_used': self.supply_used,
+                'supply_available': self.supply_available,
+                'supply_blocked_time': self.supply.blocked_time(),
+                'supply_blocked_list': "\n  ".join(
+                    "%(start)s-%(end)s (%(duration)ss) waiting on %(command)s" % i
+                    for i in self.supply.blocked_intervals
+                ) or "None",
+                'utilization_list': "\n  ".join(
+                    "%s: %s" % (name, format_seconds(seconds))
+                    for name, seconds in self.producer_utilization()
+                ) or "None",
+                'wait_list': "\n  ".join(
+                    "%s: %ss (%s)" % (c.raw, total, format_seconds(reasons))
+                    for c, total, reasons in self.command_waits() if total
+                ) or "None",
         })
 
         report = report % params
@@ -316,9 +1077,11 @@ class TerranBuilding(object):
     name = "TERRAN BUILDING"
     command_in_progress = None
     attached_to = None
+    landing_on = None
 
     def __init__(self, game, command=None):
         self.game = game
+        self.utilization = utilization.StateTimer(utilization.IDLE, game.time)
 
     def tick(self):
         pass
@@ -337,10 +1100,7 @@ class TerranBuilding(object):
 
         """
 
-        if self.attempt_swap_command(command):
-            return True
-
-        all_valid = self.game.facts.abilities[self.proper_name()]
+        all_valid = self.game.facts.abilities.get(self.proper_name(), [])
         if command.item_name not in all_valid:
             #print "Cannot execute command, %s cannot be built by %s" % (command.item_name, self.__class__.__name__)
             return False
@@ -366,50 +1126,43 @@ class TerranBuilding(object):
         self.begin_command(command)
         return True
 
-    def attempt_swap_command(self, command):
+    def is_able(self, command):
+        """Return True iff this building can ever build `command`, once it is
+        free, whether or not the game can afford it.
         """
-        Can remove a building from an attachment iff
-              1) building has attachment that is specified
-              2) building does not have command_in_progress
-              3) attachment does not have command_in_progress
-
-         Can attach a building to an attachment iff
-              1) building has no attachment
-              2) building does not have command_in_progress
-              3) the game has a free attachment that is specified
-        """
-        if not command.is_swap():
+        if command.item_name not in self.game.facts.abilities.get(self.proper_name(), []):
             return False
-
-        if command.item_name != self.name:
-            return False
-        
-        if self.command_in_progress is not None:
+        if command.is_attachment() and (self.attached_to is not None or command.attached_to != self.name):
             return False
+        return True
 
-        if command.disconnect:
-            # Remove <building> from <attachment>
-            if self.attached_to is not None and self.attached_to.name == command.attachment_name :
-                if self.attached_to.command_in_progress is None:
-                    attachment = self.attached_to
-                    self.attached_to = None
-                    attachment.attached_to = None
-                    return True
-        else:
-            # Move <building> onto <attachment>
-            if self.attached_to is None:
-                free_attachments = [a for a in self.game.free_attachments() 
-                                    if a.name == command.attachment_name and \
-                                        a.command_in_progress is None]
-                for a in self.game.attachments:
-                    print a.name, a.attached_to
-                if free_attachments:
-                    free = free_attachments[0]
-                    free.attached_to = self
-                    self.attached_to = free
-                    return True
+    def can_produce(self, command):
+        """Return True iff this building is free and able to build `command`,
+        whether or not the game can afford it.
+        """
+        return self.command_in_progress is None and self.is_able(command)
 
-        return False
+    def lift_off(self, command, land_on=None):
+        """Fly for the swap `command`, and land on `land_on`, an attachment,
+        or on nothing.
+        """
+        self.landing_on = land_on
+        self.command_in_progress = dict(
+            command=command,
+            time=self.game.time + self.game.swap_time,
+        )
+        self.game.log("     %s LIFT OFF (%s)" % (self.name, self.game.time))
+        self.game.record('begin', command)
+        self.utilization.change(utilization.FLYING, self.game.time)
+
+    def land(self, command):
+        if self.landing_on is not None:
+            attachments.attach(self, self.landing_on)
+            self.landing_on = None
+        self.game.log("     %s LAND as %s (%s)" % (self.name, self.proper_name().upper(), self.game.time))
+        self.game.record('complete', command)
+        self.command_in_progress = None
+        self.utilization.change(utilization.IDLE, self.game.time)
 
     def begin_command(self, command):
         """Buildings can construct units and attachments.
@@ -420,7 +1173,11 @@ class TerranBuilding(object):
             command=command,
             time=self.game.time + cost['build time'],
         )
-        print "     %s BEGIN %s (%s)" % (self.name, item_name.upper(), self.game.time)
+        self.game.log("     %s BEGIN %s (%s)" % (self.name, item_name.upper(), self.game.time))
+        self.game.record('begin', command)
+        self.utilization.change(utilization.BUSY, self.game.time)
+        if item_name in self.game.research_table:
+            self.game.research_table.begin(item_name, self.game.time)
         self.game.spend(
             minerals=cost['minerals'],
             gas=cost['gas'],
@@ -429,10 +1186,15 @@ class TerranBuilding(object):
 
     def complete_command(self, command_in_progress):
         command = command_in_progress['command']
+        if command.is_swap():
+            self.land(command)
+            return
 
         item_name = command.item_name
-        print "     %s COMPLETE %s (%s)" % (self.name, item_name.upper(), self.game.time)
+        self.game.log("     %s COMPLETE %s (%s)" % (self.name, item_name.upper(), self.game.time))
+        self.game.record('complete', command)
         self.command_in_progress = None
+        self.utilization.change(utilization.IDLE, self.game.time)
 
         # When a building builds a building, it's an attachment
         is_attachment = self.game.facts.is_building(item_name)
@@ -440,20 +1202,11 @@ class TerranBuilding(object):
         new_item = create_item_from_name(item_name, self.game, command=command, is_attachment=is_attachment)
 
         if is_attachment:
-
-            #..... should be creating an instance of TerranBuildingAttachment...
-
-            self.attached_to = new_item
-            new_item.attached_to = self
-            self.game.attachments.append(new_item)
+            self.game.attachment_index.add_attachment(new_item, self)
+        elif isinstance(new_item, TerranResearch):
+            self.game.research_table.complete(item_name, self.game.time)
+            self.game.research.append(new_item)
         else:
-            print "appending %s to units" % new_item
-            
-            # TODO THIS IS WHERE ITS BROKEN, adding research STIMPACK to units
-            # should `create_item_from_name` return an item_type as well?
-            # or should we use is_building()/is_attachment()/is_research() methods?
-            # is an attachment a building as well? 
-
             self.game.units.append(new_item)
 
     def tick(self):
@@ -477,6 +1230,41 @@ class TerranBuildingAttachment(TerranBuilding):
             name = "%s on %s" % (self.name, self.attached_to.name)
         return name
 
+class OrbitalCommand(TerranBuildingAttachment):
+
+    name = 'orbital command'
+
+    # TODO: FACT CHECK
+    initial_energy = 50
+    maximum_energy = 200
+    energy_rate = 0.5625 # energy/second
+    mule_energy = 50
+
+    def __init__(self, game, command=None):
+        super(OrbitalCommand, self).__init__(game)
+        self.energy = effects.Energy(self.initial_energy, self.maximum_energy, self.energy_rate, game.time)
+
+    def can_produce(self, command):
+        if command.item_name != 'mule':
+            return super(OrbitalCommand, self).can_produce(command)
+        return self.energy.value(self.game.time) >= self.mule_energy
+
+    def is_able(self, command):
+        # Energy always comes back
+        return command.item_name == 'mule' or super(OrbitalCommand, self).is_able(command)
+
+    def attempt_build_command(self, command):
+        """Call down a mule if there is the energy, without taking the
+        orbital command away from building scvs.
+        """
+        if command.item_name != 'mule':
+            return super(OrbitalCommand, self).attempt_build_command(command)
+        if self.energy.value(self.game.time) < self.mule_energy:
+            return False
+        self.energy.spend(self.mule_energy, self.game.time)
+        self.game.call_down_mule(command)
+        return True
+
 # class TechLab(TerranBuilding):
 
 #     attached_to = None
@@ -490,6 +1278,7 @@ class SupplyDepot(TerranBuilding):
     
     def __init__(self, game, command=None):
         super(SupplyDepot, self).__init__(game)
+        self.game.supply.depot_finished()
         self.game.earn(supply_available=10)
 
 
@@ -498,21 +1287,24 @@ class Refinery(TerranBuilding):
 
     def __init__(self, game, command=None):
         super(Refinery, self).__init__(game)
+        self.geyser = self.game.mining.add_geyser()
 
         if command.scv_transfer > 0:
-            # Move scv to collect gas
-            available_scv = [u for u in self.game.units if isinstance(u, Scv) and u.is_free_to_collect_gas()]
-            # Grab workers at the end of the list; last to pull to build something
-            transfer_scv = available_scv[command.scv_transfer*-1:]
-            [scv.collect_gas() for scv in transfer_scv]
+            # Move scv to collect gas, once they get there
+            self.game.after(
+                self.game.mining.rates.worker_transfer_delay,
+                'transfer_to_gas',
+                self.geyser,
+                command.scv_transfer,
+            )
 
 
 class CommandCenter(TerranBuilding):
     name = "command center"
-    # command_in_progress = None
 
-    # def __init__(self, game, command=None):
-    #     self.game = game
+    def __init__(self, game, command=None):
+        super(CommandCenter, self).__init__(game)
+        self.base = self.game.mining.add_base()
 
 
 class TerranResearch(object):
@@ -520,9 +1312,13 @@ class TerranResearch(object):
     def __init__(self, game, command=None):
         self.game = game
 
+    def proper_name(self):
+        return self.name
+
 class TerranUnit(object):
     name = "TERRAN UNIT"
     command_in_progress = None
+    collection_type = None # Only workers collect
 
     def __init__(self, game, command=None):
         self.game = game
@@ -540,103 +1336,80 @@ class TerranUnit(object):
         """
         return False
 
+    def is_able(self, command):
+        return False
+
+    def can_produce(self, command):
+        return False
+
 
 class Scv(TerranUnit):
     """A terran worker. Collects minerals or gas.
-    
-    HotS - 34 minerals per 60 seconds for 1 scv (0.56m/s)
-        "From 0 to 2 SCVs/patch, each additional SCV adds ~39-45 minerals/game minute."
-        42 minerals / 60s = 0.700 m/s
-
-        "A base with 8 mineral patches will yield ~672 minerals/min with 16 SCVs, or ~816 minerals with 24 SCVs."
-        0.700 m/s, or 0.566 m/s
 
+    Income is not computed per scv; each scv is assigned to a resource node
+    in `game.mining`, and the node collects for all of its workers.
+    See models/mining.py for the collection rates.
 
     """
     name = "scv"
 
-    MINERALS = 'minerals'
-    GAS = 'gas'
-
-    # TODO: FACT CHECK
-    mineral_collection_rate = 0.700 # minerals/second, valid until 16 active scvs
-    minerals_per_trip = 5
-    minerals_queued = 0
+    MINERALS = mining.MINERALS
+    GAS = mining.GAS
 
-    #Each of the three workers on a single geyser will collect approximately 38 gas per minute, with saturation at approximately 114 gas/min.
-    # TODO: FACT CHECK
-    gas_collection_rate = 38.0/60.0 # gas/second, valid until 3 workers per refinery
-    gas_per_trip = 4
-    gas_queued = 0
-
-    collection_type = None # either Gas or Minerals
+    _collection_type = None
+    resource_node = None
     command_in_progress = None
 
     def __init__(self, game, command=None):
         super(Scv, self).__init__(game)
-        self.collection_type = self.MINERALS
+        self.utilization = utilization.StateTimer(utilization.IDLE, game.time)
+        self.game.mining.assign_minerals(self)
+
+    @property
+    def collection_type(self):
+        """Either Gas or Minerals, or None when not collecting."""
+        return self._collection_type
+
+    @collection_type.setter
+    def collection_type(self, collection_type):
+        self._collection_type = collection_type
+        self.utilization.change(collection_type or utilization.IDLE, self.game.time)
 
     def collect_minerals(self):
         if self.command_in_progress:
             raise Exception("SCV has command in progress, cannot collect minerals.")
-        self.collection_type = self.MINERALS
+        self.game.mining.assign_minerals(self)
 
-    def collect_gas(self):
+    def collect_gas(self, geyser):
         if self.command_in_progress:
             raise Exception("SCV has command in progress, cannot collect gas.")
-        self.collection_type = self.GAS
+        self.game.mining.assign(self, geyser)
 
     def __repr__(self):
         return "<SCV %s>" % (self.collection_type or ("CONSTRUCTION" if self.command_in_progress else "None"))
-        print "DICT:", self.__dict__
-        return "(SCV %(collection_type)s queued=%(minerals_queued)s)" % self.__dict__
 
     def tick(self):
         super(Scv, self).tick()
-        if self.collection_type == self.MINERALS:
-            self.game.earn(minerals=self._collect_minerals())
-        elif self.collection_type == self.GAS:
-            self.game.earn(gas=self._collect_gas())
-
         if self.command_in_progress and self.command_in_progress['time'] <= self.game.time:
             self.complete_command(self.command_in_progress)
 
-    def _collect_minerals(self):
-        """Return the number of minerals collected this second.
-
-        TODO: add some kind of random delay to make more realistic?
-        TODO: FACT CHECK, make sure this approximation is accurate enough
-        """
-        self.minerals_queued += self.mineral_collection_rate
-
-        minerals_collected = 0
-        if self.minerals_queued >= self.minerals_per_trip:
-            minerals_collected = self.minerals_per_trip
-            self.minerals_queued -= self.minerals_per_trip
-
-        return minerals_collected
-
-    def _collect_gas(self):
-        """Return the amount of gas collected this second.
-
-        TODO: add some kind of random delay to make more realistic?
-        TODO: FACT CHECK, make sure this approximation is accurate enough
-        """
-        self.gas_queued += self.gas_collection_rate
-
-        gas_collected = 0
-        if self.gas_queued >= self.gas_per_trip:
-            gas_collected = self.gas_per_trip
-            self.gas_queued -= self.gas_per_trip
-
-        return gas_collected
-
     def is_free_to_collect_gas(self):
         return bool(self.collection_type == self.MINERALS)
 
     def is_free_to_collect_minerals(self):
         return bool(self.collection_type == self.GAS)
 
+    def is_able(self, command):
+        if command.item_name not in self.game.facts.abilities[self.proper_name()]:
+            return False
+        return isinstance(command, commands.StandardCommand)
+
+    def can_produce(self, command):
+        """Return True iff this scv is free to construct `command`, whether
+        or not the game can afford it.
+        """
+        return self.command_in_progress is None and self.is_able(command)
+
     def attempt_build_command(self, command):
         """Return True iff we have the resources, requirements, and ability to execute this command."""
 
@@ -669,13 +1442,17 @@ class Scv(TerranUnit):
     def begin_command(self, command):
         """Stop collecting resources and begin constructing a building.
         """
-        self.collection_type = None # Pause resource collection
+        self.game.mining.release(self) # Pause resource collection
+        self.utilization.change(utilization.CONSTRUCTING, self.game.time)
         building_name = command.item_name
+        if building_name == SupplyDepot.name:
+            self.game.supply.depot_started()
         self.command_in_progress = dict(
             command=command,
             time=self.game.time + self.game.facts.buildings[building_name]['build time'],
         )
-        print "     scv BEGIN %s (%s)" % (building_name.upper(), self.game.format_time())
+        self.game.log("     scv BEGIN %s (%s)" % (building_name.upper(), self.game.format_time()))
+        self.game.record('begin', command)
         self.game.spend(
             minerals=self.game.facts.buildings[building_name]['minerals'],
             gas=self.game.facts.buildings[building_name]['gas'],
@@ -686,27 +1463,29 @@ class Scv(TerranUnit):
         """
         command = command_in_progress['command']
         building_name = command.item_name
-        print "     scv COMPLET", building_name.upper()
-        self.collection_type = self.MINERALS # TODO: minerals or gas?
+        self.game.log("     scv COMPLET %s" % building_name.upper())
+        self.game.record('complete', command)
         self.command_in_progress = None
+        self.collect_minerals() # TODO: minerals or gas?
 
         new_building = create_item_from_name(building_name, self.game, command=command)
-        self.game.buildings.append(new_building)
-
-NAME_TO_CLASS_MAP = {}
-import sys
-import inspect
-def build_name_map():
-    """We need to map item_names to their classes.
-    For example, from string 'scv' we need to get class Scv. And
-    from 'supply depot' we need to get class SupplyDepot.
-    """
-    current_module = sys.modules[__name__]
-    for something, obj in inspect.getmembers(sys.modules[__name__]):
-        if inspect.isclass(obj):
-            if hasattr(obj, 'name'):
-                name = getattr(obj, 'name')
-                NAME_TO_CLASS_MAP[name] = obj
+        self.game.add_building(new_building)
+
+# We need to map item_names to their classes. For example, from string 'scv'
+# we need to get class Scv, and from 'supply depot' class SupplyDepot.
+# Add every new class with a `name` here.
+NAME_TO_CLASS_MAP = dict((cls.name, cls) for cls in [
+    TerranBuilding,
+    TerranBuildingAttachment,
+    OrbitalCommand,
+    SupplyDepot,
+    Refinery,
+    CommandCenter,
+    TerranResearch,
+    TerranUnit,
+    Scv,
+])
+
 
 def create_item_from_name(name, *args, **kwargs):
     game =  args[0]
@@ -716,7 +1495,7 @@ def create_item_from_name(name, *args, **kwargs):
         del kwargs['is_attachment']
 
     if is_attachment:
-        attachment = TerranBuildingAttachment(game)
+        attachment = NAME_TO_CLASS_MAP.get(name, TerranBuildingAttachment)(game)
         attachment.name = name
         return attachment
     elif game.facts.is_building(name):
@@ -752,6 +1531,3 @@ def create_research_from_name(name, *args, **kwargs):
     research = TerranResearch(*args, **kwargs)
     research.name =  name
     return research
-
-build_name_map()
-
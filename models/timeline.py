@@ -0,0 +1,134 @@
+"""Answers "what did I have at time t?" for a finished game, without playing
+it again or keeping a copy of the game for every second.
+
+The index is built from the game's change events: commands beginning and
+completing, changes to the bank (summed per second), and changes to supply,
+on top of the items the game began with.
+Each query is a binary search over the times of those events.
+
+    index = timeline.TimelineIndex(game)
+    index.at(240)   # bank, supply, items owned, and items in production at 4:00
+
+A state at time t is the state at the end of second t, after everything
+that happened in that second.
+"""
+
+import bisect
+
+
+class TimelineIndex(object):
+    """Point in time queries over a finished game."""
+
+    def __init__(self, game):
+        self.end = game.time
+
+        # Bank: running totals after each second the bank changed
+        self.bank_times = [0]
+        self.minerals = [game.initial_minerals]
+        self.gas = [game.initial_gas]
+        for time, minerals, gas in game.bank_changes:
+            if time == self.bank_times[-1]:
+                self.minerals[-1] += minerals
+                self.gas[-1] += gas
+            else:
+                self.bank_times.append(time)
+                self.minerals.append(self.minerals[-1] + minerals)
+                self.gas.append(self.gas[-1] + gas)
+
+        # Supply: (used, available) after each change
+        self.supply_times = [time for time, used, available in game.supply_changes]
+        self.supply = [(used, available) for time, used, available in game.supply_changes]
+
+        # Owned: for each item, the times each one of it completed. What the
+        # game began with completed at 0
+        self.completed = dict((name, [0] * count) for name, count in game.initial_items.items())
+        # In production: what was in production after each begin or complete
+        self.production_times = []
+        self.production = []
+        # A constant command is one command object for every unit it makes,
+        # so several can be in production at once; the first begun completes first
+        in_production = {} # id(command) -> [(item name, began)]
+        for time, kind, command in game.events:
+            if command.is_swap():
+                continue
+            if kind == 'begin':
+                in_production.setdefault(id(command), []).append((command.item_name, time))
+            else:
+                self.completed.setdefault(command.item_name, []).append(time)
+                begun = in_production.get(id(command))
+                if begun:
+                    begun.pop(0)
+            production = tuple(sorted((p for begun in in_production.values() for p in begun),
+                                      key=lambda p: (p[1], p[0])))
+            if self.production_times and self.production_times[-1] == time:
+                self.production[-1] = production
+            else:
+                self.production_times.append(time)
+                self.production.append(production)
+
+    def __repr__(self):
+        return "<TimelineIndex: %s seconds, %s bank changes, %s production changes>" % (
+            self.end,
+            len(self.bank_times),
+            len(self.production_times),
+        )
+
+    def _last(self, times, time):
+        """Return the index of the last change at or before `time`, or None."""
+        i = bisect.bisect_right(times, time) - 1
+        return i if i >= 0 else None
+
+    def bank(self, time):
+        """Return (minerals, gas) at `time`."""
+        i = self._last(self.bank_times, time)
+        return self.minerals[i], self.gas[i]
+
+    def supply_at(self, time):
+        """Return (supply used, supply available) at `time`, or None before the first tick."""
+        i = self._last(self.supply_times, time)
+        if i is None:
+            return None
+        return self.supply[i]
+
+    def owned(self, time):
+        """Return {item name: count} of everything completed by `time`."""
+        owned = {}
+        for name, times in self.completed.items():
+            count = bisect.bisect_right(times, time)
+            if count:
+                owned[name] = count
+        return owned
+
+    def in_production(self, time):
+        """Return a list of (item name, time it began) in production at `time`."""
+        i = self._last(self.production_times, time)
+        if i is None:
+            return []
+        return list(self.production[i])
+
+    def at(self, time):
+        """Return the whole state at `time` as a dict of plain values."""
+        minerals, gas = self.bank(time)
+        supply = self.supply_at(time) or (None, None)
+        return {
+            'time': time,
+            'minerals': minerals,
+            'gas': gas,
+            'supply_used': supply[0],
+            'supply_available': supply[1],
+            'owned': self.owned(time),
+            'in_production': [{'item': name, 'began': began} for name, began in self.in_production(time)],
+        }
+
+    def to_dict(self):
+        """Return the index as plain values, so a client can search it itself."""
+        return {
+            'end': self.end,
+            'bank': {'times': self.bank_times, 'minerals': self.minerals, 'gas': self.gas},
+            'supply': {'times': self.supply_times, 'values': [list(s) for s in self.supply]},
+            'completed': self.completed,
+            'production': {
+                'times': self.production_times,
+                'values': [[list(p) for p in production] for production in self.production],
+            },
+        }
@@ -0,0 +1,75 @@
+"""A transposition table for searching over build orders.
+
+Different orders of commands often reach the same state. Search tools store
+each state they reach here, and skip states that are already known, or that
+are dominated: a known state with the same items, the same commands in
+progress, and the same workers, reached no later and with at least as many
+minerals and gas.
+
+    table = TranspositionTable(max_states=100000)
+    if table.add(game):
+        ... expand this state ...
+
+"""
+
+from collections import OrderedDict
+
+
+class TranspositionTable(object):
+    """For every structure (see HotsGame.structure_key), the banks it has been
+    reached with that no other bank dominates. Holds at most `max_states`
+    structures, and forgets the least recently used first.
+    """
+
+    def __init__(self, max_states=100000):
+        self.max_states = max_states
+        self.states = OrderedDict() # structure key -> [(time, minerals, gas, value)]
+        self.added = 0
+        self.pruned = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self.states)
+
+    def __repr__(self):
+        return "<TranspositionTable: %s states, %s added, %s pruned, %s evicted>" % (
+            len(self.states),
+            self.added,
+            self.pruned,
+            self.evicted,
+        )
+
+    @staticmethod
+    def dominates(a, b):
+        """Return True iff bank `a` is at least as good as `b` in every resource."""
+        return a[0] <= b[0] and a[1] >= b[1] and a[2] >= b[2]
+
+    def lookup(self, game):
+        """Return the banks known for this game's structure."""
+        return self.states.get(game.structure_key(), [])
+
+    def is_dominated(self, game):
+        bank = (game.time, game.minerals_available, game.gas_available)
+        return any(self.dominates(known, bank) for known in self.lookup(game))
+
+    def add(self, game, value=None):
+        """Store the state of a game, and return True. Return False if an
+        equal or better state is already known, and should be pruned.
+        """
+        key = game.structure_key()
+        bank = (game.time, game.minerals_available, game.gas_available)
+        frontier = self.states.pop(key, [])
+        self.states[key] = frontier # Most recently used is last
+
+        if any(self.dominates(known, bank) for known in frontier):
+            self.pruned += 1
+            return False
+
+        frontier[:] = [known for known in frontier if not self.dominates(bank, known)]
+        frontier.append(bank + (value,))
+        self.added += 1
+
+        while len(self.states) > self.max_states:
+            self.states.popitem(last=False)
+            self.evicted += 1
+        return True
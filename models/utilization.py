@@ -0,0 +1,84 @@
+"""Counts how long producers spent doing what, and how long each command
+waited at the head of the build order, and why.
+
+Both are updated only when a state changes, by adding up the time since the
+last change, so keeping them costs nothing per tick.
+"""
+
+# Producer states
+IDLE = 'idle'
+BUSY = 'busy'
+CONSTRUCTING = 'constructing'
+FLYING = 'flying'
+
+# Reasons a command could not begin
+MINERALS = 'minerals'
+GAS = 'gas'
+ENERGY = 'energy'
+SUPPLY = 'supply'
+PREREQUISITE = 'prerequisite'
+PRODUCER = 'busy producer'
+OTHER = 'other'
+HELD = 'held' # held back until a set time
+
+
+class StateTimer(object):
+    """The number of seconds spent in each state."""
+
+    def __init__(self, state, time):
+        self.state = state
+        self.since = time
+        self.seconds = {}
+
+    def __repr__(self):
+        return "<StateTimer: %s since %s, %s>" % (self.state, self.since, self.seconds)
+
+    def change(self, state, time):
+        if state == self.state:
+            return
+        self.seconds[self.state] = self.seconds.get(self.state, 0) + time - self.since
+        self.state = state
+        self.since = time
+
+    def totals(self, time):
+        """Return the seconds spent in each state, counting the current state up to `time`."""
+        totals = dict(self.seconds)
+        totals[self.state] = totals.get(self.state, 0) + time - self.since
+        return dict((s, t) for s, t in totals.items() if t)
+
+
+class CommandWaits(object):
+    """How long each command of a build order waited at the head of the build
+    order, by index, and the reasons it could not begin.
+    """
+
+    def __init__(self):
+        self.waits = {} # index -> {reason: seconds}
+        self.index = None
+        self.reason = None
+        self.since = None
+
+    def observe(self, index, reason, time):
+        """Record that the command at `index` could not begin at this time,
+        because of `reason`.
+        """
+        if (index, reason) == (self.index, self.reason):
+            return
+        self.close(time)
+        self.index = index
+        self.reason = reason
+        self.since = time
+
+    def close(self, time):
+        """Record that no command is waiting at this time."""
+        if self.index is None:
+            return
+        reasons = self.waits.setdefault(self.index, {})
+        reasons[self.reason] = reasons.get(self.reason, 0) + time - self.since
+        self.index = self.reason = self.since = None
+
+    def reasons(self, index):
+        return dict((r, t) for r, t in self.waits.get(index, {}).items() if t)
+
+    def total(self, index):
+        return sum(self.waits.get(index, {}).values())
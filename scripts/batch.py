@@ -0,0 +1,60 @@
+import argparse
+import glob
+import json
+import sys
+import os.path
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+)
+
+
+from models import batch
+from models import cache
+from models import metrics
+from models import rulesets
+
+def main():
+    arguments = argparse.ArgumentParser(description="Simulate a corpus of build orders.")
+    arguments.add_argument('paths', nargs='+', help="build order files, or directories of .txt files")
+    arguments.add_argument('--ruleset', default='HotS')
+    arguments.add_argument('--cache', help="directory of cached results")
+    arguments.add_argument('--processes', type=int, default=None)
+    arguments.add_argument('--output', help="write the outcomes here as JSON (default: stdout)")
+    arguments.add_argument('--metrics', help="write metrics of the run here as OpenMetrics text")
+    options = arguments.parse_args()
+
+    ruleset = rulesets.get(options.ruleset)
+
+    filenames = []
+    for path in options.paths:
+        if os.path.isdir(path):
+            filenames.extend(sorted(glob.glob(os.path.join(path, '*.txt'))))
+        else:
+            filenames.append(path)
+
+    build_orders = {}
+    parse_errors = {}
+    for filename in filenames:
+        try:
+            build_orders[filename] = ruleset.parse_build_order_file(filename)
+        except Exception as e:
+            parse_errors[filename] = {'error': str(e), 'type': 'ParseError'}
+
+    result_cache = cache.ResultCache(options.cache) if options.cache else None
+    outcomes = batch.run_batch(
+        build_orders,
+        ruleset.facts(),
+        cache=result_cache,
+        processes=options.processes,
+    )
+    outcomes.update(parse_errors)
+
+    output = open(options.output, 'w') if options.output else sys.stdout
+    json.dump(outcomes, output, indent=2, sort_keys=True)
+    if result_cache is not None:
+        print >> sys.stderr, result_cache
+    if options.metrics:
+        metrics.write_file(options.metrics)
+
+
+main()
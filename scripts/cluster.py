@@ -0,0 +1,79 @@
+import argparse
+import glob
+import json
+import sys
+import os.path
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+)
+
+
+from models import batch
+from models import fuzzer
+from models import parser
+from models import rulesets
+from models import similarity
+
+def main():
+    arguments = argparse.ArgumentParser(description="Group nearly identical build orders, and simulate them a group at a time.")
+    arguments.add_argument('paths', nargs='+', help="build order files, directories of .txt files, or .jsonl files")
+    arguments.add_argument('--ruleset', default='HotS')
+    arguments.add_argument('--threshold', type=float, default=similarity.THRESHOLD, help="least similarity of near duplicates")
+    arguments.add_argument('--shingle-size', type=int, default=similarity.SHINGLE_SIZE)
+    arguments.add_argument('--similar', help="list the build orders similar to this build order file, and stop")
+    arguments.add_argument('--run', action='store_true', help="simulate one build order of each group in full, and resume the others")
+    arguments.add_argument('--full', action='store_true', help="with --run, simulate every build order in full")
+    arguments.add_argument('--max-time', type=int, default=batch.MAX_TIME, help="seconds of game time before giving up, or 0 for no limit")
+    arguments.add_argument('--processes', type=int, default=None)
+    arguments.add_argument('--output', help="write the clusters, or with --run the outcomes, here as JSON (default: stdout)")
+    options = arguments.parse_args()
+
+    ruleset = rulesets.get(options.ruleset)
+    facts = ruleset.facts()
+
+    build_orders = {}
+    parse_errors = 0
+    for path in options.paths:
+        if path.endswith('.jsonl'):
+            for order in fuzzer.read_jsonl(path):
+                try:
+                    build_orders[order['name']] = parser.parse_build_order_lines(order['lines'], facts)
+                except Exception:
+                    parse_errors += 1
+            continue
+        filenames = sorted(glob.glob(os.path.join(path, '*.txt'))) if os.path.isdir(path) else [path]
+        for filename in filenames:
+            try:
+                build_orders[filename] = ruleset.parse_build_order_file(filename)
+            except Exception:
+                parse_errors += 1
+
+    index = similarity.SimilarityIndex(shingle_size=options.shingle_size)
+    if options.similar:
+        for name, build_order in sorted(build_orders.items()):
+            index.add(name, build_order)
+        for name, score in index.similar(ruleset.parse_build_order_file(options.similar), options.threshold):
+            print "%.2f %s" % (score, name)
+        return
+
+    clusters = similarity.cluster_build_orders(build_orders, options.threshold, index)
+    print >> sys.stderr, "%s build orders in %s clusters, %s could not be parsed" % (
+        len(build_orders), len(clusters), parse_errors)
+
+    if options.run:
+        output = similarity.run_clusters(
+            build_orders,
+            clusters,
+            facts,
+            use_checkpoints=not options.full,
+            processes=options.processes,
+            breaker=options.max_time or None,
+        )
+    else:
+        output = [{'representative': c.representative, 'members': c.members} for c in clusters]
+
+    output_file = open(options.output, 'w') if options.output else sys.stdout
+    json.dump(output, output_file, indent=2, sort_keys=True)
+
+
+main()
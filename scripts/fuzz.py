@@ -0,0 +1,88 @@
+import argparse
+import sys
+import os.path
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+)
+
+
+from models import batch
+from models import fuzzer
+from models import metrics
+from models import parser
+from models import rulesets
+
+def main():
+    arguments = argparse.ArgumentParser(description="Generate random build orders, and write them or simulate them.")
+    arguments.add_argument('--count', type=int, default=100)
+    arguments.add_argument('--seed', type=int, default=0)
+    arguments.add_argument('--start', type=int, default=0, help="index of the first build order")
+    arguments.add_argument('--shape', default='balanced', choices=sorted(fuzzer.SHAPES))
+    arguments.add_argument('--length', type=int, default=None, help="lines per build order (default: by shape)")
+    arguments.add_argument('--invalid', type=float, default=0.0, help="fraction of build orders with a deliberate mistake")
+    arguments.add_argument('--no-verify', action='store_true',
+                           help="do not play valid build orders to cut them where they fail; faster, but some labelled valid fail")
+    arguments.add_argument('--ruleset', default='HotS')
+    arguments.add_argument('--output', help="a .jsonl file, or a directory of .txt files")
+    arguments.add_argument('--run', action='store_true', help="simulate the build orders with the batch runner")
+    arguments.add_argument('--chunk-size', type=int, default=1000)
+    arguments.add_argument('--max-time', type=int, default=batch.MAX_TIME, help="seconds of game time before giving up, or 0 for no limit")
+    arguments.add_argument('--processes', type=int, default=None)
+    arguments.add_argument('--metrics', help="with --run, rewrite this file with OpenMetrics text after each chunk")
+    arguments.add_argument('--metrics-port', type=int, help="with --run, serve metrics on http://127.0.0.1:PORT/metrics")
+    options = arguments.parse_args()
+
+    facts = rulesets.get(options.ruleset).facts()
+    orders = fuzzer.generate_orders(
+        facts,
+        options.count,
+        seed=options.seed,
+        shape=options.shape,
+        length=options.length,
+        invalid=options.invalid,
+        start=options.start,
+        verify=not options.no_verify,
+        breaker=options.max_time or None,
+    )
+
+    if options.output:
+        if options.output.endswith('.jsonl'):
+            count = fuzzer.write_jsonl(options.output, orders)
+        else:
+            count = fuzzer.write_directory(options.output, orders)
+        print >> sys.stderr, "Wrote %s build orders to %s" % (count, options.output)
+        return
+
+    if not options.run:
+        for order in orders:
+            print "# %s (%s)" % (order['name'], order['mutation'] or 'valid')
+            print "\n".join(order['lines'])
+            print
+        return
+
+    if options.metrics_port:
+        metrics.start_http_server(options.metrics_port)
+
+    # Simulate a chunk at a time, so the corpus is never all in memory
+    totals = {}
+    for chunk in fuzzer.chunks(orders, options.chunk_size):
+        build_orders = {}
+        for order in chunk:
+            key = (order['valid'], 'ParseError')
+            try:
+                build_orders[order['name']] = parser.parse_build_order_lines(order['lines'], facts)
+            except Exception:
+                totals[key] = totals.get(key, 0) + 1
+        valid = dict((o['name'], o['valid']) for o in chunk)
+        outcomes = batch.run_batch(build_orders, facts, processes=options.processes, breaker=options.max_time or None)
+        for name, outcome in outcomes.items():
+            key = (valid[name], outcome['type'] or 'completed')
+            totals[key] = totals.get(key, 0) + 1
+        if options.metrics:
+            metrics.write_file(options.metrics)
+
+    for (is_valid, outcome), count in sorted(totals.items()):
+        print "%-8s %-20s %s" % ('valid' if is_valid else 'invalid', outcome, count)
+
+
+main()
@@ -0,0 +1,52 @@
+import argparse
+import glob
+import sys
+import os.path
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+)
+
+
+from models import matchup
+from models import rulesets
+
+def main():
+    arguments = argparse.ArgumentParser(description="Compare the army value of build orders over time, pair by pair.")
+    arguments.add_argument('paths', nargs='+', help="build order files, or directories of .txt files")
+    arguments.add_argument('--ruleset', default='HotS')
+    arguments.add_argument('--value', default=matchup.SUPPLY, choices=matchup.VALUES)
+    arguments.add_argument('--horizon', type=int, default=None, help="seconds to compare (default: the longest game)")
+    arguments.add_argument('--processes', type=int, default=None)
+    arguments.add_argument('--limit', type=int, default=20, help="build orders to show in the report")
+    arguments.add_argument('--output', help="save the curves and matrices here, as .npz")
+    options = arguments.parse_args()
+
+    ruleset = rulesets.get(options.ruleset)
+
+    filenames = []
+    for path in options.paths:
+        if os.path.isdir(path):
+            filenames.extend(sorted(glob.glob(os.path.join(path, '*.txt'))))
+        else:
+            filenames.append(path)
+
+    build_orders = {}
+    for filename in filenames:
+        try:
+            build_orders[filename] = ruleset.parse_build_order_file(filename)
+        except Exception as e:
+            print >> sys.stderr, "Skipping %s: %s" % (filename, e)
+
+    matrix = matchup.run_matchups(
+        build_orders,
+        ruleset.facts(),
+        value=options.value,
+        horizon=options.horizon,
+        processes=options.processes,
+    )
+    matrix.print_report(options.limit)
+    if options.output:
+        matrix.save(options.output)
+
+
+main()
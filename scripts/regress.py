@@ -0,0 +1,51 @@
+import argparse
+import glob
+import sys
+import os.path
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+)
+
+
+from models import golden
+from models import rulesets
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+DEFAULT_PATHS = ['input_examples', os.path.join('regression', 'orders')]
+
+def main():
+    arguments = argparse.ArgumentParser(description="Compare build order timelines with their golden timelines.")
+    arguments.add_argument('paths', nargs='*', help="build order files, or directories of .txt files (default: %s)" % " ".join(DEFAULT_PATHS))
+    arguments.add_argument('--ruleset', default='HotS')
+    arguments.add_argument('--goldens', default=os.path.join(ROOT, 'regression', 'goldens'), help="directory of golden timelines")
+    arguments.add_argument('--update', action='store_true', help="save changed and new timelines as the goldens")
+    arguments.add_argument('--processes', type=int, default=None)
+    options = arguments.parse_args()
+
+    # Paths are made relative to the repository, so goldens are named the
+    # same from anywhere. Paths given are resolved from where we were run
+    paths = [os.path.relpath(os.path.abspath(p), ROOT) for p in options.paths] or DEFAULT_PATHS
+    goldens = os.path.abspath(options.goldens)
+    os.chdir(ROOT)
+
+    filenames = []
+    for path in paths:
+        if os.path.isdir(path):
+            filenames.extend(sorted(glob.glob(os.path.join(path, '*.txt'))))
+        else:
+            filenames.append(path)
+
+    results = golden.run_regression(
+        filenames,
+        rulesets.get(options.ruleset),
+        goldens,
+        update=options.update,
+        processes=options.processes,
+    )
+    golden.print_report(results)
+
+    if any(r.status in (golden.CHANGED, golden.NEW) for r in results):
+        sys.exit(1)
+
+
+main()
@@ -1,3 +1,4 @@
+import argparse
 import sys
 import os.path
 sys.path.append(
@@ -6,25 +7,87 @@ sys.path.append(
 
 
 from models import parser
-from models import facts
-from models import terran
+from models import rulesets
+
+# Editors and bots run this once per change or per game, where starting up is
+# most of the wait, so json and the like are only imported when needed.
+
+MAX_TIME = 60*15 # seconds of game time
+STDIN = '-'
+FORMATS = ['report', 'summary', 'json']
+
+
+def read_build_order(path, facts):
+    if path == STDIN:
+        return parser.parse_build_order_text(sys.stdin.read(), facts)
+    return parser.parse_build_order_file(path, facts)
 
-def main():
 
-    # Setup Facts
-    units = parser.parse_dependency_file('data/HotS/terran_units.csv')
-    buildings = parser.parse_dependency_file('data/HotS/terran_buildings.csv')
-    research = parser.parse_dependency_file('data/HotS/terran_research.csv')
-    abilities = parser.parse_building_ability_file('data/HotS/terran_abilities.csv')
+def simulate(path, ruleset, options):
+    """Play the build order at `path`, and return (game, error). The game
+    is None if the build order could not be parsed.
+    """
+    try:
+        build_order = read_build_order(path, ruleset.facts())
+    except Exception as e:
+        return None, e
+    game = ruleset.game(build_order, verbose=options.format == 'report' and not options.quiet)
+    try:
+        game.run(options.max_time or None)
+    except Exception as e:
+        return game, e
+    return game, None
 
-    item_facts = facts.Facts(units, buildings, research, abilities)
 
-    #build_order = parser.parse_build_order_file('input_examples/dev_test.txt', item_facts)
-    #build_order = parser.parse_build_order_file('input_examples/HotS_banshee_opener.txt', item_facts)
-    build_order = parser.parse_build_order_file('input_examples/standard_opener.txt', item_facts)   
+def summary(name, game, error):
+    if game is None:
+        return "%s ParseError: %s" % (name, error)
+    line = "%s %s M%s G%s S%s/%s" % (name, game.format_time(), game.minerals_available,
+                                     game.gas_available, game.supply_used, game.supply_available)
+    if error is not None:
+        line += " %s: %s" % (error.__class__.__name__, error)
+    return line
 
-    game = terran.HotsGame(build_order, item_facts).run()
 
+def outcome(name, game, error):
+    """The outcome of a build order, as batch.simulate returns it."""
+    found = {'name': name, 'error': None, 'type': None, 'result': None}
+    if error is not None:
+        found.update(error=str(error), type=error.__class__.__name__ if game is not None else 'ParseError')
+    if game is not None:
+        found['result'] = game.result()
+    return found
+
+
+def main():
+    arguments = argparse.ArgumentParser(description="Simulate build orders, and print how they went.")
+    arguments.add_argument('paths', nargs='*', default=[STDIN],
+                           help="build order files, or - to read one from stdin (default: stdin)")
+    arguments.add_argument('--ruleset', default='HotS', choices=rulesets.registry().names())
+    arguments.add_argument('--format', default='report', choices=FORMATS,
+                           help="report: the game as it is played, and a report; summary: a line per "
+                                "build order; json: an outcome per line")
+    arguments.add_argument('--max-time', type=int, default=MAX_TIME, help="seconds of game time before giving up, or 0 for no limit")
+    arguments.add_argument('-q', '--quiet', action='store_true',
+                           help="print nothing; the exit status is 1 if any build order did not complete")
+    options = arguments.parse_args()
+
+    ruleset = rulesets.get(options.ruleset)
+    failed = False
+    for path in options.paths:
+        name = 'stdin' if path == STDIN else path
+        game, error = simulate(path, ruleset, options)
+        failed = failed or error is not None
+        if options.quiet:
+            continue
+        if options.format == 'json':
+            import json
+            print json.dumps(outcome(name, game, error), sort_keys=True)
+        elif options.format == 'summary':
+            print summary(name, game, error)
+        elif error is not None:
+            print >> sys.stderr, summary(name, game, error)
+    sys.exit(1 if failed else 0)
 
 
 main()
@@ -0,0 +1,32 @@
+import argparse
+import sys
+import os.path
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+)
+
+
+from models import server
+
+def main():
+    arguments = argparse.ArgumentParser(description="Serve build order simulations over HTTP.")
+    arguments.add_argument('--host', default='127.0.0.1')
+    arguments.add_argument('--port', type=int, default=8642)
+    arguments.add_argument('--processes', type=int, default=None,
+                           help="number of worker processes (default: one per cpu)")
+    arguments.add_argument('--max-pending', type=int, default=None,
+                           help="simulations allowed to wait before refusing requests")
+    arguments.add_argument('--ruleset', action='append', dest='rulesets',
+                           help="ruleset to load at startup (default: all)")
+    options = arguments.parse_args()
+
+    server.serve(
+        host=options.host,
+        port=options.port,
+        processes=options.processes,
+        max_pending=options.max_pending,
+        ruleset_names=options.rulesets,
+    )
+
+
+main()
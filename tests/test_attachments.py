@@ -0,0 +1,90 @@
+import sys
+import os.path
+import unittest
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+)
+
+
+from models import attachments
+from models import parser
+from models import rulesets
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+
+
+class Thing(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.attached_to = None
+        self.command_in_progress = None
+
+
+class AttachmentIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = attachments.AttachmentIndex()
+        self.barracks = Thing('barracks')
+        self.factory = Thing('factory')
+        self.depot = Thing('supply depot')
+        for building in (self.barracks, self.factory, self.depot):
+            self.index.add_building(building)
+
+    def test_only_liftable_buildings_are_indexed(self):
+        self.assertEqual(sorted(self.index.buildings), ['barracks', 'factory'])
+
+    def test_free_attachments_are_reserved_in_order(self):
+        first, second = Thing('reactor'), Thing('reactor')
+        self.index.add_attachment(first)
+        self.index.add_attachment(second)
+        self.index.add_attachment(Thing('tech lab'), self.barracks)
+        self.assertEqual(self.index.free_attachments(), [first, second])
+        self.assertIs(self.index.reserve('reactor'), first)
+        self.assertIs(self.index.reserve('reactor'), second)
+        self.assertIsNone(self.index.reserve('reactor'))
+        self.assertIsNone(self.index.reserve('tech lab'))
+
+    def test_idle_building(self):
+        tech_lab = Thing('tech lab')
+        self.index.add_attachment(tech_lab, self.barracks)
+        self.assertIs(self.barracks.attached_to, tech_lab)
+        self.assertIs(self.index.idle_building('barracks', 'tech lab'), self.barracks)
+        self.assertIsNone(self.index.idle_building('barracks', None))
+        self.assertIs(self.index.idle_building('factory', None), self.factory)
+        self.assertIsNone(self.index.idle_building('barracks', exclude=self.barracks))
+
+        # Neither a busy building nor one with a busy attachment lifts off
+        tech_lab.command_in_progress = {}
+        self.assertIsNone(self.index.idle_building('barracks'))
+        tech_lab.command_in_progress = None
+        self.barracks.command_in_progress = {}
+        self.assertIsNone(self.index.idle_building('barracks'))
+
+    def test_detach(self):
+        tech_lab = Thing('tech lab')
+        attachments.attach(self.barracks, tech_lab)
+        self.assertIs(attachments.detach(self.barracks), tech_lab)
+        self.assertIsNone(tech_lab.attached_to)
+        self.assertIsNone(attachments.detach(self.barracks))
+
+
+class SwapTest(unittest.TestCase):
+
+    def attached(self, name):
+        ruleset = rulesets.get('HotS')
+        game = ruleset.game(ruleset.parse_build_order_file(os.path.join(ROOT, name)), verbose=False).run()
+        return dict((b.name, b.attached_to and b.attached_to.name)
+                    for b in game.buildings if b.name in attachments.LIFTABLE_BUILDINGS)
+
+    def test_swap_buildings(self):
+        self.assertEqual(self.attached('regression/orders/swap_attachments.txt'),
+                         {'barracks': 'tech lab', 'factory': 'reactor', 'starport': None})
+
+    def test_move_onto_a_free_attachment(self):
+        self.assertEqual(self.attached('input_examples/HotS_banshee_opener.txt'),
+                         {'barracks': 'reactor', 'factory': None, 'starport': 'tech lab'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import shutil
+import sys
+import os.path
+import tempfile
+import unittest
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+)
+
+
+from models import cache
+from models import commands
+from models import mining
+from models import parser
+from models import rulesets
+from models import sweep
+
+ORDER = """supply depot
+barracks
+constant scv
+refinery 2
+marine
+tech lab on barracks
+"""
+
+
+class BuildOrderHashTest(unittest.TestCase):
+
+    def setUp(self):
+        self.facts = rulesets.get('HotS').facts()
+
+    def hash(self, text):
+        return commands.build_order_hash(parser.parse_build_order_text(text, self.facts))
+
+    def test_how_it_is_written_does_not_matter(self):
+        rewritten = """# The same build, written differently
+
+  Supply Depot
+BARRACKS
+constant scvs
+
+Refinery 2   
+# a comment between commands
+marine
+Tech Lab on Barracks
+"""
+        self.assertEqual(self.hash(rewritten), self.hash(ORDER))
+
+    def test_what_it_builds_does(self):
+        self.assertNotEqual(self.hash(ORDER.replace("refinery 2", "refinery")), self.hash(ORDER))
+        self.assertNotEqual(self.hash(ORDER.replace("barracks\n", "", 1)), self.hash(ORDER))
+        self.assertNotEqual(self.hash("supply depot\nbarracks"), self.hash("barracks\nsupply depot"))
+
+
+class RulesetHashTest(unittest.TestCase):
+
+    def setUp(self):
+        self.facts = rulesets.get('HotS').facts()
+
+    def test_defaults(self):
+        self.assertEqual(cache.ruleset_hash(self.facts), cache.ruleset_hash(self.facts, mining.MiningRates()))
+
+    def test_everything_that_decides_the_result(self):
+        key = cache.ruleset_hash(self.facts, breaker=900)
+        changed_facts, rates = sweep.apply_overrides(self.facts, {"marine.minerals": 45})
+        for other in (cache.ruleset_hash(self.facts, breaker=600),
+                      cache.ruleset_hash(self.facts, mining.MiningRates(minerals_per_trip=4), breaker=900),
+                      cache.ruleset_hash(changed_facts, breaker=900)):
+            self.assertNotEqual(other, key)
+
+
+class ResultCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_get_and_put(self):
+        results = cache.ResultCache(self.directory)
+        self.assertIsNone(results.get('ruleset', 'abcdef'))
+        results.put('ruleset', 'abcdef', {'time': 154})
+        self.assertEqual(cache.ResultCache(self.directory).get('ruleset', 'abcdef'), {'time': 154})
+        self.assertIsNone(results.get('other ruleset', 'abcdef'))
+        self.assertEqual((results.hits, results.misses), (0, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import shutil
+import sys
+import os.path
+import tempfile
+import unittest
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+)
+
+
+from models import parser
+from models import rulesets
+from models import shared
+from models import terran
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+
+
+class DeadlockTest(unittest.TestCase):
+
+    def setUp(self):
+        self.facts = rulesets.get('HotS').facts()
+
+    def play(self, text, lookahead=0, breaker=None):
+        build_order = parser.parse_build_order_text(text, self.facts)
+        return terran.HotsGame(build_order, self.facts, verbose=False, lookahead=lookahead).run(breaker)
+
+    def assertDeadlocked(self, text, exception, why, lookahead=0):
+        with self.assertRaisesRegexp(exception, why):
+            self.play(text, lookahead)
+
+    def test_reasons(self):
+        self.assertDeadlocked("factory", terran.Deadlocked, "`factory` needs `barracks`, and nothing")
+        self.assertDeadlocked("supply depot\nbarracks\nreaper", terran.Deadlocked,
+                              "`reaper` needs 50 gas, with 0 and no gas income or refinery in progress")
+        self.assertDeadlocked("scv\n" * 7, terran.SupplyBlocked,
+                              "`scv` needs 1 supply, with 11/11 and no supply depot in progress")
+        self.assertDeadlocked("swap barracks and factory", terran.Deadlocked,
+                              "has no buildings or attachments to swap")
+
+    def test_found_as_soon_as_certain(self):
+        with self.assertRaises(terran.Deadlocked) as raised:
+            self.play("factory\nscv\nscv", lookahead=2)
+        self.assertIn("at 0:00", str(raised.exception))
+
+    def test_later_commands_can_help_with_a_lookahead(self):
+        self.assertDeadlocked("supply depot\nbarracks\nreaper\nrefinery", terran.Deadlocked, "50 gas")
+        self.assertEqual(self.play("supply depot\nbarracks\nreaper\nrefinery", lookahead=1).time, 206)
+        text = "stimpack\nsupply depot\nbarracks\nrefinery\ntech lab on barracks"
+        self.assertDeadlocked(text, terran.Deadlocked, "needs `tech lab on barracks`")
+        self.assertEqual(self.play(text, lookahead=4).started_ahead, [1, 2, 3, 4])
+
+    def test_unlimited_horizon(self):
+        path = os.path.join(ROOT, 'input_examples', 'HotS_banshee_opener.txt')
+        build_order = parser.parse_build_order_file(path, self.facts)
+        limited = terran.HotsGame(list(build_order), self.facts, verbose=False).run()
+        unlimited = terran.HotsGame(list(build_order), self.facts, verbose=False).run(None)
+        self.assertEqual(unlimited.time, limited.time)
+        game = terran.HotsGame(list(build_order), self.facts, verbose=False)
+        self.assertRaises(terran.TimeLimitReached, game.run, 60)
+
+    def test_shared_records(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "HotS.facts")
+            shared.compile_facts(self.facts, path)
+            build_orders = [parser.parse_build_order_text(text, self.facts) for text in ("scv", "factory")]
+            results = shared.run_parallel(build_orders, path, processes=1)
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual(shared.ERRORS[results[0]['error']], None)
+        self.assertEqual(results[1]['completed'], 0)
+        self.assertEqual(shared.ERRORS[results[1]['error']], 'Deadlocked')
+
+
+if __name__ == '__main__':
+    unittest.main()
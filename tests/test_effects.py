@@ -0,0 +1,93 @@
+import sys
+import os.path
+import unittest
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+)
+
+
+from models import effects
+from models import parser
+from models import rulesets
+
+
+class Target(object):
+
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.fired = []
+
+    def effect_note(self, label):
+        self.fired.append(label)
+
+    def effect_again(self, time):
+        self.fired.append('again')
+        self.scheduler.schedule(time, 'note', 'scheduled while firing')
+
+
+class EffectSchedulerTest(unittest.TestCase):
+
+    def test_order(self):
+        scheduler = effects.EffectScheduler()
+        target = Target(scheduler)
+        scheduler.schedule(20, 'note', 'c')
+        scheduler.schedule(10, 'note', 'a')
+        scheduler.schedule(10, 'note', 'b')
+        self.assertEqual(scheduler.next_time(), 10)
+        self.assertEqual([p[2] for p in scheduler.pending()], [('a',), ('b',), ('c',)])
+        self.assertEqual(scheduler.run_due(9, target), 0)
+        self.assertEqual(scheduler.run_due(15, target), 2)
+        self.assertEqual(target.fired, ['a', 'b'])
+        self.assertEqual(len(scheduler), 1)
+
+    def test_effects_scheduled_while_firing(self):
+        scheduler = effects.EffectScheduler()
+        target = Target(scheduler)
+        scheduler.schedule(10, 'again', 10)
+        self.assertEqual(scheduler.run_due(10, target), 2)
+        self.assertEqual(target.fired, ['again', 'scheduled while firing'])
+        self.assertIsNone(scheduler.next_time())
+
+
+class EnergyTest(unittest.TestCase):
+
+    def test_regenerates_to_the_maximum(self):
+        energy = effects.Energy(50, 200, 0.5, 100)
+        self.assertEqual(energy.value(120), 60)
+        self.assertEqual(energy.value(1000), 200)
+        energy.spend(50, 120)
+        self.assertEqual(energy.value(120), 10)
+        self.assertRaises(Exception, energy.spend, 50, 120)
+        self.assertEqual(energy.time_until(50, 120), 80)
+        self.assertIsNone(energy.time_until(250, 120))
+
+
+class MuleTest(unittest.TestCase):
+
+    def play(self, text, seconds):
+        ruleset = rulesets.get('HotS')
+        game = ruleset.game(parser.parse_build_order_text(text, ruleset.facts()), verbose=False)
+        for i in range(seconds):
+            game.tick()
+        return game
+
+    def test_a_mule_mines_until_it_expires(self):
+        order = "supply depot\nbarracks\norbital command"
+        with_mule = self.play(order + "\nmule", 300)
+        without = self.play(order, 300)
+        rates = with_mule.mining.rates
+        trips = rates.mule_duration // rates.mule_trip_time
+        self.assertEqual(with_mule.minerals_available - without.minerals_available,
+                         trips * rates.mule_minerals_per_trip)
+        self.assertEqual(len(with_mule.effects), 0)
+
+    def test_mules_wait_for_energy(self):
+        ruleset = rulesets.get('HotS')
+        order = "supply depot\nbarracks\norbital command\nmule\nmule"
+        game = ruleset.game(parser.parse_build_order_text(order, ruleset.facts()), verbose=False).run()
+        first, second = [begin for command, begin, complete in game.command_timings()[3:]]
+        self.assertEqual(second, first + 89) # 50 energy at 0.5625 a second
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import shutil
+import sys
+import os.path
+import tempfile
+import unittest
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+)
+
+
+from models import fuzzer
+from models import parser
+from models import rulesets
+from models import terran
+
+
+class FuzzerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.facts = rulesets.get('HotS').facts()
+
+    def play(self, order):
+        """Return None if the order plays to the end, or why it did not."""
+        try:
+            build_order = parser.parse_build_order_lines(order['lines'], self.facts)
+            terran.HotsGame(build_order, self.facts, verbose=False).run(fuzzer.MAX_TIME)
+        except Exception as e:
+            return e
+        return None
+
+    def test_labels_match_how_orders_play(self):
+        for shape in ('balanced', 'swaps', 'refineries', 'constants'):
+            for order in fuzzer.generate_orders(self.facts, 6, seed=3, shape=shape, invalid=0.5):
+                error = self.play(order)
+                if order['valid']:
+                    self.assertIsNone(error, "%s: %r" % (order['name'], error))
+                else:
+                    self.assertIn(order['mutation'], fuzzer.MUTATIONS)
+                    self.assertIsNotNone(error, order['name'])
+
+    def test_any_order_can_be_generated_alone(self):
+        orders = list(fuzzer.generate_orders(self.facts, 4, seed=5, invalid=0.5))
+        again = fuzzer.generate_order(self.facts, seed=5, index=2, invalid=0.5)
+        self.assertEqual(again, orders[2])
+        self.assertEqual(list(fuzzer.generate_orders(self.facts, 2, seed=5, invalid=0.5, start=2)), orders[2:])
+
+    def test_files(self):
+        directory = tempfile.mkdtemp()
+        try:
+            orders = list(fuzzer.generate_orders(self.facts, 3, seed=1, verify=False))
+            path = os.path.join(directory, 'corpus.jsonl')
+            self.assertEqual(fuzzer.write_jsonl(path, orders), 3)
+            self.assertEqual(list(fuzzer.read_jsonl(path)), orders)
+            self.assertEqual(fuzzer.write_directory(directory, orders), 3)
+            build_order = parser.parse_build_order_file(
+                os.path.join(directory, orders[0]['name'] + '.txt'), self.facts)
+            self.assertEqual(len(build_order), len([l for l in orders[0]['lines'] if not l.startswith('#')]))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_chunks(self):
+        self.assertEqual(list(fuzzer.chunks(range(5), 2)), [[0, 1], [2, 3], [4]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import glob
+import os
+import shutil
+import sys
+import os.path
+import tempfile
+import unittest
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+)
+
+
+from models import golden
+from models import parser
+from models import rulesets
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+
+
+class TimelineTest(unittest.TestCase):
+
+    def test_first_divergence(self):
+        expected = [[0, 'begin', 'a'], [10, 'complete', 'a']]
+        self.assertIsNone(golden.first_divergence(expected, list(expected)))
+        self.assertEqual(golden.first_divergence(expected, [[0, 'begin', 'a'], [11, 'complete', 'a']]),
+                         (1, [10, 'complete', 'a'], [11, 'complete', 'a']))
+        self.assertEqual(golden.first_divergence(expected, expected[:1]), (1, expected[1], None))
+
+    def test_reformatting_does_not_change_the_timeline(self):
+        ruleset = rulesets.get('HotS')
+        facts = ruleset.facts()
+        first = golden.play(ruleset.parse_build_order_file(
+            os.path.join(ROOT, 'input_examples', 'fastest_one_marine.txt')), facts)
+        second = golden.play(parser.parse_build_order_text("# comment\nSupply Depot\n\nBarracks\nMARINE", facts), facts)
+        self.assertEqual(first, second)
+        self.assertEqual(first[-1][1], 'end')
+
+
+class RegressionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.goldens = os.path.join(self.directory, 'goldens')
+        self.path = os.path.join(self.directory, 'order.txt')
+        self.ruleset = rulesets.get('HotS')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, text):
+        with open(self.path, 'w') as f:
+            f.write(text)
+
+    def status(self, update=False):
+        result, = golden.run_regression([self.path], self.ruleset, self.goldens,
+                                        update=update, processes=1)
+        return result
+
+    def test_lifecycle(self):
+        self.write("supply depot\nbarracks\nmarine\n")
+        self.assertEqual(self.status().status, golden.NEW)
+        self.assertEqual(self.status(update=True).status, golden.UPDATED)
+        self.assertEqual(self.status().status, golden.SAME)
+
+        self.write("supply depot\nbarracks\nmarine\nmarine\n")
+        result = self.status()
+        self.assertEqual(result.status, golden.CHANGED)
+        self.assertEqual(result.divergence[1][1], 'end')
+
+    def test_unparseable(self):
+        self.write("no such thing\n")
+        result = self.status()
+        self.assertEqual(result.status, golden.CHANGED)
+        self.assertIn("no such thing", result.error)
+
+    def test_checked_in_goldens(self):
+        cwd = os.getcwd()
+        os.chdir(ROOT)
+        try:
+            paths = sorted(glob.glob(os.path.join('input_examples', '*.txt')) +
+                           glob.glob(os.path.join('regression', 'orders', '*.txt')))
+            results = golden.run_regression(paths, self.ruleset, os.path.join(ROOT, 'regression', 'goldens'))
+        finally:
+            os.chdir(cwd)
+        self.assertEqual([r.path for r in results if r.status != golden.SAME], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
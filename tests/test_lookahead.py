@@ -0,0 +1,101 @@
+import glob
+import sys
+import os.path
+import unittest
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+)
+
+
+from models import fuzzer
+from models import parser
+from models import readiness
+from models import rulesets
+from models import terran
+from models import utilization
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+
+
+class ReadinessIndexTest(unittest.TestCase):
+
+    def test_woken_by_change(self):
+        index = readiness.ReadinessIndex()
+        command, other = object(), object()
+        index.block(command, utilization.PRODUCER)
+        index.block(other, utilization.SUPPLY)
+        self.assertFalse(index.is_ready(command, 1000, 1000))
+        index.wake(utilization.PREREQUISITE, utilization.PRODUCER)
+        self.assertTrue(index.is_ready(command, 0, 0))
+        self.assertFalse(index.is_ready(other, 0, 0))
+        self.assertEqual(index.waiting_on(other), (utilization.SUPPLY, 0, 0))
+
+    def test_woken_by_bank(self):
+        index = readiness.ReadinessIndex()
+        command = object()
+        index.block(command, utilization.MINERALS, minerals=150)
+        self.assertFalse(index.is_ready(command, 149, 0))
+        self.assertTrue(index.is_ready(command, 150, 0))
+        self.assertEqual(len(index), 0)
+
+    def test_declined_until_cleared(self):
+        index = readiness.ReadinessIndex()
+        command = object()
+        index.block(command, readiness.DECLINED)
+        index.wake(*(readiness.WOKEN_BY_CHANGE + readiness.WOKEN_BY_BANK))
+        self.assertFalse(index.is_ready(command, 1000, 1000))
+        index.clear()
+        self.assertTrue(index.is_ready(command, 0, 0))
+
+
+class LookaheadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.facts = rulesets.get('HotS').facts()
+
+    def play(self, lines, lookahead):
+        build_order = parser.parse_build_order_lines(lines, self.facts)
+        return terran.HotsGame(build_order, self.facts, verbose=False, lookahead=lookahead).run()
+
+    def test_begins_later_commands_early(self):
+        lines = ['supply depot', 'barracks', 'marine', 'refinery', 'scv']
+        self.assertEqual(self.play(lines, 0).time, 159)
+        game = self.play(lines, 1)
+        self.assertEqual(game.time, 154)
+        self.assertEqual(game.started_ahead, [3])
+
+    def test_prerequisites_out_of_order(self):
+        lines = ['marine', 'supply depot', 'barracks']
+        self.assertRaises(terran.Deadlocked, self.play, lines, 0)
+        self.assertEqual(self.play(lines, 2).time, 168)
+
+    def test_swap_ends_the_window(self):
+        # Nothing behind a waiting swap may take the producers it swaps
+        lines = [line.strip() for line in open(os.path.join(ROOT, 'regression', 'orders', 'swap_attachments.txt'))]
+        lines += ['marine', 'marine', 'hellion']
+        swap = lines.index('swap barracks and factory')
+        timings = self.play(lines, 3).command_timings()
+        swapped = timings[swap][1]
+        for command, begin, complete in timings[swap + 1:]:
+            self.assertGreaterEqual(begin, swapped, command)
+
+    def test_never_finishes_later(self):
+        orders = []
+        paths = glob.glob(os.path.join(ROOT, 'input_examples', '*.txt'))
+        paths += glob.glob(os.path.join(ROOT, 'regression', 'orders', '*.txt'))
+        for path in sorted(paths):
+            orders.append((path, [line.strip() for line in open(path)]))
+        for shape in ('balanced', 'swaps', 'constants'):
+            for order in fuzzer.generate_orders(self.facts, 3, seed=11, shape=shape):
+                orders.append((order['name'], order['lines']))
+        for name, lines in orders:
+            try:
+                finished = self.play(lines, 0).time
+            except terran.StarcraftException:
+                continue
+            for lookahead in (1, 3):
+                self.assertLessEqual(self.play(lines, lookahead).time, finished, "%s, lookahead %s" % (name, lookahead))
+
+
+if __name__ == '__main__':
+    unittest.main()
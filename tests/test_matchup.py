@@ -0,0 +1,75 @@
+import sys
+import os.path
+import unittest
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+)
+
+import numpy
+
+from models import matchup
+from models import parser
+from models import rulesets
+
+
+def compare(a, b, horizon):
+    """Compare two curves second by second, as the matrices should."""
+    crossover = window_end = matchup.NEVER
+    for second in range(horizon + 1):
+        if crossover == matchup.NEVER and a[second] > b[second]:
+            crossover = second
+        elif crossover != matchup.NEVER and window_end == matchup.NEVER and a[second] <= b[second]:
+            window_end = second
+    if crossover != matchup.NEVER and window_end == matchup.NEVER:
+        window_end = horizon + 1
+    return {
+        'crossover': crossover,
+        'window_end': window_end,
+        'ahead_seconds': sum(1 for x, y in zip(a, b) if x > y),
+        'max_advantage': max(x - y for x, y in zip(a, b)),
+    }
+
+
+class MatchupMatrixTest(unittest.TestCase):
+
+    def test_army_curve(self):
+        self.assertEqual(list(matchup.army_curve([(2, 1), (4, 2), (4, 1), (9, 5)], 6)), [0, 0, 1, 1, 4, 4, 4])
+
+    def test_matrices_match_every_pair(self):
+        random = numpy.random.RandomState(3)
+        horizon = 60
+        events = [[(t, int(v)) for t, v in zip(random.randint(0, horizon + 1, size=6), random.randint(1, 4, size=6))]
+                  for i in range(7)]
+        curves = numpy.array([matchup.army_curve(e, horizon) for e in events])
+        names = ["order %s" % i for i in range(len(curves))]
+
+        original = matchup.BLOCK_BYTES
+        matrices = [matchup.MatchupMatrix(names, curves, matchup.SUPPLY)]
+        matchup.BLOCK_BYTES = 1 # One row a block
+        try:
+            matrices.append(matchup.MatchupMatrix(names, curves, matchup.SUPPLY))
+        finally:
+            matchup.BLOCK_BYTES = original
+
+        for matrix in matrices:
+            for i, a in enumerate(names):
+                for j, b in enumerate(names):
+                    self.assertEqual(matrix.pair(a, b), compare(curves[i], curves[j], horizon))
+
+    def test_run_matchups(self):
+        facts = rulesets.get('HotS').facts()
+        build_orders = dict((name, parser.parse_build_order_text(text, facts)) for name, text in (
+            ('marine', "supply depot\nbarracks\nmarine"),
+            ('marines', "supply depot\nbarracks\nmarine\nmarine"),
+            ('scvs', "scv\nscv"),
+        ))
+        matrix = matchup.run_matchups(build_orders, facts, processes=1)
+        self.assertEqual(matrix.names, ['marine', 'marines', 'scvs'])
+        self.assertEqual(matrix.pair('scvs', 'marine')['crossover'], matchup.NEVER)
+        self.assertEqual(matrix.pair('marines', 'marine')['window_end'], matrix.horizon + 1)
+        self.assertEqual(matrix.pair('marine', 'scvs')['max_advantage'], 1)
+        self.assertRaises(Exception, matchup.run_matchups, build_orders, facts, value='speed')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import shutil
+import sys
+import os.path
+import tempfile
+import unittest
+import urllib2
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+)
+
+
+from models import metrics
+from models import parser
+from models import rulesets
+from models import terran
+
+
+class RegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = metrics.Registry()
+        self.games = self.registry.counter('games', "Games played.", labels=('type',))
+        self.queued = self.registry.gauge('queued', "Games waiting.")
+        self.seconds = self.registry.histogram('seconds', "Wall time.", buckets=(0.5, 1.0))
+
+    def test_exposition(self):
+        self.games.inc(labels=('Deadlocked',))
+        self.games.inc(2, labels=('say "hi"\n',))
+        self.queued.set(3)
+        self.seconds.observe(0.25)
+        self.seconds.observe(0.75)
+        self.seconds.observe(4)
+        self.assertEqual(self.registry.exposition(), "\n".join([
+            '# TYPE games counter',
+            '# HELP games Games played.',
+            'games_total{type="Deadlocked"} 1',
+            'games_total{type="say \\"hi\\"\\n"} 2',
+            '# TYPE queued gauge',
+            '# HELP queued Games waiting.',
+            'queued 3',
+            '# TYPE seconds histogram',
+            '# HELP seconds Wall time.',
+            'seconds_bucket{le="0.5"} 1',
+            'seconds_bucket{le="1"} 2',
+            'seconds_bucket{le="+Inf"} 3',
+            'seconds_count 3',
+            'seconds_sum 5',
+            '# EOF',
+        ]) + "\n")
+
+    def test_registered_once(self):
+        self.assertIs(self.registry.counter('games', "Games played.", labels=('type',)), self.games)
+        self.assertRaises(Exception, self.registry.gauge, 'games', "Games played.")
+
+    def test_drain_and_merge(self):
+        self.games.inc(labels=('SupplyBlocked',))
+        self.queued.set(5)
+        self.seconds.observe(0.1)
+        drained = self.registry.drain()
+        self.assertEqual(sorted(drained), ['games', 'seconds'])
+        self.assertEqual(self.games.value(('SupplyBlocked',)), 0)
+        self.registry.merge(drained)
+        self.registry.merge(drained)
+        self.assertEqual(self.games.value(('SupplyBlocked',)), 2)
+        self.assertEqual(self.seconds.count(), 2)
+        self.assertEqual(self.queued.value(), 5)
+
+    def test_write_file(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "metrics.txt")
+            self.queued.set(1)
+            metrics.write_file(path, self.registry)
+            self.assertEqual(open(path).read(), self.registry.exposition())
+            self.assertEqual(os.listdir(directory), ["metrics.txt"])
+        finally:
+            shutil.rmtree(directory)
+
+    def test_http_server(self):
+        self.queued.set(7)
+        server = metrics.start_http_server(0, registry=self.registry)
+        try:
+            url = "http://127.0.0.1:%s" % server.server_address[1]
+            response = urllib2.urlopen(url + "/metrics")
+            self.assertEqual(response.info()['Content-Type'], metrics.CONTENT_TYPE)
+            self.assertIn("queued 7\n", response.read())
+            self.assertRaises(urllib2.HTTPError, urllib2.urlopen, url + "/other")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class SimulationMetricsTest(unittest.TestCase):
+
+    def test_games_are_recorded(self):
+        facts = rulesets.get('HotS').facts()
+        simulations = metrics.SIMULATIONS.value()
+        seconds = metrics.SIMULATED_SECONDS.value()
+        failures = metrics.FAILURES.value(('Deadlocked',))
+        game = terran.HotsGame(parser.parse_build_order_text("scv", facts), facts, verbose=False).run()
+        self.assertRaises(terran.Deadlocked, terran.HotsGame(
+            parser.parse_build_order_text("factory", facts), facts, verbose=False).run)
+        self.assertEqual(metrics.SIMULATIONS.value(), simulations + 2)
+        self.assertEqual(metrics.SIMULATED_SECONDS.value(), seconds + game.time)
+        self.assertEqual(metrics.FAILURES.value(('Deadlocked',)), failures + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
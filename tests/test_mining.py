@@ -0,0 +1,91 @@
+import random
+import sys
+import os.path
+import unittest
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+)
+
+
+from models import mining
+
+
+class Worker(object):
+    pass
+
+
+class MiningModelTest(unittest.TestCase):
+
+    def setUp(self):
+        self.model = mining.MiningModel()
+        self.base = self.model.add_base()
+
+    def add_workers(self, count):
+        workers = [Worker() for i in range(count)]
+        for worker in workers:
+            self.model.assign_minerals(worker)
+        return workers
+
+    def test_resource_node_is_abstract(self):
+        self.assertRaises(TypeError, mining.ResourceNode, mining.MiningRates())
+
+    def test_unknown_rate_is_rejected(self):
+        self.assertRaises(Exception, mining.MiningRates, no_such_rate=1)
+
+    def test_saturation(self):
+        rates = self.model.rates
+        self.add_workers(16)
+        self.assertAlmostEqual(self.model.income()[0], 16 * rates.mineral_collection_rate)
+        self.add_workers(8)
+        saturated = self.model.income()[0]
+        self.assertAlmostEqual(saturated, 16 * rates.mineral_collection_rate +
+                               8 * rates.oversaturated_mineral_rate)
+        # Workers beyond three a patch collect nothing
+        self.add_workers(4)
+        self.assertAlmostEqual(self.model.income()[0], saturated)
+
+    def test_income_is_the_sum_of_every_node(self):
+        self.add_workers(12)
+        geyser = self.model.add_geyser()
+        self.model.transfer_to_gas(geyser, 3)
+        minerals, gas = self.model.income()
+        self.assertAlmostEqual(minerals, sum(n.collection_rate() for n in self.model.nodes
+                                             if n.resource == mining.MINERALS))
+        self.assertAlmostEqual(gas, 3 * self.model.rates.gas_collection_rate)
+        self.assertEqual(len(self.base.mineral_line.workers), 9)
+
+    def test_ticks_pay_out_whole_trips(self):
+        self.add_workers(16)
+        total = 0
+        for second in range(60):
+            minerals, gas = self.model.tick()
+            self.assertEqual(minerals % self.model.rates.minerals_per_trip, 0)
+            total += minerals
+        self.assertAlmostEqual(total, 60 * self.model.income()[0], delta=5)
+
+    def test_new_base_takes_oversaturated_workers(self):
+        self.add_workers(24)
+        second = self.model.add_base()
+        self.assertEqual(len(self.base.mineral_line.workers), 16)
+        self.assertEqual(len(second.mineral_line.workers), 8)
+
+    def test_geysers_fill_the_first_base_with_room(self):
+        second = self.model.add_base()
+        for i in range(3):
+            self.model.add_geyser()
+        self.assertEqual(len(self.base.geysers), 2)
+        self.assertEqual(len(second.geysers), 1)
+
+    def test_jitter_is_seeded(self):
+        def collected(seed):
+            model = mining.MiningModel(random=random.Random(seed), jitter=0.2)
+            model.add_base()
+            for i in range(16):
+                model.assign_minerals(Worker())
+            return [model.tick()[0] for second in range(120)]
+        self.assertEqual(collected(1), collected(1))
+        self.assertNotEqual(collected(1), collected(2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import sys
+import os.path
+import unittest
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+)
+
+import numpy
+
+from models import montecarlo
+from models import parser
+from models import replicas
+from models import rulesets
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+
+
+def load(path):
+    facts = rulesets.get('HotS').facts()
+    return parser.parse_build_order_file(os.path.join(ROOT, path), facts), facts
+
+
+def same_timings(first, second):
+    return (numpy.array_equal(numpy.isnan(first), numpy.isnan(second)) and
+            numpy.array_equal(numpy.nan_to_num(first), numpy.nan_to_num(second)))
+
+
+class ReplicaBatchTest(unittest.TestCase):
+
+    def play_each(self, build_order, facts, seeds, jitter):
+        montecarlo._init_worker(build_order, facts, None, jitter)
+        timings = numpy.empty((len(seeds), len(build_order), 2))
+        for i, seed in enumerate(seeds):
+            montecarlo._play(seed, timings[i])
+        return timings
+
+    def test_replicas_play_as_games(self):
+        for path in ('input_examples/HotS_banshee_opener.txt',
+                     'regression/orders/swap_attachments.txt',
+                     'regression/orders/gas_transfer_builders.txt'):
+            build_order, facts = load(path)
+            self.assertTrue(replicas.supported(build_order, facts))
+            seeds = range(20)
+            batch = replicas.ReplicaBatch(build_order, facts, seeds, jitter=0.1)
+            timings = batch.run()
+            self.assertFalse(batch.flagged.any())
+            self.assertTrue(same_timings(timings, self.play_each(build_order, facts, seeds, 0.1)))
+
+    def test_failing_replicas_are_flagged(self):
+        build_order, facts = load('regression/orders/supply_blocked_without_depot.txt')
+        batch = replicas.ReplicaBatch(build_order, facts, range(5), jitter=0.1)
+        batch.run()
+        self.assertTrue(batch.flagged.all())
+
+    def test_mules_are_not_supported(self):
+        build_order, facts = load('regression/orders/mule_calldown.txt')
+        self.assertFalse(replicas.supported(build_order, facts))
+
+
+class MonteCarloTest(unittest.TestCase):
+
+    def test_batching_does_not_change_the_result(self):
+        build_order, facts = load('input_examples/HotS_banshee_opener.txt')
+        results = [montecarlo.run_monte_carlo(build_order, facts, replicas=30, seed=7,
+                                              batch_size=size, processes=1)
+                   for size in (30, 7)]
+        self.assertEqual(results[0].timings.shape, (30, len(build_order), 2))
+        self.assertTrue(same_timings(results[0].timings, results[1].timings))
+
+    def test_unsupported_orders_play_as_games(self):
+        build_order, facts = load('regression/orders/mule_calldown.txt')
+        result = montecarlo.run_monte_carlo(build_order, facts, replicas=4, seed=1, processes=1)
+        self.assertEqual(result.failures(), 0)
+        self.assertFalse(numpy.isnan(result.percentile_table(1)[1:]).any())
+
+    def test_failures(self):
+        build_order, facts = load('regression/orders/supply_blocked_without_depot.txt')
+        result = montecarlo.run_monte_carlo(build_order, facts, replicas=3, seed=1, processes=1)
+        self.assertEqual(result.failures(), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import sys
+import os.path
+import unittest
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+)
+
+
+from models import parser
+from models import research
+from models import rulesets
+from models import terran
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+
+
+class ResearchTableTest(unittest.TestCase):
+
+    def test_states(self):
+        table = research.ResearchTable(['stimpack', 'combat shield'])
+        self.assertIn('stimpack', table)
+        self.assertNotIn('infantry weapons 1', table)
+        table.begin('stimpack', 10)
+        self.assertEqual(table.state('stimpack'), research.IN_PROGRESS)
+        self.assertRaises(Exception, table.begin, 'stimpack', 20)
+        self.assertRaises(Exception, table.complete, 'combat shield', 20)
+        table.complete('stimpack', 180)
+        self.assertTrue(table.is_complete('stimpack'))
+        self.assertFalse(table.can_begin('stimpack'))
+        self.assertEqual(table.completed_names(), ['stimpack'])
+
+
+class ResearchGameTest(unittest.TestCase):
+
+    def play(self, text):
+        ruleset = rulesets.get('HotS')
+        return ruleset.game(parser.parse_build_order_text(text, ruleset.facts()), verbose=False)
+
+    def test_chains(self):
+        ruleset = rulesets.get('HotS')
+        game = ruleset.game(ruleset.parse_build_order_file(
+            os.path.join(ROOT, 'regression', 'orders', 'research_upgrades.txt')), verbose=False).run()
+        table = game.research_table
+        self.assertEqual(table.completed_names(), ['stimpack', 'infantry weapons 1', 'infantry weapons 2'])
+        # The second level waits for the first
+        self.assertEqual(table.began['infantry weapons 2'], table.completed['infantry weapons 1'])
+        self.assertEqual([r.name for r in game.research], table.completed_names())
+
+    def test_research_twice(self):
+        game = self.play("supply depot\nrefinery\nengineering bay\ninfantry weapons 1\ninfantry weapons 1")
+        with self.assertRaisesRegexp(terran.Deadlocked, "already researched"):
+            game.run()
+
+    def test_missing_prerequisite(self):
+        game = self.play("supply depot\nrefinery\nbarracks\nengineering bay\nfactory\narmory\ninfantry weapons 2")
+        with self.assertRaisesRegexp(terran.Deadlocked, "needs `infantry weapons 1`"):
+            game.run()
+
+
+if __name__ == '__main__':
+    unittest.main()
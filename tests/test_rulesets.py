@@ -0,0 +1,63 @@
+import os
+import shutil
+import sys
+import os.path
+import tempfile
+import unittest
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+)
+
+
+from models import rulesets
+
+
+class RulesetRegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for name in ('HotS', 'Copy'):
+            os.mkdir(os.path.join(self.directory, name))
+            for filename in rulesets.DATA_FILES.values():
+                shutil.copy(os.path.join(rulesets.DATA_DIRECTORY, 'HotS', filename),
+                            os.path.join(self.directory, name, filename))
+        os.mkdir(os.path.join(self.directory, 'incomplete'))
+        self.registry = rulesets.RulesetRegistry().discover(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_discover(self):
+        self.assertEqual(self.registry.names(), ['Copy', 'HotS'])
+        self.assertRaises(Exception, self.registry.get, 'incomplete')
+
+    def test_facts_load_lazily(self):
+        self.assertEqual(self.registry.loaded(), [])
+        facts = self.registry.get('HotS').facts()
+        self.assertEqual(self.registry.loaded(), ['HotS'])
+        self.assertIs(self.registry.get('HotS').facts(), facts)
+
+    def test_identical_records_are_shared(self):
+        first = self.registry.get('HotS').facts()
+        second = self.registry.get('Copy').facts()
+        self.assertIs(first.units['marine'], second.units['marine'])
+
+    def test_compiled_facts(self):
+        ruleset = self.registry.get('HotS')
+        parsed = ruleset.facts()
+        self.assertTrue(os.path.isfile(ruleset.compiled_path()))
+        ruleset.unload()
+        self.assertEqual(ruleset.facts().units, parsed.units)
+
+        # A data file newer than the compiled file is parsed again
+        stale = os.path.getmtime(ruleset.path('units')) - 10
+        os.utime(ruleset.compiled_path(), (stale, stale))
+        self.assertIsNone(ruleset.read_compiled())
+
+    def test_game(self):
+        ruleset = self.registry.get('HotS')
+        self.assertEqual(ruleset.game([]).__class__.__name__, 'HotsGame')
+
+
+if __name__ == '__main__':
+    unittest.main()
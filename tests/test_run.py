@@ -0,0 +1,59 @@
+import json
+import subprocess
+import sys
+import os.path
+import unittest
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+)
+
+
+from models import rulesets
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+SCRIPT = os.path.join(ROOT, 'scripts', 'run.py')
+EXAMPLE = os.path.join(ROOT, 'input_examples', 'fastest_one_marine.txt')
+
+
+class RunScriptTest(unittest.TestCase):
+
+    def run_script(self, arguments, stdin=''):
+        """Return the exit status, stdout, and stderr of scripts/run.py."""
+        process = subprocess.Popen([sys.executable, SCRIPT] + arguments, stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        out, err = process.communicate(stdin)
+        return process.returncode, out, err
+
+    def test_summary(self):
+        status, out, err = self.run_script(['--format', 'summary', EXAMPLE, '-'], stdin="factory\n")
+        self.assertEqual(status, 1)
+        lines = out.splitlines()
+        self.assertEqual(lines[0], "%s 2:34 M220 G0 S6/21" % EXAMPLE)
+        self.assertTrue(lines[1].startswith("stdin 0:00 M50 G0 S5/11 Deadlocked: "), lines[1])
+
+    def test_json(self):
+        status, out, err = self.run_script(['--format', 'json', '-'], stdin="supply depot\nnot a command\n")
+        self.assertEqual(status, 1)
+        found = json.loads(out)
+        self.assertEqual((found['name'], found['type'], found['result']), ('stdin', 'ParseError', None))
+
+    def test_quiet(self):
+        self.assertEqual(self.run_script(['-q', EXAMPLE]), (0, '', ''))
+        self.assertEqual(self.run_script(['-q', '--max-time', '60', EXAMPLE]), (1, '', ''))
+
+    def test_unknown_ruleset(self):
+        status, out, err = self.run_script(['--ruleset', 'WoL', EXAMPLE])
+        self.assertEqual(status, 2)
+        self.assertIn("invalid choice: 'WoL'", err)
+        self.assertRaises(Exception, rulesets.get, 'WoL')
+
+    def test_engine_imported_only_for_a_game(self):
+        check = ("import sys; sys.path.append(%r); from models import rulesets; "
+                 "ruleset = rulesets.get('HotS'); ruleset.facts(); "
+                 "print 'models.terran' in sys.modules; ruleset.game([]); "
+                 "print 'models.terran' in sys.modules" % ROOT)
+        self.assertEqual(subprocess.check_output([sys.executable, '-c', check]).split(), ['False', 'True'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import copy
+import sys
+import os.path
+import unittest
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+)
+
+
+from models import parser
+from models import rulesets
+from models import sensitivity
+from models import terran
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+
+
+def load(name):
+    facts = rulesets.get('HotS').facts()
+    return parser.parse_build_order_file(os.path.join(ROOT, 'input_examples', name), facts), facts
+
+
+class SensitivityTest(unittest.TestCase):
+
+    def test_one_marine(self):
+        build_order, facts = load('fastest_one_marine.txt')
+        report = sensitivity.run_sensitivity(build_order, facts, seconds=10, processes=1)
+        marine = 2
+        # The last command begun later finishes the build that much later
+        self.assertEqual(report.change(marine, sensitivity.DELAY), 10)
+        self.assertEqual(report.change(marine, sensitivity.REMOVE), -25)
+        # Nothing else builds a barracks
+        self.assertEqual(report.results[(1, sensitivity.REMOVE)], (None, 'Deadlocked'))
+        self.assertEqual(report.critical_commands(), [1, 2])
+
+    def test_milestone(self):
+        build_order, facts = load('fastest_one_marine.txt')
+        self.assertRaises(Exception, sensitivity.run_sensitivity, build_order, facts,
+                          milestone='banshee', processes=1)
+
+
+class ResumeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.build_order, self.facts = load('HotS_banshee_opener.txt')
+        self.game = terran.HotsGame(list(self.build_order), self.facts, verbose=False, checkpoints=True)
+        self.game.run()
+        self.begins = [begin for command, begin, complete in self.game.command_timings()]
+
+    def resume(self, start, index, not_before):
+        game = copy.deepcopy(self.game.checkpoints[start], {id(self.facts): self.facts})
+        game.checkpoints = None
+        command = game.commands[index]
+        game.build_order.remove(command)
+        game.build_order.insert(0, command)
+        command.not_before = not_before
+        return game.resume()
+
+    def test_checkpoints_replay_the_game(self):
+        for index in sorted(self.game.checkpoints):
+            game = self.resume(index, index, 0)
+            self.assertEqual([t[1:] for t in game.command_timings()],
+                             [t[1:] for t in self.game.command_timings()])
+
+    def test_delayed_commands_begin_that_much_later(self):
+        factory = [c.item_name for c in self.build_order].index('factory')
+        not_before = self.begins[factory] + 10
+        game = self.resume(factory, factory, not_before)
+        self.assertEqual(game.command_timings()[factory][1], not_before)
+
+    def test_advanced_commands_never_begin_too_soon(self):
+        for index, command in enumerate(self.build_order):
+            if index not in self.game.checkpoints or command.is_constant():
+                continue
+            not_before = max(self.begins[index] - 10, 0)
+            start = sensitivity.advanced_from(self.build_order, self.begins, self.game.checkpoints,
+                                              index, not_before)
+            self.assertTrue(start <= index)
+            self.assertTrue(all(self.begins[i] >= not_before for i in range(start, index)))
+            try:
+                game = self.resume(start, index, not_before)
+            except terran.StarcraftException:
+                continue
+            self.assertTrue(game.command_timings()[index][1] >= not_before)
+
+
+if __name__ == '__main__':
+    unittest.main()
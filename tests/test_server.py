@@ -0,0 +1,81 @@
+import json
+import sys
+import os.path
+import threading
+import unittest
+import urllib2
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+)
+
+
+from models import server
+
+ORDER = "supply depot\nbarracks\nmarine"
+
+
+class SimulateTest(unittest.TestCase):
+
+    def test_result(self):
+        status, response = server.simulate('HotS', ORDER, with_timeline=True)
+        self.assertEqual(status, 200)
+        self.assertTrue(response['result']['completed'])
+        self.assertIn('timeline', response['result'])
+
+    def test_parse_error(self):
+        status, response = server.simulate('HotS', "no such thing")
+        self.assertEqual(status, 400)
+        self.assertEqual(response['type'], 'ParseError')
+
+    def test_game_error(self):
+        status, response = server.simulate('HotS', "marine\n" * 12)
+        self.assertEqual(status, 422)
+        self.assertIn('result', response)
+
+
+class SimulationServiceTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.service = server.SimulationService(['HotS'], processes=1, max_pending=1)
+        cls.http = server.SimulationServer(('127.0.0.1', 0), cls.service)
+        thread = threading.Thread(target=cls.http.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.http.shutdown()
+        cls.http.server_close()
+        cls.service.close()
+
+    def post(self, body):
+        url = "http://127.0.0.1:%s/simulate" % self.http.server_address[1]
+        try:
+            response = urllib2.urlopen(url, body)
+        except urllib2.HTTPError as e:
+            response = e
+        return response.code, json.loads(response.read())
+
+    def test_simulate(self):
+        status, response = self.post(json.dumps({'build_order': ORDER}))
+        self.assertEqual(status, 200)
+        self.assertTrue(response['result']['completed'])
+
+    def test_bad_requests(self):
+        for request in ({}, {'build_order': ORDER, 'ruleset': 'WoL'},
+                        {'build_order': ORDER, 'max_time': 'soon'},
+                        {'build_order': ORDER, 'timeout': float('inf')}):
+            self.assertEqual(self.service.handle(request)[0], 400)
+        self.assertEqual(self.post("not json")[0], 400)
+
+    def test_failures_free_their_slot(self):
+        # Only one simulation may be pending, so a leaked slot refuses the next
+        for i in range(3):
+            status, response = self.service.handle({'build_order': "marine\n" * 12})
+            self.assertEqual(status, 422)
+        self.assertEqual(self.service.handle({'build_order': ORDER})[0], 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
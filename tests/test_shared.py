@@ -0,0 +1,62 @@
+import shutil
+import sys
+import os.path
+import tempfile
+import unittest
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+)
+
+
+from models import parser
+from models import rulesets
+from models import shared
+from models import terran
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+
+
+class SharedFactsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "HotS.facts")
+        self.facts = rulesets.get('HotS').facts()
+        shared.compile_facts(self.facts, self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_every_fact_is_kept(self):
+        compiled = shared.SharedFacts(self.path).facts()
+        for name in self.facts.all():
+            self.assertEqual(dict(compiled.cost(name)), dict(self.facts.cost(name)))
+        self.assertEqual(compiled.abilities, self.facts.abilities)
+
+    def test_not_a_facts_file(self):
+        bad = os.path.join(self.directory, "bad.facts")
+        with open(bad, 'wb') as f:
+            f.write('\0' * 64)
+        self.assertRaises(Exception, shared.SharedFacts, bad)
+
+    def test_run_parallel(self):
+        build_orders = [
+            parser.parse_build_order_file(os.path.join(ROOT, 'input_examples', name), self.facts)
+            for name in ('fastest_one_marine.txt', 'HotS_banshee_opener.txt', 'scv_test.txt')
+        ]
+        build_orders.append(parser.parse_build_order_text("scv\n" * 7, self.facts))
+        for processes in (1, 2):
+            results = shared.run_parallel(build_orders, self.path, processes=processes, chunk_size=1)
+            self.assertTrue(results['done'].all())
+            for record, build_order in zip(results[:3], build_orders):
+                game = terran.HotsGame(list(build_order), self.facts, verbose=False).run()
+                self.assertEqual(record['completed'], 1)
+                self.assertEqual(record['time'], game.time)
+                self.assertEqual(record['minerals'], int(game.minerals_available))
+                self.assertEqual(record['supply_used'], game.supply_used)
+            self.assertEqual(results[3]['completed'], 0)
+            self.assertEqual(shared.ERRORS[results[3]['error']], 'SupplyBlocked')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import sys
+import os.path
+import unittest
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+)
+
+
+from models import parser
+from models import rulesets
+from models import similarity
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+
+
+class SimilarityTest(unittest.TestCase):
+
+    def setUp(self):
+        self.ruleset = rulesets.get('HotS')
+        self.facts = self.ruleset.facts()
+        self.lines = [line.strip() for line in open(os.path.join(ROOT, 'input_examples', 'HotS_banshee_opener.txt'))]
+
+    def parse(self, lines):
+        return parser.parse_build_order_lines(lines, self.facts)
+
+    def variants(self):
+        """The banshee opener, with edits at its end, and other openers."""
+        build_orders = {'banshee': self.parse(self.lines)}
+        build_orders['banshee-0'] = self.parse(self.lines + ['marine'])
+        build_orders['banshee-1'] = self.parse(self.lines + ['scv'])
+        build_orders['banshee-2'] = self.parse(self.lines[:-1] + ['marine'])
+        for name in ('HotS_reaper_FE', 'scv_test'):
+            build_orders[name] = self.ruleset.parse_build_order_file(os.path.join(ROOT, 'input_examples', name + '.txt'))
+        return build_orders
+
+    def test_shingles_ignore_case_and_comments(self):
+        other = ["# the same build, in capitals"] + [line.upper() for line in self.lines]
+        self.assertEqual(similarity.shingles(self.parse(other)), similarity.shingles(self.parse(self.lines)))
+        self.assertEqual(len(similarity.shingles(self.parse(['scv']))), 1)
+
+    def test_signatures_estimate_jaccard(self):
+        edited = self.lines[:5] + ['marine'] + self.lines[5:]
+        a = similarity.shingles(self.parse(self.lines))
+        b = similarity.shingles(self.parse(edited))
+        hasher = similarity.MinHasher()
+        estimate = hasher.similarity(hasher.signature(a), hasher.signature(b))
+        self.assertAlmostEqual(estimate, similarity.jaccard(a, b), delta=0.15)
+        self.assertEqual(hasher.similarity(hasher.signature(a), hasher.signature(a)), 1.0)
+
+    def test_similar(self):
+        index = similarity.SimilarityIndex()
+        for name, build_order in self.variants().items():
+            index.add(name, build_order)
+        found = index.similar(self.parse(self.lines))
+        self.assertEqual(found[0], ('banshee', 1.0))
+        self.assertEqual(sorted(name for name, score in found), ['banshee', 'banshee-0', 'banshee-1', 'banshee-2'])
+        self.assertRaises(Exception, similarity.SimilarityIndex, permutations=64, bands=10)
+
+    def test_members_are_near_their_representative(self):
+        index = similarity.SimilarityIndex()
+        clusters = similarity.cluster_build_orders(self.variants(), 0.7, index)
+        self.assertEqual(sum(len(c) for c in clusters), len(self.variants()))
+        self.assertEqual(clusters[0].members, ['banshee', 'banshee-0', 'banshee-1', 'banshee-2'])
+        for cluster in clusters:
+            for name in cluster.members:
+                score = index.hasher.similarity(index.signatures[cluster.representative], index.signatures[name])
+                self.assertGreaterEqual(score, 0.7)
+
+    def test_resumed_outcomes_match_full_runs(self):
+        build_orders = self.variants()
+        build_orders['banshee-copy'] = self.parse(self.lines)
+        clusters = similarity.cluster_build_orders(build_orders)
+        resumed = similarity.run_clusters(build_orders, clusters, self.facts, processes=1)
+        full = similarity.run_clusters(build_orders, clusters, self.facts, use_checkpoints=False, processes=1)
+        self.assertEqual(sorted(resumed), sorted(build_orders))
+        self.assertEqual(resumed, full)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import sys
+import os.path
+import unittest
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+)
+
+
+from models import parser
+from models import rulesets
+from models import supply
+from models import terran
+
+
+class SupplyLedgerTest(unittest.TestCase):
+
+    def test_counts(self):
+        ledger = supply.SupplyLedger(available=11, used=6)
+        ledger.use(5)
+        self.assertTrue(ledger.can_use(0))
+        self.assertFalse(ledger.can_use(1))
+        ledger.provide(8)
+        self.assertEqual(ledger.free(), 8)
+
+    def test_blocked_intervals(self):
+        ledger = supply.SupplyLedger()
+        command = parser.parse_build_order_text("marine", rulesets.get('HotS').facts())[0]
+        ledger.unblock(5) # Not blocked, so nothing is recorded
+        ledger.block(10, command)
+        ledger.block(12, command)
+        self.assertTrue(ledger.is_blocked())
+        ledger.unblock(20)
+        self.assertFalse(ledger.is_blocked())
+        self.assertEqual(ledger.blocked_intervals, [
+            {'start': 10, 'end': 20, 'duration': 10, 'command': 'marine'},
+        ])
+
+
+class SupplyBlockTest(unittest.TestCase):
+
+    def play(self, text):
+        ruleset = rulesets.get('HotS')
+        build_order = parser.parse_build_order_text(text, ruleset.facts())
+        return ruleset.game(build_order, verbose=False)
+
+    def test_blocked_until_the_depot_finishes(self):
+        game = self.play("scv\n" * 6 + "supply depot\nscv\nscv").run()
+        depot_done = game.command_timings()[6][2]
+        self.assertEqual(len(game.supply.blocked_intervals), 1)
+        interval = game.supply.blocked_intervals[0]
+        self.assertEqual(interval['end'], depot_done)
+        self.assertEqual(interval['command'], 'scv')
+        self.assertEqual(game.result()['supply_blocked'], game.supply.blocked_intervals)
+        self.assertEqual(game.supply_changes[-1][1:], (game.supply_used, game.supply_available))
+
+    def test_supply_blocked_without_a_depot(self):
+        game = self.play("scv\n" * 7)
+        self.assertRaises(terran.SupplyBlocked, game.run)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import sys
+import os.path
+import unittest
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+)
+
+
+from models import parser
+from models import rulesets
+from models import sweep
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+
+
+class SweepTest(unittest.TestCase):
+
+    def setUp(self):
+        self.facts = rulesets.get('HotS').facts()
+
+    def test_grid(self):
+        variants = sweep.grid({"marine.minerals": [45, 50], "mining.minerals_per_trip": [4, 5, 6]})
+        self.assertEqual(len(variants), 6)
+        self.assertIn({"marine.minerals": 45, "mining.minerals_per_trip": 6}, variants)
+
+    def test_overrides_copy_only_what_they_change(self):
+        facts, rates = sweep.apply_overrides(self.facts, {
+            "marine.minerals": 45,
+            "mining.mineral_collection_rate": 0.75,
+        })
+        self.assertEqual(facts.units['marine']['minerals'], 45)
+        self.assertEqual(self.facts.units['marine']['minerals'], 50)
+        self.assertIs(facts.units['marauder'], self.facts.units['marauder'])
+        self.assertEqual(rates.mineral_collection_rate, 0.75)
+
+    def test_invalid_overrides(self):
+        for key in ("marine", "zergling.minerals", "marine.no such column", "mining.no_such_rate"):
+            self.assertRaises(Exception, sweep.apply_overrides, self.facts, {key: 1})
+
+    def test_cheaper_marines_come_sooner(self):
+        build_order = parser.parse_build_order_file(
+            os.path.join(ROOT, 'input_examples', 'fastest_one_marine.txt'), self.facts)
+        table = sweep.run_sweep({"marine": build_order}, self.facts,
+                                [{}, {"marine.build time": 10}], processes=1)
+        rows = table.rows()
+        self.assertEqual(len(rows), 2)
+        self.assertTrue(all(row['completed'] for row in rows))
+        self.assertEqual(rows[0]['time'] - rows[1]['time'], 25 - 10)
+        self.assertEqual(rows[1]["marine.build time"], 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import json
+import sys
+import os.path
+import unittest
+from collections import Counter
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+)
+
+
+from models import rulesets
+from models import timeline
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+
+
+class TimelineIndexTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """Play the banshee opener a second at a time, keeping the state at
+        the end of every second to check the index against.
+        """
+        ruleset = rulesets.get('HotS')
+        game = ruleset.game(ruleset.parse_build_order_file(
+            os.path.join(ROOT, 'input_examples', 'HotS_banshee_opener.txt')), verbose=False)
+        cls.states = []
+        while game.build_order or game.anything_in_progress():
+            game.tick()
+            producers = game.buildings + game.units + game.attachments
+            cls.states.append({
+                'time': game.time - 1,
+                'minerals': game.minerals_available,
+                'gas': game.gas_available,
+                'supply_used': game.supply_used,
+                'supply_available': game.supply_available,
+                'owned': dict(Counter(i.name for i in producers + game.research)),
+                'in_production': sorted(
+                    p.command_in_progress['command'].item_name for p in producers
+                    if p.command_in_progress and not p.command_in_progress['command'].is_swap()),
+            })
+        cls.index = timeline.TimelineIndex(game)
+
+    def test_every_second(self):
+        for state in self.states:
+            at = self.index.at(state['time'])
+            in_production = sorted(p['item'] for p in at['in_production'])
+            self.assertEqual(dict(at, in_production=in_production), state)
+
+    def test_before_the_first_tick(self):
+        self.assertIsNone(self.index.supply_at(-1))
+        self.assertEqual(self.index.in_production(-1), [])
+        self.assertEqual(self.index.owned(-1), {})
+
+    def test_to_dict(self):
+        plain = json.loads(json.dumps(self.index.to_dict()))
+        self.assertEqual(plain['end'], self.index.end)
+        self.assertEqual(plain['bank']['minerals'], self.index.minerals)
+
+
+if __name__ == '__main__':
+    unittest.main()
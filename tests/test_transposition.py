@@ -0,0 +1,88 @@
+import sys
+import os.path
+import unittest
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+)
+
+
+from models import parser
+from models import rulesets
+from models import transposition
+
+
+class State(object):
+    """Only what the table looks at of a game."""
+
+    def __init__(self, key, time, minerals, gas=0):
+        self.key = key
+        self.time = time
+        self.minerals_available = minerals
+        self.gas_available = gas
+
+    def structure_key(self):
+        return self.key
+
+
+class TranspositionTableTest(unittest.TestCase):
+
+    def test_dominated_states_are_pruned(self):
+        table = transposition.TranspositionTable()
+        self.assertTrue(table.add(State('a', 60, 100)))
+        self.assertFalse(table.add(State('a', 60, 100)))
+        self.assertFalse(table.add(State('a', 70, 90)))
+        self.assertTrue(table.add(State('a', 50, 90))) # Sooner, but poorer
+        self.assertTrue(table.add(State('b', 70, 90)))
+        self.assertEqual(len(table.lookup(State('a', 0, 0))), 2)
+        self.assertEqual((table.added, table.pruned), (3, 2))
+
+    def test_better_states_replace_the_states_they_dominate(self):
+        table = transposition.TranspositionTable()
+        table.add(State('a', 60, 100))
+        table.add(State('a', 50, 80))
+        self.assertTrue(table.add(State('a', 50, 120, 10)))
+        self.assertEqual(table.lookup(State('a', 0, 0)), [(50, 120, 10, None)])
+        self.assertTrue(table.is_dominated(State('a', 55, 120)))
+
+    def test_least_recently_used_are_evicted(self):
+        table = transposition.TranspositionTable(max_states=2)
+        table.add(State('a', 0, 0))
+        table.add(State('b', 0, 0))
+        table.add(State('a', 1, 0))
+        table.add(State('c', 0, 0))
+        self.assertEqual(list(table.states.keys()), ['a', 'c'])
+        self.assertEqual(table.evicted, 1)
+
+
+class StateKeyTest(unittest.TestCase):
+
+    def play(self, text, seconds):
+        ruleset = rulesets.get('HotS')
+        game = ruleset.game(parser.parse_build_order_text(text, ruleset.facts()), verbose=False)
+        for i in range(seconds):
+            game.tick()
+        return game
+
+    def test_same_state_same_key(self):
+        first = self.play("Supply Depot\nbarracks", 40)
+        second = self.play("# the same\nsupply depot\n\nBarracks", 40)
+        self.assertEqual(first.structure_key(), second.structure_key())
+        self.assertEqual(first.state_key(), second.state_key())
+
+    def test_different_states_different_keys(self):
+        key = self.play("supply depot\nbarracks", 40).structure_key()
+        self.assertNotEqual(self.play("supply depot\nbarracks", 41).structure_key(), key)
+        self.assertNotEqual(self.play("constant scv\nsupply depot\nbarracks", 40).structure_key(), key)
+
+    def test_banks_within_a_quantum(self):
+        game = self.play("supply depot\nbarracks", 40)
+        game.minerals_available -= game.minerals_available % 10
+        key = game.state_key(quantum=10)
+        game.minerals_available += 9
+        self.assertEqual(game.state_key(quantum=10), key)
+        game.minerals_available += 1
+        self.assertNotEqual(game.state_key(quantum=10), key)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import sys
+import os.path
+import unittest
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+)
+
+
+from models import parser
+from models import rulesets
+from models import utilization
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+
+
+class StateTimerTest(unittest.TestCase):
+
+    def test_totals(self):
+        timer = utilization.StateTimer(utilization.IDLE, 0)
+        timer.change(utilization.BUSY, 10)
+        timer.change(utilization.BUSY, 15)
+        timer.change(utilization.IDLE, 35)
+        self.assertEqual(timer.totals(40), {utilization.IDLE: 15, utilization.BUSY: 25})
+
+
+class CommandWaitsTest(unittest.TestCase):
+
+    def test_reasons(self):
+        waits = utilization.CommandWaits()
+        waits.observe(0, utilization.MINERALS, 0)
+        waits.observe(0, utilization.MINERALS, 5)
+        waits.observe(0, utilization.SUPPLY, 10)
+        waits.observe(1, utilization.MINERALS, 12)
+        waits.close(20)
+        waits.close(30)
+        self.assertEqual(waits.reasons(0), {utilization.MINERALS: 10, utilization.SUPPLY: 2})
+        self.assertEqual(waits.total(1), 8)
+        self.assertEqual(waits.reasons(2), {})
+
+
+class GameUtilizationTest(unittest.TestCase):
+
+    def setUp(self):
+        ruleset = rulesets.get('HotS')
+        build_order = ruleset.parse_build_order_file(
+            os.path.join(ROOT, 'input_examples', 'fastest_one_marine.txt'))
+        self.game = ruleset.game(build_order, verbose=False).run()
+
+    def test_commands_wait_from_the_last_begin_to_their_own(self):
+        previous = 0
+        for (command, wait, reasons), (command, begin, complete) in zip(
+                self.game.command_waits(), self.game.command_timings()):
+            self.assertEqual(wait, begin - previous)
+            self.assertEqual(sum(reasons.values()), wait)
+            previous = begin
+        depot, barracks, marine = [reasons for c, w, reasons in self.game.command_waits()]
+        self.assertIn(utilization.PREREQUISITE, barracks)
+        self.assertIn(utilization.PRODUCER, marine)
+
+    def test_producers(self):
+        producers = dict(self.game.producer_utilization())
+        barracks_done = self.game.command_timings()[1][2]
+        self.assertEqual(producers['barracks'][utilization.BUSY], 25)
+        self.assertEqual(sum(producers['barracks'].values()), self.game.time - barracks_done)
+        self.assertEqual(producers['command center'], {utilization.IDLE: self.game.time})
+        self.assertIn(utilization.CONSTRUCTING, producers['all scvs'])
+
+
+if __name__ == '__main__':
+    unittest.main()